@@ -7,9 +7,132 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Create missing tables, columns and indexes on startup (otherwise only check they exist)
+SCHEMA_AUTO_UPGRADE = os.getenv("SCHEMA_AUTO_UPGRADE", "true").lower() == "true"
 TWILIO_ACCOUNT_SID= os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN= os.getenv("TWILIO_AUTH_TOKEN")
 TWILIO_PHONE_NUMBER= os.getenv("TWILIO_PHONE_NUMBER")
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+
+# Background analysis job queue ("postgres" or "memory")
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "postgres")
+EMBEDDED_WORKER = os.getenv("EMBEDDED_WORKER", "false").lower() == "true"
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "2"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_HEARTBEAT_SECONDS = int(os.getenv("JOB_HEARTBEAT_SECONDS", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "30"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "900"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+JOB_RECLAIM_SECONDS = float(os.getenv("JOB_RECLAIM_SECONDS", "60"))
+# Caps on running jobs across all workers and per user (0 = no cap); claims are fair between users
+JOB_MAX_RUNNING = int(os.getenv("JOB_MAX_RUNNING", "0"))
+JOB_MAX_RUNNING_PER_USER = int(os.getenv("JOB_MAX_RUNNING_PER_USER", "0"))
+ANALYSIS_BATCH_MAX_SIZE = int(os.getenv("ANALYSIS_BATCH_MAX_SIZE", "500"))
+
+# Chunked transcription for long recordings
+TRANSCRIPTION_CHUNKING = os.getenv("TRANSCRIPTION_CHUNKING", "auto")  # auto, always or never
+TRANSCRIPTION_CHUNK_MIN_SECONDS = float(os.getenv("TRANSCRIPTION_CHUNK_MIN_SECONDS", "900"))
+TRANSCRIPTION_CHUNK_SECONDS = float(os.getenv("TRANSCRIPTION_CHUNK_SECONDS", "300"))
+TRANSCRIPTION_CHUNK_OVERLAP_SECONDS = float(os.getenv("TRANSCRIPTION_CHUNK_OVERLAP_SECONDS", "2"))
+TRANSCRIPTION_MAX_CONCURRENCY = int(os.getenv("TRANSCRIPTION_MAX_CONCURRENCY", "4"))
+
+# Audio sent to Whisper: 16 kHz mono speech codec, optionally without long silences
+AUDIO_NORMALIZE = os.getenv("AUDIO_NORMALIZE", "true").lower() == "true"
+AUDIO_SAMPLE_RATE = int(os.getenv("AUDIO_SAMPLE_RATE", "16000"))
+AUDIO_CODEC = os.getenv("AUDIO_CODEC", "libopus")
+AUDIO_BITRATE = os.getenv("AUDIO_BITRATE", "24k")
+AUDIO_TRIM_SILENCE = os.getenv("AUDIO_TRIM_SILENCE", "false").lower() == "true"
+AUDIO_TRIM_MIN_SILENCE_SECONDS = float(os.getenv("AUDIO_TRIM_MIN_SILENCE_SECONDS", "1.0"))
+AUDIO_TRIM_PADDING_SECONDS = float(os.getenv("AUDIO_TRIM_PADDING_SECONDS", "0.25"))
+AUDIO_TRIM_NOISE_DB = int(os.getenv("AUDIO_TRIM_NOISE_DB", "-35"))
+
+# Media ingest
+STREAMING_INGEST = os.getenv("STREAMING_INGEST", "true").lower() == "true"
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(1024 * 1024)))
+FFMPEG_STDIN_BUFFER_SIZE = int(os.getenv("FFMPEG_STDIN_BUFFER_SIZE", str(8 * 1024 * 1024)))
+
+# Analysis results cached by media content hash
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Map-reduce analysis for long transcripts
+ANALYSIS_WINDOW_CHARS = int(os.getenv("ANALYSIS_WINDOW_CHARS", "60000"))
+ANALYSIS_MAX_CONCURRENCY = int(os.getenv("ANALYSIS_MAX_CONCURRENCY", "4"))
+
+# Shared clients and executors
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "100"))
+HTTP_POOL_SIZE_PER_HOST = int(os.getenv("HTTP_POOL_SIZE_PER_HOST", "20"))
+IO_EXECUTOR_WORKERS = int(os.getenv("IO_EXECUTOR_WORKERS", "16"))
+MEDIA_EXECUTOR_WORKERS = int(os.getenv("MEDIA_EXECUTOR_WORKERS", str(os.cpu_count() or 2)))
+# Process pool for OpenCV/NumPy work (0 runs it on the media threads); tasks beyond
+# workers + MAX_QUEUE wait up to ADMISSION_TIMEOUT_SECONDS, then fail (0 fails at once)
+MEDIA_COMPUTE_WORKERS = int(os.getenv("MEDIA_COMPUTE_WORKERS", str(os.cpu_count() or 2)))
+MEDIA_COMPUTE_MAX_QUEUE = int(os.getenv("MEDIA_COMPUTE_MAX_QUEUE", "64"))
+MEDIA_COMPUTE_ADMISSION_TIMEOUT_SECONDS = float(os.getenv("MEDIA_COMPUTE_ADMISSION_TIMEOUT_SECONDS", "120"))
+
+# LLM gateway: completion cache and per-model concurrency ("model=limit,..." overrides the default)
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MODEL_CONCURRENCY = os.getenv("LLM_MODEL_CONCURRENCY", "")
+
+# Chat conversation context cache
+CHAT_CONTEXT_MAX_TOKENS = int(os.getenv("CHAT_CONTEXT_MAX_TOKENS", "3000"))
+CHAT_CONTEXT_CACHE_SIZE = int(os.getenv("CHAT_CONTEXT_CACHE_SIZE", "1024"))
+CHAT_CONTEXT_TTL_SECONDS = float(os.getenv("CHAT_CONTEXT_TTL_SECONDS", "600"))
+CHAT_HISTORY_LOAD_LIMIT = int(os.getenv("CHAT_HISTORY_LOAD_LIMIT", "50"))
+
+# Transcript segment retrieval for chat
+CHAT_RETRIEVAL_TOP_K = int(os.getenv("CHAT_RETRIEVAL_TOP_K", "4"))
+SEGMENT_INDEX_CACHE_SIZE = int(os.getenv("SEGMENT_INDEX_CACHE_SIZE", "256"))
+
+# Transcript segmentation (0 disables a limit)
+SEGMENT_MAX_WORDS = int(os.getenv("SEGMENT_MAX_WORDS", "31"))
+SEGMENT_MAX_SECONDS = float(os.getenv("SEGMENT_MAX_SECONDS", "0"))
+SEGMENT_PAUSE_SECONDS = float(os.getenv("SEGMENT_PAUSE_SECONDS", "0"))
+SEGMENT_SPLIT_ON_PUNCTUATION = os.getenv("SEGMENT_SPLIT_ON_PUNCTUATION", "false").lower() == "true"
+SEGMENT_MIN_WORDS = int(os.getenv("SEGMENT_MIN_WORDS", "5"))
+
+# Media listing pagination
+MEDIA_PAGE_SIZE = int(os.getenv("MEDIA_PAGE_SIZE", "50"))
+MEDIA_PAGE_SIZE_MAX = int(os.getenv("MEDIA_PAGE_SIZE_MAX", "200"))
+
+# Analysis status cache ("postgres" shares updates between processes via LISTEN/NOTIFY, "memory" is process-local)
+STATUS_CACHE_BACKEND = os.getenv("STATUS_CACHE_BACKEND", JOB_QUEUE_BACKEND)
+STATUS_CACHE_SIZE = int(os.getenv("STATUS_CACHE_SIZE", "4096"))
+STATUS_CACHE_TTL_SECONDS = float(os.getenv("STATUS_CACHE_TTL_SECONDS", "60"))
+STATUS_STREAM_KEEPALIVE_SECONDS = float(os.getenv("STATUS_STREAM_KEEPALIVE_SECONDS", "15"))
+
+# Metrics (the API serves /metrics itself; 0 disables the worker's metrics server)
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9100"))
+
+# Local filesystem storage (stand-in for Supabase storage)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase")  # supabase or local
+LOCAL_STORAGE_ROOT = os.getenv("LOCAL_STORAGE_ROOT", "./storage")
+LOCAL_STORAGE_URL = os.getenv("LOCAL_STORAGE_URL")  # defaults to file:// URLs
+
+# Keyframe index: preview frames decoded while the LLM runs, chapter thumbnails are picked from them (0 disables)
+KEYFRAME_STRIP_SECONDS = float(os.getenv("KEYFRAME_STRIP_SECONDS", "5"))
+KEYFRAME_STRIP_MAX_FRAMES = int(os.getenv("KEYFRAME_STRIP_MAX_FRAMES", "720"))
+SPRITE_SHEETS = os.getenv("SPRITE_SHEETS", "true").lower() == "true"
+SPRITE_TILE_WIDTH = int(os.getenv("SPRITE_TILE_WIDTH", "160"))
+SPRITE_COLUMNS = int(os.getenv("SPRITE_COLUMNS", "10"))
+SPRITE_ROWS = int(os.getenv("SPRITE_ROWS", "10"))
+KEYFRAME_INDEX_CACHE_SIZE = int(os.getenv("KEYFRAME_INDEX_CACHE_SIZE", "256"))
+
+# Notification outbox
+NOTIFICATION_TRANSPORT = os.getenv("NOTIFICATION_TRANSPORT", "twilio")  # twilio or fake
+NOTIFICATION_RATE_PER_SECOND = float(os.getenv("NOTIFICATION_RATE_PER_SECOND", "1"))
+NOTIFICATION_BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", "20"))
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "5"))
+NOTIFICATION_RETRY_BASE_SECONDS = float(os.getenv("NOTIFICATION_RETRY_BASE_SECONDS", "30"))
+NOTIFICATION_RETRY_MAX_SECONDS = float(os.getenv("NOTIFICATION_RETRY_MAX_SECONDS", "3600"))
+NOTIFICATION_LEASE_SECONDS = int(os.getenv("NOTIFICATION_LEASE_SECONDS", "120"))
+NOTIFICATION_POLL_SECONDS = float(os.getenv("NOTIFICATION_POLL_SECONDS", "2"))
+
+# Resumable multipart uploads (local storage only)
+UPLOAD_PART_SIZE = int(os.getenv("UPLOAD_PART_SIZE", str(8 * 1024 * 1024)))
+UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE", str(10 * 1024 ** 3)))
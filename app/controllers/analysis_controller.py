@@ -1,96 +1,99 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import json
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
-from app.database import get_db
-from app.services.media_analysis_service import MediaAnalysisService
-from app.services.storage_service import StorageService
+from app.database import get_db, AsyncSessionLocal
+from app.services.batch_analysis import BatchNotFound, InvalidBatch, batch_progress, create_batch
+from app.services.job_queue import IdempotencyKeyConflict, MediaNotFound, start_analysis
+from app.services.keyframe_index import keyframe_index_cache
+from app.services.structured_transcript import StructuredTranscript
+from app.services.status_cache import status_cache, get_analysis_status as get_cached_status, is_terminal
+from app.config import STATUS_STREAM_KEEPALIVE_SECONDS
 from app.models.models import Analysis, AnalysisStatus, Media
-from typing import Dict, Optional
-from fastapi import BackgroundTasks
+from typing import Dict, List, Optional
+from pydantic import BaseModel
 import uuid
-import asyncio
 
 router = APIRouter()
 
-async def create_background_analysis_task(media_id: str):
-    """
-    Create and execute analysis task with a fresh database session.
-    This prevents blocking the main API session.
-    """
-    from app.database import AsyncSessionLocal
-    
-    async with AsyncSessionLocal() as db:
-        try:
-            storage_service = StorageService()
-            analysis_service = MediaAnalysisService(db, storage_service)
-            await analysis_service.process_media(media_id)
-        except Exception as e:
-            print(f"Background analysis failed for media {media_id}: {str(e)}")
-            # Update analysis status to failed in case of error
-            try:
-                analysis_query = select(Analysis).where(
-                    Analysis.media_id == media_id,
-                    Analysis.status == AnalysisStatus.PROCESSING
-                )
-                result = await db.execute(analysis_query)
-                analysis = result.scalar_one_or_none()
-                if analysis:
-                    analysis.status = AnalysisStatus.FAILED
-                    analysis.meta = {'error': str(e)}
-                    await db.commit()
-            except Exception as commit_error:
-                print(f"Failed to update analysis status: {str(commit_error)}")
-
 @router.post("/media/{media_id}/analyze")
 async def analyze_media(
     media_id: uuid.UUID,
-    background_tasks: BackgroundTasks,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ) -> Dict:
     """
     Trigger analysis for a media file.
+
+    Safe to retry: at most one analysis per media is processing or done, and a
+    repeated `Idempotency-Key` returns the analysis of the first request.
     """
     try:
-        # Check if analysis already exists (quick check)
-        query = select(Analysis).where(
-            Analysis.media_id == media_id,
-            Analysis.status.in_([AnalysisStatus.PROCESSING, AnalysisStatus.DONE])
-        )
-        result = await db.execute(query)
-        existing_analysis = result.scalar_one_or_none()
-        
-        if existing_analysis:
-            if existing_analysis.status == AnalysisStatus.PROCESSING:
+        analysis, created = await start_analysis(db, media_id, idempotency_key)
+        if not created:
+            if analysis.status == AnalysisStatus.PROCESSING:
                 return {
                     "status": "processing",
                     "message": "Analysis is already in progress",
-                    "analysis_id": str(existing_analysis.id)
+                    "analysis_id": str(analysis.id)
+                }
+            elif analysis.status == AnalysisStatus.FAILED:
+                # Only returned for a repeated Idempotency-Key; a new key retries
+                return {
+                    "status": "failed",
+                    "message": "Analysis failed",
+                    "analysis_id": str(analysis.id)
                 }
             else:
                 return {
                     "status": "completed",
                     "message": "Analysis already exists for this media",
-                    "analysis_id": str(existing_analysis.id)
+                    "analysis_id": str(analysis.id)
                 }
         
-        # Create initial analysis record with PROCESSING status
-        analysis = Analysis(
-            media_id=media_id,
-            status=AnalysisStatus.PROCESSING
-        )
-        db.add(analysis)
-        await db.commit()
-        await db.refresh(analysis)
-        
-        # Start the background task with asyncio.create_task for better async handling
-        asyncio.create_task(create_background_analysis_task(str(media_id)))
-        
         return {
             "status": "processing",
             "message": "Analysis started in background",
             "analysis_id": str(analysis.id)
         }
+    except MediaNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except IdempotencyKeyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+class BatchAnalysisRequest(BaseModel):
+    user_id: uuid.UUID
+    media_ids: List[uuid.UUID]
+
+@router.post("/analysis-batches")
+async def analyze_media_batch(data: BatchAnalysisRequest, db: AsyncSession = Depends(get_db)) -> Dict:
+    """
+    Trigger analysis for many media files of a user in one request.
+    Returns the batch ID and its progress; media already analyzed are reused.
+    """
+    try:
+        return await create_batch(db, data.user_id, data.media_ids)
+    except InvalidBatch as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except MediaNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/analysis-batches/{batch_id}")
+async def get_analysis_batch(batch_id: uuid.UUID, db: AsyncSession = Depends(get_db)) -> Dict:
+    """
+    Get the aggregate progress of a batch and the status of each media file.
+    """
+    try:
+        return await batch_progress(db, batch_id)
+    except BatchNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -101,13 +104,12 @@ async def get_analysis_status(
 ) -> Dict:
     """
     Get the current status of analysis for a media file.
+    Served from the status cache, with the database as fallback.
     """
     try:
-        query = select(Analysis).where(Analysis.media_id == media_id).order_by(Analysis.created_at.desc())
-        result = await db.execute(query)
-        analysis = result.scalar_one_or_none()
+        entry = await get_cached_status(db, media_id)
         
-        if not analysis:
+        if not entry:
             return {
                 "status": "not_found",
                 "message": "No analysis found for this media"
@@ -116,16 +118,57 @@ async def get_analysis_status(
         return {
             "status": "success",
             "data": {
-                "analysis_id": str(analysis.id),
-                "status": analysis.status,
-                "created_at": analysis.created_at,
-                "updated_at": analysis.updated_at,
-                "has_results": analysis.meta is not None and analysis.status == AnalysisStatus.DONE
+                "analysis_id": entry.get("analysis_id"),
+                "status": entry["status"],
+                "stage": entry.get("stage"),
+                "created_at": entry.get("created_at"),
+                "updated_at": entry.get("updated_at"),
+                "has_results": entry.get("has_results", False)
             }
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse(event: Dict) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
+@router.get("/media/{media_id}/analysis/events")
+async def stream_analysis_status(media_id: uuid.UUID, request: Request):
+    """
+    Server-sent events with the analysis stage of a media file.
+
+    Sends the current status first, then every stage transition, and closes
+    once the analysis is done or failed.
+    """
+    async def events():
+        async with status_cache.subscribe(media_id) as updates:
+            # Subscribe before reading the current state so no transition is missed
+            try:
+                async with AsyncSessionLocal() as db:
+                    entry = await get_cached_status(db, media_id)
+            except Exception as e:
+                yield _sse({"type": "error", "detail": str(e)})
+                return
+            if entry:
+                yield _sse(dict(entry, type="status"))
+                if is_terminal(entry):
+                    return
+            while not await request.is_disconnected():
+                try:
+                    entry = await asyncio.wait_for(updates.get(), STATUS_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse(dict(entry, type="status"))
+                if is_terminal(entry):
+                    return
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/media/{media_id}/analysis")
 async def get_media_analysis(
     media_id: uuid.UUID,
@@ -138,7 +181,7 @@ async def get_media_analysis(
         # Query the analysis table using select() - get the latest analysis
         query = select(Analysis).where(
             Analysis.media_id == media_id
-        ).order_by(Analysis.created_at.desc())
+        ).order_by(Analysis.created_at.desc()).limit(1)
         media_query = select(Media).where(Media.id == media_id)
         media_result = await db.execute(media_query)
         media = media_result.scalar_one_or_none()
@@ -198,4 +241,64 @@ async def get_media_analysis(
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e)) 
+
+@router.get("/media/{media_id}/transcript")
+async def get_media_transcript(
+    media_id: uuid.UUID,
+    start: float = 0.0,
+    end: Optional[float] = None,
+    words: bool = False,
+    db: AsyncSession = Depends(get_db)
+) -> Dict:
+    """
+    Get the transcript segments (and optionally words) between two timestamps.
+    """
+    try:
+        query = select(Analysis.transcript_data).where(
+            Analysis.media_id == media_id,
+            Analysis.status == AnalysisStatus.DONE
+        ).order_by(Analysis.created_at.desc()).limit(1)
+        result = await db.execute(query)
+        transcript_data = result.scalar_one_or_none()
+
+        if not transcript_data:
+            raise HTTPException(status_code=404, detail="Transcript not found")
+
+        transcript = StructuredTranscript.from_bytes(transcript_data)
+        end = float("inf") if end is None else end
+        data = {"segments": transcript.segments(start, end)}
+        if words:
+            data["words"] = [
+                {
+                    "word": transcript.word(i),
+                    "start": float(transcript.word_starts[i]),
+                    "end": float(transcript.word_ends[i])
+                } for i in transcript.word_range(start, end)
+            ]
+        return {"status": "success", "data": data}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/media/{media_id}/preview")
+async def get_media_preview(
+    media_id: uuid.UUID,
+    t: float = Query(..., ge=0, description="Time in seconds"),
+    db: AsyncSession = Depends(get_db)
+) -> Dict:
+    """
+    Get the indexed frame nearest to time `t`: its sprite sheet tile and the nearest keyframe.
+    """
+    try:
+        index = await keyframe_index_cache.get(db, media_id)
+        preview = index.preview(t) if index is not None else None
+        if preview is None:
+            raise HTTPException(status_code=404, detail="Keyframe index not found")
+        return {"status": "success", "data": preview}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
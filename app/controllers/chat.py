@@ -1,13 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from app.services.send_notification import send_whatsapp_message
-from app.models.models import User, Chat, Analysis
+from app.models.models import User, Chat
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_db
-from sqlalchemy import update, select
+from app.database import get_db, AsyncSessionLocal
+from sqlalchemy import update
 import uuid
-from app.config import OPENAI_API_KEY
-from openai import AsyncOpenAI
+from app.services.llm_gateway import LLMGateway, llm_gateway
+from app.services.chat_context import chat_context_cache
+from app.services.segment_index import segment_index_cache
+from app.config import CHAT_RETRIEVAL_TOP_K
+from contextlib import aclosing
+from datetime import datetime, timezone
+from typing import Dict, List
+import json
 import os
 
 router = APIRouter()
@@ -17,77 +24,48 @@ class ChatMessage(BaseModel):
     message: str
     media_id: uuid.UUID
 
-# Initialize OpenAI client
-client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+SYSTEM_PROMPT = "You are a helpful assistant for minutes.ai who answers about insgits of a video always under in short under 50 words, introduce yourself Hi I'm minutes.ai assistant"
+
+def get_llm_gateway() -> LLMGateway:
+    """LLM gateway used by the chat endpoints; override in tests with `LLMGateway(client=fake)`."""
+    return llm_gateway
+
+async def _retrieve_excerpts(db: AsyncSession, data: ChatMessage) -> List[Dict]:
+    """Top transcript segments for the question, with their timestamps."""
+    index = await segment_index_cache.get(db, data.media_id)
+    return index.search(data.message, CHAT_RETRIEVAL_TOP_K) if index else []
+
+async def _store_turn(db: AsyncSession, data: ChatMessage, context, received_at: datetime, ai_response: str) -> None:
+    """Store the turn (and the insights on the first turn) in one transaction."""
+    chats = [
+        Chat(media_id=data.media_id, user_type="user", message=data.message, created=received_at),
+        Chat(media_id=data.media_id, user_type="assistant", message=ai_response, created=datetime.now(timezone.utc))
+    ]
+    if context.insights_pending:
+        chats.insert(0, Chat(media_id=data.media_id, user_type="insights", message=context.insights, created=received_at))
+    db.add_all(chats)
+    await db.commit()
+    context.insights_pending = False
 
 @router.post("/chat")
-async def chat_with_ai(data: ChatMessage, db: AsyncSession = Depends(get_db)):
+async def chat_with_ai(data: ChatMessage, db: AsyncSession = Depends(get_db), llm: LLMGateway = Depends(get_llm_gateway)):
     try:
-        # Store user message in database
-        user_chat = Chat(
-            media_id=data.media_id,
-            user_type="user",
-            message=data.message
-        )
-        db.add(user_chat)
-        await db.commit()
-
-        # First check if we already have insights in chat
-        query = select(Chat).where(
-            Chat.media_id == data.media_id,
-            Chat.user_type == "insights"
-        )
-        result = await db.execute(query)
-        insights_chat = result.scalar_one_or_none()
-
-        # If no insights found in chat, fetch from analysis and store
-        if not insights_chat:
-            analysis_query = select(Analysis).where(Analysis.media_id == data.media_id)
-            analysis_result = await db.execute(analysis_query)
-            analysis = analysis_result.scalar_one_or_none()
-            
-            if analysis and analysis.meta:
-                insights_chat = Chat(
-                    media_id=data.media_id,
-                    user_type="insights",
-                    message=str(analysis.meta["summary"])
-                )
-                db.add(insights_chat)
-                await db.commit()
-
-        # Fetch all chat history including insights
-        query = select(Chat).where(Chat.media_id == data.media_id).order_by(Chat.created)
-        result = await db.execute(query)
-        chat_history = result.scalars().all()
-
-        # Prepare messages for OpenAI
-        messages = [{"role": "system", "content": "You are a helpful assistant for minutes.ai who answers about insgits of a video always under in short under 50 words, introduce yourself Hi I'm minutes.ai assistant"}]
-        
-        # Add chat history including insights
-        for chat in chat_history:
-            if chat.user_type == "insights":
-                messages.append({"role": "system", "content": f"Video insights: {chat.message}"})
-            else:
-                role = "assistant" if chat.user_type == "assistant" else "user"
-                messages.append({"role": role, "content": chat.message})
-
-        # Create chat completion with OpenAI
-        response = await client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages
-        )
-
-        # Extract the response text
-        ai_response = response.choices[0].message.content
-
-        # Store assistant response in database
-        assistant_chat = Chat(
-            media_id=data.media_id,
-            user_type="assistant",
-            message=ai_response
-        )
-        db.add(assistant_chat)
-        await db.commit()
+        context = await chat_context_cache.get(db, data.media_id)
+        excerpts = await _retrieve_excerpts(db, data)
+        async with context.lock:
+            received_at = datetime.now(timezone.utc)
+
+            # Prepare messages for OpenAI from the cached rolling window
+            messages = context.build_messages(SYSTEM_PROMPT, excerpts, data.message)
+
+            # Create chat completion with OpenAI; replies are not cached, so asking
+            # again gets a fresh answer (identical concurrent requests still share one call)
+            completion = await llm.complete(model="gpt-4o-mini", messages=messages, cache=False)
+            ai_response = completion.content
+            await _store_turn(db, data, context, received_at, ai_response)
+            # Only a stored turn enters the window, so a failed one leaves no trace
+            context.append("user", data.message)
+            context.append("assistant", ai_response)
 
         return {
             "status": "success",
@@ -95,3 +73,55 @@ async def chat_with_ai(data: ChatMessage, db: AsyncSession = Depends(get_db)):
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+def _sse(event: Dict) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
+@router.post("/chat/stream")
+async def chat_with_ai_stream(data: ChatMessage, request: Request, db: AsyncSession = Depends(get_db),
+                              llm: LLMGateway = Depends(get_llm_gateway)):
+    """
+    Server-sent events variant of /chat.
+
+    Emits `{"type": "token", "content": ...}` events as tokens arrive from the
+    model, then `{"type": "done", "response": ...}` once the assembled reply
+    has been stored. Each token is only read from OpenAI after the previous one
+    was handed to the client, so a slow client slows the upstream stream down
+    instead of buffering it in memory; a disconnect stops generation. The
+    stream counts against the gateway's per-model limit and token usage.
+    """
+    try:
+        context = await chat_context_cache.get(db, data.media_id)
+        excerpts = await _retrieve_excerpts(db, data)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def events():
+        async with context.lock:
+            received_at = datetime.now(timezone.utc)
+            messages = context.build_messages(SYSTEM_PROMPT, excerpts, data.message)
+            parts = []
+            try:
+                async with aclosing(llm.stream(model="gpt-4o-mini", messages=messages)) as stream:
+                    async for delta in stream:
+                        if await request.is_disconnected():
+                            # Nothing is stored for an abandoned reply
+                            return
+                        parts.append(delta)
+                        yield _sse({"type": "token", "content": delta})
+
+                ai_response = "".join(parts)
+                # The request's session is closed once streaming starts, so use a fresh one
+                async with AsyncSessionLocal() as stream_db:
+                    await _store_turn(stream_db, data, context, received_at, ai_response)
+                context.append("user", data.message)
+                context.append("assistant", ai_response)
+                yield _sse({"type": "done", "response": ai_response})
+            except Exception as e:
+                yield _sse({"type": "error", "detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
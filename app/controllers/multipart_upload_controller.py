@@ -0,0 +1,68 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict
+import uuid
+from app.database import get_db
+from app.services.multipart_upload import MultipartUploadService
+from app.config import STORAGE_BACKEND
+
+router = APIRouter()
+
+
+class CreateUpload(BaseModel):
+    user_id: uuid.UUID
+    file_name: str
+    file_type: str
+    size: int
+
+
+def get_upload_service(db: AsyncSession = Depends(get_db)) -> MultipartUploadService:
+    if STORAGE_BACKEND != "local":
+        raise HTTPException(status_code=501, detail="Multipart uploads need STORAGE_BACKEND=local")
+    return MultipartUploadService(db)
+
+
+@router.post("/uploads")
+async def create_upload(data: CreateUpload, service: MultipartUploadService = Depends(get_upload_service)) -> Dict:
+    """
+    Start a resumable upload. Returns the upload ID, the media ID and the part layout.
+    """
+    return await service.create(data.user_id, data.file_name, data.file_type, data.size)
+
+
+@router.get("/uploads/{upload_id}")
+async def get_upload(upload_id: uuid.UUID, service: MultipartUploadService = Depends(get_upload_service)) -> Dict:
+    """
+    Get the received and missing parts of an upload, to resume it.
+    """
+    return await service.status(upload_id)
+
+
+@router.put("/uploads/{upload_id}/parts/{part_number}")
+async def upload_part(
+    upload_id: uuid.UUID,
+    part_number: int,
+    request: Request,
+    service: MultipartUploadService = Depends(get_upload_service)
+) -> Dict:
+    """
+    Upload one part as the raw request body. Parts may be sent in any order and in parallel.
+    """
+    return await service.upload_part(upload_id, part_number, request.stream())
+
+
+@router.post("/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: uuid.UUID, service: MultipartUploadService = Depends(get_upload_service)) -> Dict:
+    """
+    Finish an upload: probe the file, fill in the media details and start its analysis.
+    """
+    return await service.complete(upload_id)
+
+
+@router.delete("/uploads/{upload_id}")
+async def abort_upload(upload_id: uuid.UUID, service: MultipartUploadService = Depends(get_upload_service)) -> Dict:
+    """
+    Abort an upload and delete the received parts.
+    """
+    return await service.abort(upload_id)
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, HTTPException
-from app.services.storage_service import StorageService
+from fastapi import APIRouter, HTTPException, Query, Response
+from app.services.storage_service import get_storage_service
 from fastapi import Depends
 from app.database import get_db
-from app.repositories.media_repository import MediaRepository
+from app.repositories.media_repository import MediaRepository, decode_cursor
+from app.config import MEDIA_PAGE_SIZE, MEDIA_PAGE_SIZE_MAX
 import uuid
 from app.models.models import UploadStatus, User
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -25,7 +26,7 @@ class UpdateMedia(BaseModel):
 
 @router.get("/generate-presigned-url")
 async def get_presigned_url(file_name: str,file_type: str,user_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
-    storage_service = StorageService()
+    storage_service = get_storage_service()
     result = await storage_service.generate_presigned_url(
         file_name=file_name,
         file_type=file_type,
@@ -60,20 +61,32 @@ async def update_media_status(
 
 
 @router.get("/get-user-media")
-async def get_user_media( user_id: uuid.UUID,recent: Optional[bool] = False, db: AsyncSession = Depends(get_db)):
-    media_repo = MediaRepository(db)
-    media_list = await media_repo.get_user_media(user_id)
+async def get_user_media(
+    user_id: uuid.UUID,
+    response: Response,
+    recent: Optional[bool] = False,
+    limit: int = Query(MEDIA_PAGE_SIZE, ge=1, le=MEDIA_PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    List a user's media, newest first, one page at a time.
+    The cursor of the next page is returned in the `X-Next-Cursor` header.
+    """
     if recent:
-        media_list = sorted(media_list, key=lambda x: x.created_at, reverse=True)
-        media_list = media_list[:3]
+        limit = 3
+    try:
+        position = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    media_repo = MediaRepository(db)
+    rows, next_cursor = await media_repo.get_user_media(user_id, limit=limit, cursor=position)
+    if next_cursor and not recent:
+        response.headers["X-Next-Cursor"] = next_cursor
+
     formatted_media = []
-    for media in media_list:
-        # Get the latest analysis status if any analysis exists
-        analysis_status = None
-        if media.analysis:
-            latest_analysis = max(media.analysis, key=lambda x: x.created_at)
-            analysis_status = latest_analysis.status
-            
+    for media in rows:
         formatted_media.append({
             "media_id": str(media.id),
             "file_type": media.type,
@@ -82,7 +95,7 @@ async def get_user_media( user_id: uuid.UUID,recent: Optional[bool] = False, db:
             "thumbnail": media.media_thumbnail,
             "created_at": media.created_at.isoformat(),
             "upload_status": media.upload_status,
-            "analysis_status": analysis_status,
+            "analysis_status": media.analysis_status,
             "title": media.title,
             "description": media.description,
 
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from app.services.send_notification import send_whatsapp_message
+from app.services.notifications import enqueue_notification
 from app.models.models import User
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
@@ -25,11 +25,14 @@ async def connect_whatsapp(data: WhatsAppConnect, db: AsyncSession = Depends(get
             notification_active=True
         )
         await db.execute(stmt)
-        await db.commit()
 
-        # Send welcome message
+        # Queue the welcome message (once per number) in the same transaction
         welcome_message = "Welcome to MeetingIQ Pro! 🎉\nYou'll receive notifications here when your meeting analysis is complete."
-        send_whatsapp_message(welcome_message, data.phone_number)
+        await enqueue_notification(
+            db, data.phone_number, welcome_message,
+            dedup_key=f"whatsapp-welcome:{data.user_id}:{data.phone_number}", user_id=data.user_id
+        )
+        await db.commit()
         
         return {"status": "success", "message": "WhatsApp connection established"}
     except Exception as e:
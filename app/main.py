@@ -1,10 +1,47 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.controllers import upload_controller, analysis_controller, whatsapp, chat
+from app.controllers import upload_controller, multipart_upload_controller, analysis_controller, whatsapp, chat
+from app.config import EMBEDDED_WORKER, JOB_QUEUE_BACKEND
+from app.schema import ensure_schema
+from app.services.clients import get_clients, close_clients
+from app.services.job_queue import get_job_queue
+from app.services.notifications import NotificationDispatcher
+from app.services.status_cache import status_cache
+from app.services.metrics import registry, http_request_seconds
+from app.worker import Worker
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Refuse to serve against a schema missing tables or the indexes claims rely on
+    await ensure_schema()
+    # Shared API clients, connection pools and executors for all services
+    get_clients()
+    # Receive analysis stage updates published by worker processes
+    await status_cache.start()
 
-app = FastAPI()
+    # The in-memory queue only lives in this process, so it always needs an embedded worker
+    worker = None
+    dispatcher = None
+    if EMBEDDED_WORKER or JOB_QUEUE_BACKEND == "memory":
+        worker = Worker(get_job_queue())
+        await worker.start()
+        # Otherwise notifications are sent by the worker processes
+        dispatcher = NotificationDispatcher()
+        await dispatcher.start()
+    yield
+    if worker:
+        await worker.stop()
+    if dispatcher:
+        await dispatcher.stop()
+    await status_cache.stop()
+    await close_clients()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -13,13 +50,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets browsers read the cursor of the next /get-user-media page
+    expose_headers=["X-Next-Cursor"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template rather than raw path to keep the series bounded
+        route = request.scope.get("route")
+        http_request_seconds.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status
+        )
+
 # Include routers
 app.include_router(upload_controller.router)
+app.include_router(multipart_upload_controller.router)
 app.include_router(analysis_controller.router)
 app.include_router(whatsapp.router)
 app.include_router(chat.router)
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus metrics of this process."""
+    return registry.render()
+
 @app.get("/")
 def root():
     return {"message": "Welcome to FastAPI Video Processing Server"}
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, ForeignKey, DateTime, Boolean, Text, Integer, Enum, JSON
-from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy import Column, String, ForeignKey, DateTime, Boolean, Text, Integer, BigInteger, Enum, JSON, LargeBinary, Index, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from sqlalchemy.sql import func
 from typing import Optional, List
@@ -25,6 +25,22 @@ class AnalysisStatus(str, enum.Enum):
     PROCESSING = 'processing'
     FAILED = 'failed'
     DONE = 'done'
+
+class JobStatus(str, enum.Enum):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+class UploadSessionStatus(str, enum.Enum):
+    UPLOADING = 'uploading'
+    COMPLETED = 'completed'
+    ABORTED = 'aborted'
+
+class NotificationStatus(str, enum.Enum):
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
 # SQLAlchemy Models
 class User(Base):
     """Model for users."""
@@ -60,12 +76,22 @@ class Media(Base):
     language: Mapped[Optional[str]] = mapped_column(String(10))
     file_path: Mapped[Optional[str]] = mapped_column(Text)
     media_url: Mapped[Optional[str]] = mapped_column(Text)
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64), index=True)
+    keyframe_index: Mapped[Optional[bytes]] = mapped_column(LargeBinary, deferred=True)
+    # Container and stream details from ffprobe (multipart uploads)
+    media_info: Mapped[Optional[dict]] = mapped_column(JSONB)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     # Relationships
     user: Mapped["User"] = relationship(back_populates="media")
     analysis: Mapped[List["Analysis"]] = relationship(back_populates="media", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Keyset pagination of a user's media, newest first
+        Index("ix_media_user_created_id", "user_id", "created_at", "id"),
+    )
+
 class Analysis(Base):
     """Model for media analysis results."""
     
@@ -78,10 +104,25 @@ class Analysis(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     transcription: Mapped[Optional[str]] = mapped_column(Text)
+    transcript_data: Mapped[Optional[bytes]] = mapped_column(LargeBinary, deferred=True)
+    segment_index: Mapped[Optional[bytes]] = mapped_column(LargeBinary, deferred=True)
+    # Idempotency-Key of the analyze request that created this analysis
+    idempotency_key: Mapped[Optional[str]] = mapped_column(Text, unique=True)
 
     # Relationships
     media: Mapped["Media"] = relationship(back_populates="analysis")
 
+    __table_args__ = (
+        # Latest analysis per media
+        Index("ix_analysis_media_created", "media_id", "created_at"),
+        # At most one processing or done analysis per media; failed ones may be retried
+        Index(
+            "uq_analysis_media_active", "media_id",
+            unique=True,
+            postgresql_where=text("status IN ('processing', 'done')")
+        ),
+    )
+
 class Chat(Base):
     """Model for chat messages."""
 
@@ -95,3 +136,97 @@ class Chat(Base):
     updated: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     # Relationships
+
+class AnalysisJob(Base):
+    """Model for queued background analysis jobs."""
+
+    __tablename__ = 'analysis_job'
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    media_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey('media.id', ondelete='CASCADE'), nullable=False)
+    analysis_id: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True), ForeignKey('analysis.id', ondelete='CASCADE'))
+    # Owner of the media, for fair scheduling between users
+    user_id: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'))
+    status: Mapped[JobStatus] = mapped_column(Enum("queued","running","done","failed",name="job_status_enum"), nullable=False, default=JobStatus.QUEUED)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=3)
+    run_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
+    lease_owner: Mapped[Optional[str]] = mapped_column(String(255))
+    lease_expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    last_error: Mapped[Optional[str]] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # Running jobs per user, for fair claiming
+        Index("ix_analysis_job_user_status", "user_id", "status"),
+    )
+
+class AnalysisCache(Base):
+    """Model for analysis results cached by media content hash."""
+
+    __tablename__ = 'analysis_cache'
+
+    content_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    transcription: Mapped[Optional[str]] = mapped_column(Text)
+    transcript_data: Mapped[Optional[bytes]] = mapped_column(LargeBinary)
+    analysis: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    size_bytes: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    hits: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    last_accessed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+class Notification(Base):
+    """Model for outgoing notifications, sent by `NotificationDispatcher` after the enqueuing transaction commits."""
+
+    __tablename__ = 'notification_outbox'
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'))
+    channel: Mapped[str] = mapped_column(String(20), nullable=False, default='whatsapp')
+    recipient: Mapped[str] = mapped_column(String(255), nullable=False)
+    body: Mapped[str] = mapped_column(Text, nullable=False)
+    # Enqueuing the same key twice is a no-op
+    dedup_key: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
+    status: Mapped[NotificationStatus] = mapped_column(Enum("pending","sent","failed",name="notification_status_enum"), nullable=False, default=NotificationStatus.PENDING)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=5)
+    # Claiming a notification moves this forward by the lease, so a crashed dispatcher's claims are retried
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    provider_id: Mapped[Optional[str]] = mapped_column(String(64))
+    last_error: Mapped[Optional[str]] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    sent_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+
+    __table_args__ = (
+        # Due notifications, oldest first
+        Index("ix_notification_outbox_due", "status", "next_attempt_at"),
+    )
+
+class UploadSession(Base):
+    """Model for resumable multipart uploads into local storage."""
+
+    __tablename__ = 'upload_session'
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    media_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey('media.id', ondelete='CASCADE'), nullable=False)
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    file_path: Mapped[str] = mapped_column(Text, nullable=False)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    part_size: Mapped[int] = mapped_column(Integer, nullable=False)
+    received_parts: Mapped[List[int]] = mapped_column(ARRAY(Integer), nullable=False, server_default='{}')
+    status: Mapped[UploadSessionStatus] = mapped_column(Enum("uploading","completed","aborted",name="upload_session_status_enum"), nullable=False, default=UploadSessionStatus.UPLOADING)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class AnalysisBatch(Base):
+    """Model for a batch of media analyses requested together."""
+
+    __tablename__ = 'analysis_batch'
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    media_ids: Mapped[List[uuid.UUID]] = mapped_column(ARRAY(UUID(as_uuid=True)), nullable=False)
+    # Analysis of each media, in the same order; existing analyses are reused
+    analysis_ids: Mapped[List[uuid.UUID]] = mapped_column(ARRAY(UUID(as_uuid=True)), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
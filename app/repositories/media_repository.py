@@ -1,11 +1,29 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select, update, tuple_, true
 from sqlalchemy.orm import selectinload
-from typing import Optional, List
-from app.models.models import Media, UploadStatus, MediaType
+from typing import Optional, List, Tuple
+from app.models.models import Media, Analysis, UploadStatus, MediaType
 import uuid
+import base64
 from datetime import datetime
 
+
+def encode_cursor(created_at: datetime, media_id: uuid.UUID) -> str:
+    """Opaque keyset cursor pointing at a (created_at, id) position"""
+    raw = f"{created_at.isoformat()}|{media_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Inverse of `encode_cursor`; raises ValueError on malformed input"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, media_id = raw.split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(media_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
 class MediaRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
@@ -83,16 +101,53 @@ class MediaRepository:
             return result.scalar_one_or_none()
         return None
 
-    async def get_user_media(self, user_id: uuid.UUID) -> List[Media]:
-        """Get all media for a specific user"""
+    async def get_user_media(self,
+                             user_id: uuid.UUID,
+                             limit: int,
+                             cursor: Optional[Tuple[datetime, uuid.UUID]] = None) -> Tuple[List, Optional[str]]:
+        """Get one page of a user's media, newest first, with the latest analysis status.
+
+        Only the listed columns are selected. Pages are keyed on (created_at, id),
+        so `cursor` is the position of the last row of the previous page.
+
+        Returns:
+            Tuple[List, Optional[str]]: Rows of the page and the cursor of the next page, if any
+        """
+        latest_analysis = (
+            select(Analysis.status.label("analysis_status"))
+            .where(Analysis.media_id == Media.id)
+            .order_by(Analysis.created_at.desc())
+            .limit(1)
+            .lateral("latest_analysis")
+        )
         query = (
-            select(Media)
-            .options(selectinload(Media.analysis))
+            select(
+                Media.id,
+                Media.type,
+                Media.duration,
+                Media.language,
+                Media.media_thumbnail,
+                Media.created_at,
+                Media.upload_status,
+                Media.title,
+                Media.description,
+                latest_analysis.c.analysis_status
+            )
+            .outerjoin(latest_analysis, true())
             .where(Media.user_id == user_id)
-            .order_by(Media.created_at.desc())
+            .order_by(Media.created_at.desc(), Media.id.desc())
+            # One extra row tells whether another page follows
+            .limit(limit + 1)
         )
+        if cursor is not None:
+            query = query.where(tuple_(Media.created_at, Media.id) < tuple_(*cursor))
         result = await self.session.execute(query)
-        return result.scalars().all()
+        rows = result.all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+        return rows, next_cursor
 
     async def delete_media(self, media_id: uuid.UUID) -> bool:
         """Delete media by ID"""
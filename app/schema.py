@@ -0,0 +1,107 @@
+"""
+Database schema upgrades, applied on startup of the API and the worker.
+
+Tables missing from the database are created from the models. Columns and
+indexes added to tables that existed before are added with the idempotent
+statements below, so starting against an up-to-date database changes
+nothing. Every process runs this under an advisory lock, so concurrent starts
+do not race.
+"""
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from app.database import engine
+# Imported from the models module so every table is registered on its metadata
+from app.models.models import Base
+from app.config import SCHEMA_AUTO_UPGRADE
+
+# Arbitrary key of the advisory lock serializing upgrades between processes
+SCHEMA_LOCK_KEY = 7316402251
+
+# Columns and indexes added to tables that predate them, in order
+UPGRADES = [
+    # Result cache, keyframe index and multipart uploads
+    "ALTER TABLE media ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    "ALTER TABLE media ADD COLUMN IF NOT EXISTS keyframe_index BYTEA",
+    "ALTER TABLE media ADD COLUMN IF NOT EXISTS media_info JSONB",
+    "CREATE INDEX IF NOT EXISTS ix_media_content_hash ON media (content_hash)",
+    # Keyset pagination of /get-user-media
+    "CREATE INDEX IF NOT EXISTS ix_media_user_created_id ON media (user_id, created_at, id)",
+    # Structured transcripts and segment index
+    "ALTER TABLE analysis ADD COLUMN IF NOT EXISTS transcript_data BYTEA",
+    "ALTER TABLE analysis ADD COLUMN IF NOT EXISTS segment_index BYTEA",
+    # Idempotent analyze requests
+    "ALTER TABLE analysis ADD COLUMN IF NOT EXISTS idempotency_key TEXT",
+    "CREATE UNIQUE INDEX IF NOT EXISTS analysis_idempotency_key_key ON analysis (idempotency_key)",
+    "CREATE INDEX IF NOT EXISTS ix_analysis_media_created ON analysis (media_id, created_at)",
+    # Atomic analysis claims (see `start_analysis`); checked for duplicates first
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_analysis_media_active ON analysis (media_id) "
+    "WHERE status IN ('processing', 'done')",
+    # Fair job scheduling between users
+    "ALTER TABLE analysis_job ADD COLUMN IF NOT EXISTS user_id UUID REFERENCES users (id) ON DELETE CASCADE",
+    "CREATE INDEX IF NOT EXISTS ix_analysis_job_user_status ON analysis_job (user_id, status)",
+]
+
+# Indexes the application's correctness depends on, not just its speed
+REQUIRED_INDEXES = ["uq_analysis_media_active", "analysis_idempotency_key_key"]
+
+
+class SchemaError(RuntimeError):
+    """The database schema is older than the application and could not be upgraded."""
+
+
+async def _index_exists(conn: AsyncConnection, name: str) -> bool:
+    return (await conn.execute(
+        text("SELECT 1 FROM pg_indexes WHERE schemaname = current_schema() AND indexname = :name"),
+        {"name": name}
+    )).first() is not None
+
+
+async def _check_active_duplicates(conn: AsyncConnection) -> None:
+    """Raise if the unique index on active analyses cannot be built."""
+    if await _index_exists(conn, "uq_analysis_media_active"):
+        return
+    duplicates = (await conn.execute(text(
+        "SELECT count(*) FROM (SELECT media_id FROM analysis WHERE status IN ('processing', 'done') "
+        "GROUP BY media_id HAVING count(*) > 1) AS d"
+    ))).scalar()
+    if duplicates:
+        raise SchemaError(
+            f"{duplicates} media files have more than one processing or done analysis, so the "
+            "unique index uq_analysis_media_active cannot be created. Mark all but one of each "
+            "as failed, then restart."
+        )
+
+
+async def upgrade_schema(conn: AsyncConnection) -> None:
+    """Create missing tables, then add missing columns and indexes."""
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+    await conn.run_sync(Base.metadata.create_all)
+    await _check_active_duplicates(conn)
+    for statement in UPGRADES:
+        await conn.execute(text(statement))
+
+
+async def verify_schema(conn: AsyncConnection) -> None:
+    """Raise `SchemaError` if a table or a required index is missing."""
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if (await conn.execute(text("SELECT to_regclass(:name)"), {"name": table.name})).scalar() is None:
+            missing.append(f"table {table.name}")
+    for name in REQUIRED_INDEXES:
+        if not await _index_exists(conn, name):
+            missing.append(f"index {name}")
+    if missing:
+        raise SchemaError(f"Database schema is out of date, missing: {', '.join(missing)}")
+
+
+async def ensure_schema() -> None:
+    """
+    Bring the database schema up to date (unless `SCHEMA_AUTO_UPGRADE` is off)
+    and verify it. Raises `SchemaError`, so the process fails on startup
+    instead of, e.g., claiming analyses without the unique index that makes
+    the claim atomic.
+    """
+    async with engine.begin() as conn:
+        if SCHEMA_AUTO_UPGRADE:
+            await upgrade_schema(conn)
+        await verify_schema(conn)
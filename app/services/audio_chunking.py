@@ -0,0 +1,110 @@
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.services.subprocesses import run_process
+
+_SILENCE_START = re.compile(r"silence_start: (-?\d+(?:\.\d+)?)")
+_SILENCE_END = re.compile(r"silence_end: (-?\d+(?:\.\d+)?)")
+
+
+async def probe_duration(path: str) -> float:
+    """Return the duration of a media file in seconds using ffprobe."""
+    stdout, _ = await run_process([
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        path
+    ])
+    return float(stdout.decode().strip())
+
+
+async def detect_silences(path: str, noise_db: int = -35, min_silence: float = 0.4) -> List[Tuple[float, float]]:
+    """Return (start, end) pairs of silent stretches found by ffmpeg's silencedetect filter."""
+    _, stderr = await run_process([
+        "ffmpeg", "-hide_banner", "-nostats", "-i", path,
+        "-af", f"silencedetect=noise={noise_db}dB:d={min_silence}",
+        "-f", "null", "-"
+    ])
+    silences = []
+    start = None
+    for line in stderr.decode(errors="ignore").splitlines():
+        match = _SILENCE_START.search(line)
+        if match:
+            start = max(float(match.group(1)), 0.0)
+            continue
+        match = _SILENCE_END.search(line)
+        if match and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+    return silences
+
+
+def plan_chunks(duration: float,
+                silences: List[Tuple[float, float]],
+                chunk_seconds: float,
+                overlap_seconds: float) -> List[Dict[str, float]]:
+    """Split [0, duration] into chunks of roughly `chunk_seconds`.
+
+    Cut points are moved to the middle of the nearest preceding silence when one
+    exists in the last fifth of a chunk, so that words are rarely split. Each
+    chunk owns the core range [core_start, core_end) and is extracted with
+    `overlap_seconds` of extra audio on both sides.
+    """
+    midpoints = sorted((start + end) / 2 for start, end in silences)
+    search_window = chunk_seconds * 0.2
+    boundaries = [0.0]
+    while duration - boundaries[-1] > chunk_seconds:
+        target = boundaries[-1] + chunk_seconds
+        candidates = [m for m in midpoints if target - search_window <= m <= target]
+        boundaries.append(candidates[-1] if candidates else target)
+    boundaries.append(duration)
+
+    chunks = []
+    for core_start, core_end in zip(boundaries, boundaries[1:]):
+        chunks.append({
+            "core_start": core_start,
+            "core_end": core_end,
+            "start": max(0.0, core_start - overlap_seconds),
+            "end": min(duration, core_end + overlap_seconds)
+        })
+    return chunks
+
+
+async def extract_chunk(path: str, start: float, end: float, output_path: str,
+                        encoding: Optional[Sequence[str]] = None) -> str:
+    """Cut [start, end) out of an audio file, by default as 16 kHz mono MP3."""
+    encoding = encoding or ["-vn", "-ac", "1", "-ar", "16000", "-c:a", "libmp3lame", "-b:a", "64k"]
+    await run_process([
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", path,
+        *encoding,
+        output_path, "-y"
+    ])
+    return output_path
+
+
+def stitch_chunk_words(chunks: List[Dict]) -> List[Dict]:
+    """Merge per-chunk word lists into one timeline.
+
+    Each chunk dict carries its `start` offset, its core range and the `words`
+    returned for it (with timestamps relative to the chunk). Words are shifted
+    to absolute time and kept only by the chunk whose core range contains the
+    word's midpoint; a word repeated at the seam of two overlaps is dropped.
+    """
+    merged: List[Dict] = []
+    for chunk in sorted(chunks, key=lambda c: c["core_start"]):
+        offset = chunk["start"]
+        for word in chunk["words"]:
+            start = word["start"] + offset
+            end = word["end"] + offset
+            midpoint = (start + end) / 2
+            if not (chunk["core_start"] <= midpoint < chunk["core_end"]):
+                continue
+            if merged:
+                previous = merged[-1]
+                same_word = previous["word"].strip().lower() == word["word"].strip().lower()
+                if same_word and abs(previous["start"] - start) < 0.5:
+                    continue
+                if start < previous["start"]:
+                    continue
+            merged.append({"word": word["word"], "start": start, "end": end})
+    return merged
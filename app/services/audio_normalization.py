@@ -0,0 +1,179 @@
+import asyncio
+import math
+import os
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from app.services.audio_chunking import detect_silences, probe_duration
+from app.services.subprocesses import run_process
+from app.config import (
+    AUDIO_NORMALIZE,
+    AUDIO_SAMPLE_RATE,
+    AUDIO_CODEC,
+    AUDIO_BITRATE,
+    AUDIO_TRIM_MIN_SILENCE_SECONDS,
+    AUDIO_TRIM_PADDING_SECONDS,
+    AUDIO_TRIM_NOISE_DB,
+)
+
+# Container for each codec, all accepted by Whisper
+_EXTENSIONS = {"libopus": "ogg", "libvorbis": "ogg", "libmp3lame": "mp3", "aac": "m4a", "flac": "flac"}
+
+# Samples per block the trimming filter keeps or drops (20 ms)
+TRIM_BLOCK_SAMPLES = AUDIO_SAMPLE_RATE // 50
+
+
+def audio_extension() -> str:
+    """File extension of audio extracted for transcription."""
+    return speech_extension() if AUDIO_NORMALIZE else "mp3"
+
+
+def speech_extension() -> str:
+    return _EXTENSIONS.get(AUDIO_CODEC, "mka")
+
+
+def audio_encoding_args() -> List[str]:
+    """ffmpeg output options for audio extracted for transcription.
+
+    With `AUDIO_NORMALIZE` the audio is resampled to mono `AUDIO_SAMPLE_RATE`
+    and encoded with a speech codec; otherwise it is kept as high-quality MP3.
+    """
+    if not AUDIO_NORMALIZE:
+        return ["-q:a", "0"]
+    return speech_encoding_args()
+
+
+def speech_encoding_args() -> List[str]:
+    return ["-vn", "-ac", "1", "-ar", str(AUDIO_SAMPLE_RATE), "-c:a", AUDIO_CODEC, "-b:a", AUDIO_BITRATE]
+
+
+class TimelineMap:
+    """
+    Maps timestamps of silence-trimmed audio back to the original timeline.
+
+    The trimmed audio is the concatenation of the kept ranges
+    `[original_starts[i], original_starts[i] + lengths[i])`.
+    """
+
+    def __init__(self, original_starts: Sequence[float], lengths: Sequence[float]):
+        self.original_starts = np.asarray(original_starts, dtype=np.float64)
+        self.lengths = np.asarray(lengths, dtype=np.float64)
+        self.trimmed_starts = np.concatenate(([0.0], np.cumsum(self.lengths)[:-1])) if len(self.lengths) else np.empty(0)
+
+    @classmethod
+    def from_ranges(cls, ranges: Sequence[Tuple[float, float]]) -> "TimelineMap":
+        return cls([start for start, _ in ranges], [end - start for start, end in ranges])
+
+    @property
+    def trimmed_seconds(self) -> float:
+        return float(self.lengths.sum())
+
+    def to_original(self, timestamps):
+        """Original time of one or more timestamps of the trimmed audio."""
+        if not len(self.lengths):
+            return timestamps
+        values = np.asarray(timestamps, dtype=np.float64)
+        index = np.clip(np.searchsorted(self.trimmed_starts, values, side="right") - 1, 0, len(self.lengths) - 1)
+        mapped = self.original_starts[index] + (values - self.trimmed_starts[index])
+        return mapped if mapped.ndim else float(mapped)
+
+    def map_words(self, words: List[dict]) -> List[dict]:
+        """Shift word timestamps (dicts with `start` and `end`) to the original timeline."""
+        if not words:
+            return words
+        starts = self.to_original([word["start"] for word in words])
+        # Ends are mapped from just inside the word, so a word ending at a cut stays in its range
+        ends = self.to_original([max(word["end"] - 1e-6, word["start"]) for word in words])
+        return [
+            {**word, "start": float(start), "end": float(max(end, start))}
+            for word, start, end in zip(words, starts, ends)
+        ]
+
+
+def speech_ranges(silences: Sequence[Tuple[float, float]],
+                  duration: float,
+                  min_silence: float = AUDIO_TRIM_MIN_SILENCE_SECONDS,
+                  padding: float = AUDIO_TRIM_PADDING_SECONDS) -> List[Tuple[float, float]]:
+    """Ranges to keep: everything except silences longer than `min_silence`, less `padding` on each side."""
+    ranges = []
+    position = 0.0
+    for start, end in sorted(silences):
+        if end - start < max(min_silence, 2 * padding):
+            continue
+        cut_start, cut_end = max(start + padding, position), min(end - padding, duration)
+        if cut_end <= cut_start:
+            continue
+        if cut_start > position:
+            ranges.append((position, cut_start))
+        position = cut_end
+    if position < duration:
+        ranges.append((position, duration))
+    return ranges
+
+
+def snap_ranges(ranges: Sequence[Tuple[float, float]], duration: float,
+                block_seconds: float) -> List[Tuple[int, int]]:
+    """
+    Kept ranges as `[first, end)` block numbers, rounded to the nearest block
+    boundary (the final range ends with the last, possibly partial, block).
+    Ranges left empty are dropped and touching ones merged.
+    """
+    blocks: List[Tuple[int, int]] = []
+    for start, end in ranges:
+        first = round(start / block_seconds)
+        last = math.ceil(end / block_seconds - 1e-9) if end >= duration else round(end / block_seconds)
+        if last <= first:
+            continue
+        if blocks and blocks[-1][1] >= first:
+            blocks[-1] = (blocks[-1][0], max(blocks[-1][1], last))
+        else:
+            blocks.append((first, last))
+    return blocks
+
+
+def _write_text(path: str, content: str) -> None:
+    with open(path, "w") as f:
+        f.write(content)
+
+
+async def normalize_audio(input_path: str, output_path: str, trim_silence: bool = False,
+                          duration: Optional[float] = None) -> Optional[TimelineMap]:
+    """
+    Re-encode audio for transcription, optionally without its long silences.
+
+    Silences are cut in whole blocks of `TRIM_BLOCK_SAMPLES`; the returned map
+    uses the same block boundaries, so mapped timestamps are exact rather than
+    off by up to a block per cut.
+
+    Returns:
+        Optional[TimelineMap]: Mapping of the trimmed timeline back to the input, None if nothing was trimmed
+    """
+    filters = []
+    timeline = None
+    script_path = None
+    if trim_silence:
+        silences = await detect_silences(input_path, noise_db=AUDIO_TRIM_NOISE_DB, min_silence=AUDIO_TRIM_MIN_SILENCE_SECONDS)
+        if silences:
+            duration = duration if duration is not None else await probe_duration(input_path)
+            block_seconds = TRIM_BLOCK_SAMPLES / AUDIO_SAMPLE_RATE
+            blocks = snap_ranges(speech_ranges(silences, duration), duration, block_seconds)
+            if blocks and not (len(blocks) == 1 and blocks[0][0] == 0 and blocks[0][1] * block_seconds >= duration):
+                timeline = TimelineMap.from_ranges([(first * block_seconds, last * block_seconds) for first, last in blocks])
+                # `n` counts blocks; selecting by block number avoids rounding `t`
+                selected = "+".join(f"between(n,{first},{last - 1})" for first, last in blocks)
+                # One term per cut, so long meetings outgrow the argument length limit; pass it as a file
+                script_path = f"{output_path}.af"
+                await asyncio.get_event_loop().run_in_executor(None, _write_text, script_path, (
+                    f"aresample={AUDIO_SAMPLE_RATE},asetnsamples=n={TRIM_BLOCK_SAMPLES},"
+                    f"aselect='{selected}',asetpts=N/SR/TB"
+                ))
+                filters = ["-filter_script:a", script_path]
+
+    try:
+        await run_process([
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-i", input_path,
+            *filters, *speech_encoding_args(), output_path, "-y"
+        ])
+    finally:
+        if script_path is not None and os.path.exists(script_path):
+            os.remove(script_path)
+    return timeline
@@ -0,0 +1,157 @@
+import uuid
+from collections import Counter
+from typing import Dict, List
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import Analysis, AnalysisBatch, AnalysisStatus, Media
+from app.services.job_queue import MediaNotFound, get_job_queue
+from app.services.status_cache import AnalysisStage, status_cache
+from app.config import ANALYSIS_BATCH_MAX_SIZE
+
+
+class InvalidBatch(ValueError):
+    """The batch request is empty or larger than `ANALYSIS_BATCH_MAX_SIZE`."""
+
+
+class BatchNotFound(LookupError):
+    """No batch with the requested ID exists."""
+
+
+async def _claim_analyses(db: AsyncSession, media_ids: List[uuid.UUID]) -> Dict[uuid.UUID, uuid.UUID]:
+    """
+    Create PROCESSING analyses for the media files without a processing or done
+    one, in a single statement, without committing `db`.
+
+    Returns the new analysis ID of each media file that got one.
+    """
+    if not media_ids:
+        return {}
+    rows = (await db.execute(
+        insert(Analysis)
+        .values([
+            {"id": uuid.uuid4(), "media_id": media_id, "status": AnalysisStatus.PROCESSING}
+            for media_id in media_ids
+        ])
+        .on_conflict_do_nothing()
+        .returning(Analysis.media_id, Analysis.id)
+    )).all()
+    return {row.media_id: row.id for row in rows}
+
+
+async def _active_analyses(db: AsyncSession, media_ids: List[uuid.UUID]) -> Dict[uuid.UUID, uuid.UUID]:
+    if not media_ids:
+        return {}
+    rows = (await db.execute(
+        select(Analysis.media_id, Analysis.id).where(
+            Analysis.media_id.in_(media_ids),
+            Analysis.status.in_([AnalysisStatus.PROCESSING, AnalysisStatus.DONE])
+        )
+    )).all()
+    return {row.media_id: row.id for row in rows}
+
+
+async def create_batch(db: AsyncSession, user_id: uuid.UUID, media_ids: List[uuid.UUID]) -> Dict:
+    """
+    Start the analysis of many media files of one user.
+
+    Analyses are claimed with one `INSERT ... ON CONFLICT DO NOTHING`, and all
+    jobs are queued and committed together with the batch. Media files that
+    already have a processing or done analysis reuse it instead of being
+    analyzed again. The jobs are scheduled like any other, so a large batch
+    does not starve other users (see `JobQueue`).
+
+    Raises:
+        InvalidBatch: If `media_ids` is empty or too long
+        MediaNotFound: If a media file does not exist or belongs to another user
+    """
+    media_ids = list(dict.fromkeys(media_ids))
+    if not media_ids:
+        raise InvalidBatch("media_ids must not be empty")
+    if len(media_ids) > ANALYSIS_BATCH_MAX_SIZE:
+        raise InvalidBatch(f"A batch holds at most {ANALYSIS_BATCH_MAX_SIZE} media files")
+
+    owned = set((await db.execute(
+        select(Media.id).where(Media.id.in_(media_ids), Media.user_id == user_id)
+    )).scalars().all())
+    unknown = [str(media_id) for media_id in media_ids if media_id not in owned]
+    if unknown:
+        raise MediaNotFound(f"Media not found for this user: {unknown}")
+
+    created: Dict[uuid.UUID, uuid.UUID] = {}
+    analyses: Dict[uuid.UUID, uuid.UUID] = {}
+    pending = media_ids
+    for _ in range(3):
+        created.update(await _claim_analyses(db, pending))
+        analyses.update(created)
+        analyses.update(await _active_analyses(db, [m for m in pending if m not in created]))
+        # An existing analysis that failed in the meantime leaves its media unclaimed
+        pending = [media_id for media_id in pending if media_id not in analyses]
+        if not pending:
+            break
+    else:
+        raise RuntimeError(f"Could not claim analyses for media {[str(m) for m in pending]}")
+
+    batch = AnalysisBatch(
+        id=uuid.uuid4(),
+        user_id=user_id,
+        media_ids=media_ids,
+        analysis_ids=[analyses[media_id] for media_id in media_ids]
+    )
+    db.add(batch)
+    # Commits the analyses, their jobs and the batch together
+    await get_job_queue().enqueue_many(db, [
+        (media_id, analysis_id, user_id) for media_id, analysis_id in created.items()
+    ])
+    for media_id, analysis_id in created.items():
+        await status_cache.publish(media_id, AnalysisStage.QUEUED, analysis_id=analysis_id)
+
+    progress = await batch_progress(db, batch.id)
+    progress["queued"] = len(created)
+    progress["reused"] = len(media_ids) - len(created)
+    return progress
+
+
+async def batch_progress(db: AsyncSession, batch_id: uuid.UUID) -> Dict:
+    """
+    Aggregate status of a batch, plus the status and current stage of each media file.
+
+    Raises:
+        BatchNotFound: If the batch does not exist
+    """
+    batch = (await db.execute(select(AnalysisBatch).where(AnalysisBatch.id == batch_id))).scalar_one_or_none()
+    if not batch:
+        raise BatchNotFound(f"Batch {batch_id} not found")
+
+    rows = (await db.execute(
+        select(Analysis.id, Analysis.media_id, Analysis.status).where(Analysis.id.in_(batch.analysis_ids))
+    )).all()
+    statuses = {row.id: row.status for row in rows}
+
+    items = []
+    for media_id, analysis_id in zip(batch.media_ids, batch.analysis_ids):
+        status = statuses.get(analysis_id)
+        item = {"media_id": str(media_id), "analysis_id": str(analysis_id), "status": status, "stage": None}
+        entry = status_cache.get(media_id, allow_stale=True)
+        if entry and entry.get("analysis_id") == str(analysis_id):
+            item["stage"] = entry.get("stage")
+        elif status in (AnalysisStatus.DONE.value, AnalysisStatus.FAILED.value):
+            item["stage"] = status
+        items.append(item)
+
+    counts = Counter(item["status"] for item in items)
+    finished = counts[AnalysisStatus.DONE.value] + counts[AnalysisStatus.FAILED.value]
+    total = len(items)
+    return {
+        "batch_id": str(batch.id),
+        "user_id": str(batch.user_id),
+        "created_at": batch.created_at.isoformat() if batch.created_at else None,
+        "total": total,
+        "done": counts[AnalysisStatus.DONE.value],
+        "failed": counts[AnalysisStatus.FAILED.value],
+        "processing": counts[AnalysisStatus.PROCESSING.value],
+        "stages": dict(Counter(item["stage"] for item in items if item["stage"])),
+        "progress": finished / total if total else 1.0,
+        "complete": finished == total,
+        "items": items
+    }
@@ -0,0 +1,156 @@
+import asyncio
+import time
+import uuid
+from collections import deque
+from typing import Deque, Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import Analysis, AnalysisStatus, Chat
+from app.services.lru import LRUCache
+from app.config import (
+    CHAT_CONTEXT_MAX_TOKENS,
+    CHAT_CONTEXT_CACHE_SIZE,
+    CHAT_CONTEXT_TTL_SECONDS,
+    CHAT_HISTORY_LOAD_LIMIT,
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token plus message overhead)."""
+    return len(text or "") // 4 + 4
+
+
+class ConversationContext:
+    """Rolling, token-bounded chat window for one media file plus its insights."""
+
+    def __init__(self, media_id: str, insights: Optional[str], max_tokens: int = CHAT_CONTEXT_MAX_TOKENS):
+        self.media_id = media_id
+        self.insights = insights
+        # True when the insights still have to be stored as a Chat row
+        self.insights_pending = False
+        self.max_tokens = max_tokens
+        self.messages: Deque[Dict] = deque()
+        self.tokens = 0
+        self.loaded_at = time.monotonic()
+        # Serializes turns on the same conversation
+        self.lock = asyncio.Lock()
+
+    def append(self, role: str, content: str) -> None:
+        """Add a message and drop the oldest ones beyond the token budget."""
+        tokens = estimate_tokens(content)
+        self.messages.append({"role": role, "content": content, "tokens": tokens})
+        self.tokens += tokens
+        while len(self.messages) > 1 and self.tokens > self.max_tokens:
+            self.tokens -= self.messages.popleft()["tokens"]
+
+    def build_messages(self, system_prompt: str, excerpts: Optional[List[Dict]] = None,
+                       question: Optional[str] = None) -> List[Dict]:
+        """
+        OpenAI message list: system prompt, video insights, retrieved transcript
+        excerpts, the rolling window, then `question`. The question is not added
+        to the window; append it once the reply has been stored.
+        """
+        messages = [{"role": "system", "content": system_prompt}]
+        if self.insights:
+            messages.append({"role": "system", "content": f"Video insights: {self.insights}"})
+        if excerpts:
+            lines = "\n".join(f"[{excerpt['start']:.2f}s] {excerpt['text']}" for excerpt in excerpts)
+            messages.append({"role": "system", "content": f"Relevant transcript excerpts:\n{lines}"})
+        messages.extend({"role": m["role"], "content": m["content"]} for m in self.messages)
+        if question is not None:
+            messages.append({"role": "user", "content": question})
+        return messages
+
+
+class ChatContextCache:
+    """
+    In-process LRU of conversation contexts keyed by media ID.
+
+    A context is loaded from the database once and then updated incrementally
+    on every turn. Entries expire after `ttl` seconds so that messages written
+    by other API processes are picked up eventually.
+
+    Concurrent misses for one media file share a single load, so every request
+    gets the same context and its `lock` serializes their turns. A reload after
+    expiry waits for the turn in progress and keeps the expired context's lock.
+    """
+
+    def __init__(self, max_entries: int = CHAT_CONTEXT_CACHE_SIZE, ttl: float = CHAT_CONTEXT_TTL_SECONDS):
+        self.ttl = ttl
+        self._entries: LRUCache[ConversationContext] = LRUCache(max_entries)
+        # Per-media load lock and the number of requests using it
+        self._loading: Dict[str, List] = {}
+
+    def _fresh(self, key: str) -> Optional[ConversationContext]:
+        context = self._entries.get(key)
+        if context is not None and time.monotonic() - context.loaded_at < self.ttl:
+            return context
+        return None
+
+    async def get(self, db: AsyncSession, media_id: uuid.UUID) -> ConversationContext:
+        key = str(media_id)
+        context = self._fresh(key)
+        if context is not None:
+            return context
+
+        loading = self._loading.setdefault(key, [asyncio.Lock(), 0])
+        loading[1] += 1
+        try:
+            async with loading[0]:
+                # Loaded by the request this one waited for
+                context = self._fresh(key)
+                if context is not None:
+                    return context
+                stale = self._entries.peek(key)
+                if stale is None:
+                    context = await self._load(db, media_id)
+                else:
+                    async with stale.lock:
+                        context = await self._load(db, media_id)
+                    context.lock = stale.lock
+                self._entries.put(key, context)
+                return context
+        finally:
+            loading[1] -= 1
+            if not loading[1]:
+                del self._loading[key]
+
+    def invalidate(self, media_id: uuid.UUID) -> None:
+        self._entries.pop(str(media_id))
+
+    async def _load(self, db: AsyncSession, media_id: uuid.UUID) -> ConversationContext:
+        insights_query = select(Chat.message).where(
+            Chat.media_id == media_id,
+            Chat.user_type == "insights"
+        ).limit(1)
+        insights = (await db.execute(insights_query)).scalar_one_or_none()
+
+        insights_pending = False
+        if insights is None:
+            analysis_query = (
+                select(Analysis.meta)
+                .where(Analysis.media_id == media_id, Analysis.status == AnalysisStatus.DONE)
+                .order_by(Analysis.created_at.desc())
+                .limit(1)
+            )
+            meta = (await db.execute(analysis_query)).scalar_one_or_none()
+            if meta and meta.get("summary"):
+                insights = str(meta["summary"])
+                insights_pending = True
+
+        history_query = (
+            select(Chat.user_type, Chat.message)
+            .where(Chat.media_id == media_id, Chat.user_type.in_(["user", "assistant"]))
+            .order_by(Chat.created.desc())
+            .limit(CHAT_HISTORY_LOAD_LIMIT)
+        )
+        history = (await db.execute(history_query)).all()
+
+        context = ConversationContext(str(media_id), insights)
+        context.insights_pending = insights_pending
+        for user_type, message in reversed(history):
+            context.append("assistant" if user_type == "assistant" else "user", message or "")
+        return context
+
+
+chat_context_cache = ChatContextCache()
@@ -0,0 +1,125 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import aiohttp
+from app.config import (
+    OPENAI_API_KEY,
+    GROQ_API_KEY,
+    TWILIO_ACCOUNT_SID,
+    TWILIO_AUTH_TOKEN,
+    DOWNLOAD_CHUNK_SIZE,
+    HTTP_POOL_SIZE,
+    HTTP_POOL_SIZE_PER_HOST,
+    IO_EXECUTOR_WORKERS,
+    MEDIA_EXECUTOR_WORKERS,
+)
+
+
+class ClientRegistry:
+    """
+    Application-scoped API clients, HTTP connection pool, thread pools and media process pool.
+
+    Clients are created on first use and shared by every service, so
+    connections are kept alive across requests and the number of threads
+    stays bounded. Pass instances to override them (e.g. with fakes).
+    """
+
+    def __init__(self, openai=None, groq=None, twilio=None, supabase=None):
+        self._openai = openai
+        self._groq = groq
+        self._twilio = twilio
+        self._supabase = supabase
+        self._http: Optional[aiohttp.ClientSession] = None
+        # Blocking network calls (Groq, Supabase, Twilio SDKs)
+        self.io_executor = ThreadPoolExecutor(max_workers=IO_EXECUTOR_WORKERS, thread_name_prefix="io")
+        # Media work that waits on ffmpeg subprocesses
+        self.media_executor = ThreadPoolExecutor(max_workers=MEDIA_EXECUTOR_WORKERS, thread_name_prefix="media")
+        self._media_compute = None
+
+    @property
+    def openai(self):
+        if self._openai is None:
+            from openai import AsyncOpenAI
+            self._openai = AsyncOpenAI(api_key=OPENAI_API_KEY)
+        return self._openai
+
+    @property
+    def groq(self):
+        if self._groq is None:
+            from groq import Groq
+            self._groq = Groq(api_key=GROQ_API_KEY)
+        return self._groq
+
+    @property
+    def twilio(self):
+        if self._twilio is None:
+            from twilio.rest import Client
+            self._twilio = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+        return self._twilio
+
+    @property
+    def supabase(self):
+        if self._supabase is None:
+            from app.services.database import get_db
+            self._supabase = get_db()
+        return self._supabase
+
+    @property
+    def media_compute(self):
+        """Process pool for OpenCV/NumPy work; its processes start on first use."""
+        if self._media_compute is None:
+            from app.services.media_compute import MediaComputePool
+            self._media_compute = MediaComputePool(fallback_executor=self.media_executor)
+        return self._media_compute
+
+    @property
+    def http(self) -> aiohttp.ClientSession:
+        """Shared aiohttp session; must first be used from within the event loop."""
+        if self._http is None or self._http.closed:
+            connector = aiohttp.TCPConnector(limit=HTTP_POOL_SIZE, limit_per_host=HTTP_POOL_SIZE_PER_HOST)
+            self._http = aiohttp.ClientSession(connector=connector, read_bufsize=DOWNLOAD_CHUNK_SIZE)
+        return self._http
+
+    async def aclose(self) -> None:
+        """Close connection pools and wait for executor threads and processes to finish."""
+        if self._http is not None and not self._http.closed:
+            await self._http.close()
+        for client in (self._openai, self._groq):
+            close = getattr(client, "close", None)
+            if close is None:
+                continue
+            try:
+                result = close()
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                print(f"Error closing client: {str(e)}")
+        loop = asyncio.get_running_loop()
+        if self._media_compute is not None:
+            await loop.run_in_executor(None, self._media_compute.shutdown)
+        for executor in (self.io_executor, self.media_executor):
+            await loop.run_in_executor(None, executor.shutdown)
+
+
+_clients: Optional[ClientRegistry] = None
+
+
+def get_clients() -> ClientRegistry:
+    """Return the process-wide client registry, creating it on first use."""
+    global _clients
+    if _clients is None:
+        _clients = ClientRegistry()
+    return _clients
+
+
+def set_clients(registry: ClientRegistry) -> None:
+    """Install a registry, e.g. one built with fake clients."""
+    global _clients
+    _clients = registry
+
+
+async def close_clients() -> None:
+    global _clients
+    if _clients is not None:
+        await _clients.aclose()
+        _clients = None
@@ -0,0 +1,151 @@
+import os
+import cv2
+import numpy as np
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Without known keyframe times, timestamps closer than this (in seconds) to the
+# current decode position are reached by decoding forward instead of seeking,
+# which would restart decoding at the previous keyframe.
+MAX_SEQUENTIAL_GAP = 3.0
+
+
+def extract_frame(video_path: str, timestamp: float, output_path: str) -> bool:
+    """Extract a single frame at timestamp."""
+    video = cv2.VideoCapture(video_path)
+    try:
+        video.set(cv2.CAP_PROP_POS_MSEC, timestamp * 1000)
+        success, frame = video.read()
+        if success:
+            cv2.imwrite(output_path, frame)
+            return True
+        return False
+    finally:
+        video.release()
+
+
+def iter_frames(video_path: str,
+                timestamps: Iterable[float],
+                max_sequential_gap: float = MAX_SEQUENTIAL_GAP,
+                keyframe_times: Optional[Sequence[float]] = None) -> Iterator[Tuple[float, Optional[np.ndarray]]]:
+    """Decode frames at several timestamps with a single pass over the video.
+
+    The video is opened once and the timestamps are visited in ascending
+    order. With `keyframe_times` (see `keyframe_index.probe_keyframes`), the
+    decoder seeks only when a keyframe lies between the current position and
+    the next timestamp, landing on the last such keyframe, and decodes forward
+    otherwise, so no frame is decoded twice and frames before a skipped
+    keyframe are not decoded at all, however far apart the timestamps are.
+    Without them, timestamps within `max_sequential_gap` seconds are reached
+    by decoding forward and farther ones with a seek.
+
+    Yields:
+        (timestamp, BGR frame) in ascending order, with None where no frame could be read
+    """
+    keyframes = np.asarray(keyframe_times if keyframe_times is not None else [], dtype=np.float64)
+    video = cv2.VideoCapture(video_path)
+    try:
+        fps = video.get(cv2.CAP_PROP_FPS) or 0
+        position = None
+        for timestamp in sorted(set(timestamps)):
+            gap = None if position is None else timestamp - position
+            if gap is None or fps <= 0 or gap < 0:
+                seek = True
+            elif len(keyframes):
+                # A keyframe in (position, timestamp] restarts decoding closer to the target
+                seek = np.searchsorted(keyframes, timestamp, side="right") > np.searchsorted(keyframes, position, side="right")
+            else:
+                seek = gap > max_sequential_gap
+            if seek:
+                video.set(cv2.CAP_PROP_POS_MSEC, timestamp * 1000)
+            else:
+                for _ in range(int(gap * fps)):
+                    if not video.grab():
+                        break
+
+            success, frame = video.read()
+            position = video.get(cv2.CAP_PROP_POS_MSEC) / 1000
+            yield timestamp, frame if success else None
+    finally:
+        video.release()
+
+
+def extract_frames(video_path: str,
+                   timestamps: Iterable[float],
+                   output_dir: str,
+                   max_sequential_gap: float = MAX_SEQUENTIAL_GAP,
+                   keyframe_times: Optional[Sequence[float]] = None) -> Dict[float, Optional[str]]:
+    """Extract frames at several timestamps as JPEG files (see `iter_frames`).
+
+    Args:
+        video_path (str): Local path of the video
+        timestamps (Iterable[float]): Timestamps in seconds, in any order
+        output_dir (str): Directory the JPEG files are written to
+        max_sequential_gap (float): Largest gap in seconds decoded forward instead of seeking,
+            used when `keyframe_times` is not given
+        keyframe_times (Optional[Sequence[float]]): Sorted keyframe timestamps of the video
+
+    Returns:
+        Dict[float, Optional[str]]: JPEG path per requested timestamp, None where no frame could be read
+    """
+    results: Dict[float, Optional[str]] = {}
+    frames = iter_frames(video_path, timestamps, max_sequential_gap, keyframe_times)
+    for index, (timestamp, frame) in enumerate(frames):
+        if frame is None:
+            results[timestamp] = None
+            continue
+        output_path = os.path.join(output_dir, f"frame_{index}.jpg")
+        results[timestamp] = output_path if cv2.imwrite(output_path, frame) else None
+    return results
+
+
+def video_duration(video_path: str) -> float:
+    """Duration of a video in seconds from its frame count and frame rate (0 if unknown)."""
+    video = cv2.VideoCapture(video_path)
+    try:
+        fps = video.get(cv2.CAP_PROP_FPS) or 0
+        frames = video.get(cv2.CAP_PROP_FRAME_COUNT) or 0
+        return frames / fps if fps > 0 else 0.0
+    finally:
+        video.release()
+
+
+def strip_timestamps(duration: float, interval: float, max_frames: int) -> List[float]:
+    """Evenly spaced timestamps every `interval` seconds (wider for long videos, to stay within `max_frames`)."""
+    if duration <= 0 or interval <= 0 or max_frames <= 0:
+        return []
+    interval = max(interval, duration / max_frames)
+    count = int(duration // interval)
+    return [interval * (i + 0.5) for i in range(count)]
+
+
+def build_sprite_sheets(frame_paths: Sequence[str], output_dir: str, tile_width: int,
+                        columns: int, rows: int) -> Tuple[List[str], int]:
+    """Tile frames (in order) into JPEG sprite sheets of `columns` x `rows` thumbnails.
+
+    Returns:
+        Tuple[List[str], int]: Paths of the sheets and the tile height
+    """
+    first = next((frame for frame in map(cv2.imread, frame_paths[:1]) if frame is not None), None)
+    if first is None:
+        return [], 0
+    tile_height = max(int(round(first.shape[0] * tile_width / first.shape[1])), 1)
+    per_sheet = columns * rows
+    sheets: List[str] = []
+    for sheet_start in range(0, len(frame_paths), per_sheet):
+        sheet = np.zeros((rows * tile_height, columns * tile_width, 3), dtype=np.uint8)
+        for slot, frame_path in enumerate(frame_paths[sheet_start:sheet_start + per_sheet]):
+            frame = cv2.imread(frame_path)
+            if frame is None:
+                continue
+            x, y = (slot % columns) * tile_width, (slot // columns) * tile_height
+            sheet[y:y + tile_height, x:x + tile_width] = cv2.resize(
+                frame, (tile_width, tile_height), interpolation=cv2.INTER_AREA
+            )
+        sheets.append(_write_sheet(sheet, output_dir, len(sheets)))
+    return sheets, tile_height
+
+
+def _write_sheet(sheet: np.ndarray, output_dir: str, index: int) -> str:
+    path = os.path.join(output_dir, f"sprite_{index}.jpg")
+    cv2.imwrite(path, sheet, [cv2.IMWRITE_JPEG_QUALITY, 70])
+    return path
@@ -0,0 +1,573 @@
+import asyncio
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import Counter
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select, update, func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from app.models.models import Analysis, AnalysisJob, AnalysisStatus, JobStatus, Media
+from app.services.status_cache import AnalysisStage, status_cache
+from app.config import (
+    JOB_QUEUE_BACKEND,
+    JOB_LEASE_SECONDS,
+    JOB_MAX_ATTEMPTS,
+    JOB_RETRY_BASE_SECONDS,
+    JOB_RETRY_MAX_SECONDS,
+    JOB_MAX_RUNNING,
+    JOB_MAX_RUNNING_PER_USER,
+)
+
+
+@dataclass
+class Job:
+    """A job claimed by a worker."""
+    id: str
+    media_id: str
+    analysis_id: Optional[str]
+    attempts: int
+    max_attempts: int
+    # Seconds between the job becoming runnable and being claimed
+    queue_wait: float = 0.0
+
+    @property
+    def is_final_attempt(self) -> bool:
+        return self.attempts >= self.max_attempts
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff delay (seconds) before retrying a job that failed `attempts` times."""
+    return min(JOB_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)), JOB_RETRY_MAX_SECONDS)
+
+
+# (media_id, analysis_id, user_id) of a job to enqueue
+JobSpec = Tuple[uuid.UUID, Optional[uuid.UUID], Optional[uuid.UUID]]
+
+
+class JobQueue(ABC):
+    """
+    Durable queue of media analysis jobs consumed by `app.worker.Worker`.
+
+    Claims are fair between users: the next job comes from the user with the
+    fewest running jobs, oldest first. `max_running` caps running jobs across
+    all workers and `max_running_per_user` per user (0 means no cap).
+    """
+
+    def __init__(self, lease_seconds: int = JOB_LEASE_SECONDS, max_attempts: int = JOB_MAX_ATTEMPTS,
+                 max_running: int = JOB_MAX_RUNNING, max_running_per_user: int = JOB_MAX_RUNNING_PER_USER):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.max_running = max_running
+        self.max_running_per_user = max_running_per_user
+
+    async def enqueue(self, db: AsyncSession, media_id: uuid.UUID, analysis_id: Optional[uuid.UUID] = None,
+                      user_id: Optional[uuid.UUID] = None) -> str:
+        """Queue an analysis job and commit `db`, so the job lands together with its Analysis row."""
+        return (await self.enqueue_many(db, [(media_id, analysis_id, user_id)]))[0]
+
+    @abstractmethod
+    async def enqueue_many(self, db: AsyncSession, jobs: List[JobSpec]) -> List[str]:
+        """Queue several jobs and commit `db` once."""
+
+    @abstractmethod
+    async def claim(self, worker_id: str) -> Optional[Job]:
+        """Lease the next runnable job to `worker_id`, or return None if none may run now."""
+
+    @abstractmethod
+    async def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Extend the lease on a running job. Returns False if the lease was lost."""
+
+    @abstractmethod
+    async def complete(self, job_id: str, worker_id: str) -> bool:
+        """Mark a job leased to `worker_id` as done. Returns False if the lease was lost."""
+
+    @abstractmethod
+    async def fail(self, job: Job, worker_id: str, error: str) -> bool:
+        """
+        Record a failed attempt of a job leased to `worker_id`. Returns True if
+        the job was rescheduled for retry (False also if the lease was lost).
+        """
+
+    @abstractmethod
+    async def reclaim_expired(self) -> int:
+        """Requeue running jobs whose lease expired. Returns the number of reclaimed jobs."""
+
+
+async def _fail_abandoned_analyses(db: AsyncSession, analysis_ids: List) -> List[uuid.UUID]:
+    """
+    Mark the still processing analyses of jobs given up on as failed, without
+    committing `db`. Returns their media IDs, to publish once committed.
+    """
+    if not analysis_ids:
+        return []
+    return (await db.execute(
+        update(Analysis)
+        .where(Analysis.id.in_(analysis_ids), Analysis.status == AnalysisStatus.PROCESSING)
+        .values(status=AnalysisStatus.FAILED, meta={'error': 'Analysis worker lease expired'})
+        .returning(Analysis.media_id)
+    )).scalars().all()
+
+
+async def _publish_abandoned(media_ids: List[uuid.UUID]) -> None:
+    for media_id in media_ids:
+        await status_cache.publish(media_id, AnalysisStage.FAILED, error='Analysis worker lease expired')
+
+
+# Arbitrary key of the advisory lock serializing capped claims between workers
+CLAIM_LOCK_KEY = 7316402252
+
+
+class PostgresJobQueue(JobQueue):
+    """
+    Job queue backed by the `analysis_job` table, claimed with `FOR UPDATE SKIP LOCKED`.
+
+    With a cap configured, claims take a transaction-level advisory lock before
+    counting running jobs. Otherwise concurrent claims would each count the
+    jobs committed before them and could all get past the cap.
+    """
+
+    def __init__(self, session_factory=None, **kwargs):
+        super().__init__(**kwargs)
+        if session_factory is None:
+            from app.database import AsyncSessionLocal
+            session_factory = AsyncSessionLocal
+        self.session_factory = session_factory
+
+    async def enqueue_many(self, db: AsyncSession, jobs: List[JobSpec]) -> List[str]:
+        rows = [
+            AnalysisJob(
+                id=uuid.uuid4(),
+                media_id=media_id,
+                analysis_id=analysis_id,
+                user_id=user_id,
+                status=JobStatus.QUEUED,
+                max_attempts=self.max_attempts
+            )
+            for media_id, analysis_id, user_id in jobs
+        ]
+        db.add_all(rows)
+        await db.commit()
+        return [str(row.id) for row in rows]
+
+    async def claim(self, worker_id: str) -> Optional[Job]:
+        running = aliased(AnalysisJob)
+        user_running = (
+            select(func.count())
+            .select_from(running)
+            .where(running.user_id == AnalysisJob.user_id, running.status == JobStatus.RUNNING)
+            .scalar_subquery()
+        )
+        conditions = [
+            AnalysisJob.status == JobStatus.QUEUED,
+            AnalysisJob.run_at <= func.now()
+        ]
+        if self.max_running_per_user > 0:
+            conditions.append(user_running < self.max_running_per_user)
+        if self.max_running > 0:
+            all_running = select(func.count()).select_from(running).where(running.status == JobStatus.RUNNING)
+            conditions.append(all_running.scalar_subquery() < self.max_running)
+        candidate = (
+            select(AnalysisJob.id)
+            .where(*conditions)
+            .order_by(user_running, AnalysisJob.run_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        query = (
+            update(AnalysisJob)
+            .where(AnalysisJob.id == candidate)
+            .values(
+                status=JobStatus.RUNNING,
+                attempts=AnalysisJob.attempts + 1,
+                lease_owner=worker_id,
+                lease_expires_at=func.now() + timedelta(seconds=self.lease_seconds),
+                updated_at=func.now()
+            )
+            .returning(
+                AnalysisJob.id,
+                AnalysisJob.media_id,
+                AnalysisJob.analysis_id,
+                AnalysisJob.attempts,
+                AnalysisJob.max_attempts,
+                func.extract("epoch", func.now() - AnalysisJob.run_at).label("queue_wait")
+            )
+        )
+        async with self.session_factory() as db:
+            if self.max_running > 0 or self.max_running_per_user > 0:
+                # Held until commit; the claim below counts in a snapshot taken after it
+                await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CLAIM_LOCK_KEY})
+            result = await db.execute(query)
+            row = result.first()
+            await db.commit()
+        if row is None:
+            return None
+        return Job(
+            id=str(row.id),
+            media_id=str(row.media_id),
+            analysis_id=str(row.analysis_id) if row.analysis_id else None,
+            attempts=row.attempts,
+            max_attempts=row.max_attempts,
+            queue_wait=max(float(row.queue_wait or 0), 0.0)
+        )
+
+    async def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        query = (
+            update(AnalysisJob)
+            .where(
+                AnalysisJob.id == job_id,
+                AnalysisJob.status == JobStatus.RUNNING,
+                AnalysisJob.lease_owner == worker_id
+            )
+            .values(
+                lease_expires_at=func.now() + timedelta(seconds=self.lease_seconds),
+                updated_at=func.now()
+            )
+        )
+        async with self.session_factory() as db:
+            result = await db.execute(query)
+            await db.commit()
+        return result.rowcount == 1
+
+    async def complete(self, job_id: str, worker_id: str) -> bool:
+        query = (
+            update(AnalysisJob)
+            .where(
+                AnalysisJob.id == job_id,
+                AnalysisJob.status == JobStatus.RUNNING,
+                AnalysisJob.lease_owner == worker_id
+            )
+            .values(
+                status=JobStatus.DONE,
+                lease_owner=None,
+                lease_expires_at=None,
+                updated_at=func.now()
+            )
+        )
+        async with self.session_factory() as db:
+            result = await db.execute(query)
+            await db.commit()
+        return result.rowcount == 1
+
+    async def fail(self, job: Job, worker_id: str, error: str) -> bool:
+        retrying = not job.is_final_attempt
+        values = {
+            "lease_owner": None,
+            "lease_expires_at": None,
+            "last_error": error,
+            "updated_at": func.now()
+        }
+        if retrying:
+            values["status"] = JobStatus.QUEUED
+            values["run_at"] = func.now() + timedelta(seconds=retry_delay(job.attempts))
+        else:
+            values["status"] = JobStatus.FAILED
+        query = (
+            update(AnalysisJob)
+            .where(
+                AnalysisJob.id == job.id,
+                AnalysisJob.status == JobStatus.RUNNING,
+                AnalysisJob.lease_owner == worker_id
+            )
+            .values(**values)
+        )
+        async with self.session_factory() as db:
+            result = await db.execute(query)
+            await db.commit()
+        return retrying and result.rowcount == 1
+
+    async def reclaim_expired(self) -> int:
+        expired = (
+            AnalysisJob.status == JobStatus.RUNNING,
+            AnalysisJob.lease_expires_at < func.now()
+        )
+        processing = select(Analysis.id).where(Analysis.status == AnalysisStatus.PROCESSING)
+        async with self.session_factory() as db:
+            # Jobs with attempts left go back to the queue.
+            requeue = (
+                update(AnalysisJob)
+                .where(
+                    *expired,
+                    AnalysisJob.attempts < AnalysisJob.max_attempts,
+                    AnalysisJob.analysis_id.in_(processing)
+                )
+                .values(
+                    status=JobStatus.QUEUED,
+                    lease_owner=None,
+                    lease_expires_at=None,
+                    run_at=func.now(),
+                    last_error="lease expired",
+                    updated_at=func.now()
+                )
+                .returning(AnalysisJob.id)
+            )
+            reclaimed = (await db.execute(requeue)).scalars().all()
+
+            # Everything else that expired is given up on, and its analysis marked failed.
+            give_up = (
+                update(AnalysisJob)
+                .where(*expired)
+                .values(
+                    status=JobStatus.FAILED,
+                    lease_owner=None,
+                    lease_expires_at=None,
+                    last_error="lease expired",
+                    updated_at=func.now()
+                )
+                .returning(AnalysisJob.analysis_id)
+            )
+            abandoned = [a for a in (await db.execute(give_up)).scalars().all() if a]
+            failed_media = await _fail_abandoned_analyses(db, abandoned)
+            await db.commit()
+        await _publish_abandoned(failed_media)
+        return len(reclaimed)
+
+
+class InMemoryJobQueue(JobQueue):
+    """Process-local job queue for development and benchmarks.
+
+    Jobs do not survive a restart, so this backend is only useful together with
+    a worker embedded in the same process (see `EMBEDDED_WORKER`). Analyses
+    still live in the database (`session_factory`).
+    """
+
+    def __init__(self, session_factory=None, **kwargs):
+        super().__init__(**kwargs)
+        self._session_factory = session_factory
+        self._jobs: Dict[str, Dict] = {}
+        self._lock = asyncio.Lock()
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from app.database import AsyncSessionLocal
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory
+
+    async def enqueue_many(self, db: AsyncSession, jobs: List[JobSpec]) -> List[str]:
+        if db is not None:
+            await db.commit()
+        job_ids = []
+        async with self._lock:
+            for media_id, analysis_id, user_id in jobs:
+                job_id = str(uuid.uuid4())
+                self._jobs[job_id] = {
+                    "media_id": str(media_id),
+                    "analysis_id": str(analysis_id) if analysis_id else None,
+                    "user_id": user_id,
+                    "status": JobStatus.QUEUED,
+                    "attempts": 0,
+                    "run_at": time.monotonic(),
+                    "lease_owner": None,
+                    "lease_expires_at": None,
+                    "last_error": None,
+                }
+                job_ids.append(job_id)
+        return job_ids
+
+    async def claim(self, worker_id: str) -> Optional[Job]:
+        now = time.monotonic()
+        async with self._lock:
+            running = Counter(job["user_id"] for job in self._jobs.values() if job["status"] == JobStatus.RUNNING)
+            if 0 < self.max_running <= sum(running.values()):
+                return None
+            runnable: List = [
+                (running[job["user_id"]], job["run_at"], job_id) for job_id, job in self._jobs.items()
+                if job["status"] == JobStatus.QUEUED and job["run_at"] <= now
+                and not 0 < self.max_running_per_user <= running[job["user_id"]]
+            ]
+            if not runnable:
+                return None
+            _, _, job_id = min(runnable)
+            job = self._jobs[job_id]
+            job["status"] = JobStatus.RUNNING
+            job["attempts"] += 1
+            job["lease_owner"] = worker_id
+            job["lease_expires_at"] = now + self.lease_seconds
+            return Job(
+                id=job_id,
+                media_id=job["media_id"],
+                analysis_id=job["analysis_id"],
+                attempts=job["attempts"],
+                max_attempts=self.max_attempts,
+                queue_wait=now - job["run_at"]
+            )
+
+    async def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        async with self._lock:
+            job = self._leased(job_id, worker_id)
+            if not job:
+                return False
+            job["lease_expires_at"] = time.monotonic() + self.lease_seconds
+            return True
+
+    def _leased(self, job_id: str, worker_id: str) -> Optional[Dict]:
+        job = self._jobs.get(job_id)
+        if not job or job["status"] != JobStatus.RUNNING or job["lease_owner"] != worker_id:
+            return None
+        return job
+
+    async def complete(self, job_id: str, worker_id: str) -> bool:
+        async with self._lock:
+            if not self._leased(job_id, worker_id):
+                return False
+            del self._jobs[job_id]
+            return True
+
+    async def fail(self, job: Job, worker_id: str, error: str) -> bool:
+        retrying = not job.is_final_attempt
+        async with self._lock:
+            state = self._leased(job.id, worker_id)
+            if not state:
+                return False
+            if not retrying:
+                del self._jobs[job.id]
+                return False
+            state.update(
+                status=JobStatus.QUEUED,
+                lease_owner=None,
+                lease_expires_at=None,
+                last_error=error,
+                run_at=time.monotonic() + retry_delay(job.attempts)
+            )
+        return retrying
+
+    async def reclaim_expired(self) -> int:
+        now = time.monotonic()
+        reclaimed = 0
+        abandoned = []
+        async with self._lock:
+            for job_id, job in list(self._jobs.items()):
+                if job["status"] != JobStatus.RUNNING or job["lease_expires_at"] > now:
+                    continue
+                if job["attempts"] >= self.max_attempts:
+                    # Given up on; its analysis is marked failed below
+                    del self._jobs[job_id]
+                    if job["analysis_id"]:
+                        abandoned.append(uuid.UUID(job["analysis_id"]))
+                    continue
+                job.update(status=JobStatus.QUEUED, lease_owner=None, lease_expires_at=None,
+                           last_error="lease expired", run_at=now)
+                reclaimed += 1
+        if abandoned:
+            async with self.session_factory() as db:
+                failed_media = await _fail_abandoned_analyses(db, abandoned)
+                await db.commit()
+            await _publish_abandoned(failed_media)
+        return reclaimed
+
+
+class IdempotencyKeyConflict(ValueError):
+    """An idempotency key was reused for a different media file."""
+
+
+class MediaNotFound(LookupError):
+    """The media file to analyze does not exist."""
+
+
+async def _active_analysis(db: AsyncSession, media_id: uuid.UUID) -> Optional[Analysis]:
+    query = (
+        select(Analysis)
+        .where(
+            Analysis.media_id == media_id,
+            Analysis.status.in_([AnalysisStatus.PROCESSING, AnalysisStatus.DONE])
+        )
+        .order_by(Analysis.created_at.desc())
+        .limit(1)
+    )
+    return (await db.execute(query)).scalar_one_or_none()
+
+
+async def _keyed_analysis(db: AsyncSession, media_id: uuid.UUID, idempotency_key: str) -> Optional[Analysis]:
+    analysis = (await db.execute(
+        select(Analysis).where(Analysis.idempotency_key == idempotency_key)
+    )).scalar_one_or_none()
+    if analysis is not None and analysis.media_id != media_id:
+        raise IdempotencyKeyConflict("Idempotency key was already used for another media file")
+    return analysis
+
+
+async def start_analysis(db: AsyncSession, media_id: uuid.UUID,
+                         idempotency_key: Optional[str] = None) -> Tuple[Analysis, bool]:
+    """
+    Create a PROCESSING analysis for a media file and queue its job, unless one
+    is already processing or done.
+
+    The analysis is claimed with `INSERT ... ON CONFLICT DO NOTHING` against the
+    `uq_analysis_media_active` partial unique index, so concurrent requests
+    create at most one analysis. A repeated `idempotency_key` returns the
+    analysis created by the first request with that key, whatever its status.
+
+    Returns:
+        Tuple of the analysis and whether it was created
+
+    Raises:
+        MediaNotFound: If the media file does not exist
+        IdempotencyKeyConflict: If the key was used for another media file
+    """
+    user_id = (await db.execute(select(Media.user_id).where(Media.id == media_id))).scalar_one_or_none()
+    if user_id is None:
+        raise MediaNotFound(f"Media {media_id} not found")
+    if idempotency_key is not None:
+        analysis = await _keyed_analysis(db, media_id, idempotency_key)
+        if analysis is not None:
+            return analysis, False
+
+    for _ in range(3):
+        analysis_id = (await db.execute(
+            insert(Analysis)
+            .values(
+                id=uuid.uuid4(),
+                media_id=media_id,
+                status=AnalysisStatus.PROCESSING,
+                idempotency_key=idempotency_key
+            )
+            # Either unique index: an active analysis or the same idempotency key
+            .on_conflict_do_nothing()
+            .returning(Analysis.id)
+        )).scalar_one_or_none()
+        if analysis_id is not None:
+            break
+
+        # Lost the race; return the winner
+        if idempotency_key is not None:
+            analysis = await _keyed_analysis(db, media_id, idempotency_key)
+            if analysis is not None:
+                await db.commit()
+                return analysis, False
+        analysis = await _active_analysis(db, media_id)
+        if analysis is not None:
+            await db.commit()
+            return analysis, False
+        # The conflicting analysis failed in the meantime; claim again
+    else:
+        raise RuntimeError(f"Could not claim an analysis for media {media_id}")
+
+    # Queue the job for the worker pool; this commits the analysis and job together
+    await get_job_queue().enqueue(db, media_id=media_id, analysis_id=analysis_id, user_id=user_id)
+    analysis = await db.get(Analysis, analysis_id)
+    await status_cache.publish(
+        media_id, AnalysisStage.QUEUED,
+        analysis_id=analysis.id, created_at=analysis.created_at
+    )
+    return analysis, True
+
+
+_job_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide job queue for the configured `JOB_QUEUE_BACKEND`."""
+    global _job_queue
+    if _job_queue is None:
+        if JOB_QUEUE_BACKEND == "postgres":
+            _job_queue = PostgresJobQueue()
+        elif JOB_QUEUE_BACKEND == "memory":
+            _job_queue = InMemoryJobQueue()
+        else:
+            raise ValueError(f"Unknown JOB_QUEUE_BACKEND: {JOB_QUEUE_BACKEND}")
+    return _job_queue
@@ -0,0 +1,174 @@
+import io
+import uuid
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import Media
+from app.services.subprocesses import run_process
+from app.services.frame_extractor import strip_timestamps
+from app.services.lru import LRUCache
+from app.config import KEYFRAME_INDEX_CACHE_SIZE
+
+
+async def probe_keyframes(video_path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Timestamps and byte offsets of the video keyframes, read from packet headers with ffprobe (no decoding)."""
+    stdout, _ = await run_process([
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,pos,flags",
+        "-of", "csv=p=0",
+        video_path
+    ])
+    times, offsets = [], []
+    for line in stdout.decode(errors="ignore").splitlines():
+        fields = line.strip().split(",")
+        if len(fields) < 3 or not fields[2].startswith("K"):
+            continue
+        try:
+            time = float(fields[0])
+        except ValueError:
+            continue
+        times.append(time)
+        offsets.append(int(fields[1]) if fields[1].isdigit() else -1)
+    order = np.argsort(times, kind="stable")
+    return np.asarray(times, dtype=np.float64)[order], np.asarray(offsets, dtype=np.int64)[order]
+
+
+def select_frames(keyframe_times: np.ndarray, duration: float, interval: float, max_frames: int) -> List[float]:
+    """Timestamps of preview frames roughly every `interval` seconds, moved to the nearest keyframe.
+
+    Decoding at a keyframe needs no forward decoding after the seek.
+    """
+    grid = np.asarray(strip_timestamps(duration, interval, max_frames), dtype=np.float64)
+    if not len(keyframe_times) or not len(grid):
+        return grid.tolist()
+    after = np.clip(np.searchsorted(keyframe_times, grid), 0, len(keyframe_times) - 1)
+    before = np.clip(after - 1, 0, None)
+    use_before = grid - keyframe_times[before] <= np.abs(keyframe_times[after] - grid)
+    return np.unique(keyframe_times[np.where(use_before, before, after)]).tolist()
+
+
+class KeyframeIndex:
+    """
+    Keyframe timestamps and byte offsets of a video, plus the preview frames
+    decoded during processing and their position in low-resolution sprite sheets.
+
+    Stored with the media (`Media.keyframe_index`) so previews and chapter
+    thumbnails can snap to indexed frames without touching the video again.
+    """
+
+    def __init__(self,
+                 keyframe_times: np.ndarray,
+                 keyframe_offsets: np.ndarray,
+                 frame_times: np.ndarray,
+                 sheet_urls: Sequence[str] = (),
+                 tile_width: int = 0,
+                 tile_height: int = 0,
+                 columns: int = 0,
+                 rows: int = 0):
+        self.keyframe_times = np.asarray(keyframe_times, dtype=np.float64)
+        self.keyframe_offsets = np.asarray(keyframe_offsets, dtype=np.int64)
+        # Preview frames; frame i is tile i % (columns * rows) of sheet i // (columns * rows)
+        self.frame_times = np.asarray(frame_times, dtype=np.float64)
+        self.sheet_urls = list(sheet_urls)
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.columns = columns
+        self.rows = rows
+
+    @staticmethod
+    def _nearest(times: np.ndarray, timestamp: float) -> Optional[int]:
+        if not len(times):
+            return None
+        index = int(np.searchsorted(times, timestamp))
+        if index == len(times) or (index > 0 and timestamp - times[index - 1] <= times[index] - timestamp):
+            index -= 1
+        return index
+
+    def nearest_keyframe(self, timestamp: float) -> Optional[Dict]:
+        index = self._nearest(self.keyframe_times, timestamp)
+        if index is None:
+            return None
+        offset = int(self.keyframe_offsets[index])
+        return {"timestamp": float(self.keyframe_times[index]), "byte_offset": offset if offset >= 0 else None}
+
+    def nearest_frame(self, timestamp: float) -> Optional[float]:
+        index = self._nearest(self.frame_times, timestamp)
+        return None if index is None else float(self.frame_times[index])
+
+    def preview(self, timestamp: float) -> Optional[Dict]:
+        """Sprite sheet tile of the indexed frame nearest to `timestamp`, with the nearest keyframe."""
+        index = self._nearest(self.frame_times, timestamp)
+        if index is None:
+            return None
+        preview = {
+            "timestamp": float(self.frame_times[index]),
+            "keyframe": self.nearest_keyframe(timestamp),
+            "sprite": None
+        }
+        per_sheet = self.columns * self.rows
+        if per_sheet and index // per_sheet < len(self.sheet_urls):
+            slot = index % per_sheet
+            preview["sprite"] = {
+                "url": self.sheet_urls[index // per_sheet],
+                "x": (slot % self.columns) * self.tile_width,
+                "y": (slot // self.columns) * self.tile_height,
+                "width": self.tile_width,
+                "height": self.tile_height
+            }
+        return preview
+
+    def to_bytes(self) -> bytes:
+        """Keyframe and strip times, sheet URLs and tile layout as a compressed `.npz`, for `media.keyframe_index`."""
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            keyframe_times=self.keyframe_times,
+            keyframe_offsets=self.keyframe_offsets,
+            frame_times=self.frame_times,
+            sheet_urls=np.asarray(self.sheet_urls, dtype=str),
+            layout=np.asarray([self.tile_width, self.tile_height, self.columns, self.rows], dtype=np.int64)
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "KeyframeIndex":
+        arrays = np.load(io.BytesIO(data), allow_pickle=False)
+        tile_width, tile_height, columns, rows = (int(v) for v in arrays["layout"])
+        return cls(
+            arrays["keyframe_times"],
+            arrays["keyframe_offsets"],
+            arrays["frame_times"],
+            arrays["sheet_urls"].tolist(),
+            tile_width, tile_height, columns, rows
+        )
+
+
+class KeyframeIndexCache:
+    """
+    Keyframe indexes of recently previewed videos, so scrubbing a timeline does
+    not load and decompress `media.keyframe_index` on every preview request.
+    Analyses put their new index here as they finish.
+    """
+
+    def __init__(self, max_entries: int = KEYFRAME_INDEX_CACHE_SIZE):
+        self._entries: LRUCache[KeyframeIndex] = LRUCache(max_entries)
+
+    def put(self, media_id, index: KeyframeIndex) -> None:
+        self._entries.put(str(media_id), index)
+
+    async def get(self, db: AsyncSession, media_id: uuid.UUID) -> Optional[KeyframeIndex]:
+        """The index of a video, loaded from the media row on a miss; None if it has none."""
+        index = self._entries.get(str(media_id))
+        if index is not None:
+            return index
+        stored = (await db.execute(select(Media.keyframe_index).where(Media.id == media_id))).scalar_one_or_none()
+        if not stored:
+            return None
+        index = KeyframeIndex.from_bytes(stored)
+        self.put(media_id, index)
+        return index
+
+
+keyframe_index_cache = KeyframeIndexCache()
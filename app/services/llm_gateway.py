@@ -0,0 +1,207 @@
+import asyncio
+import hashlib
+import json
+import time
+from dataclasses import dataclass, field, replace
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from app.services.clients import get_clients
+from app.services.lru import LRUCache
+from app.services.metrics import llm_requests_total, llm_tokens_total, span
+from app.config import (
+    LLM_CACHE_SIZE,
+    LLM_CACHE_TTL_SECONDS,
+    LLM_MAX_CONCURRENCY,
+    LLM_MODEL_CONCURRENCY,
+)
+
+
+@dataclass
+class Completion:
+    """Text and token usage of a chat completion."""
+    content: str
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # "upstream", "stream", "cache" or "coalesced"
+    source: str = "upstream"
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+@dataclass
+class TokenUsage:
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # Tokens of requests answered from the cache or by another caller's request
+    saved_tokens: int = 0
+    by_source: Dict[str, int] = field(default_factory=dict)
+
+
+def parse_model_limits(value: str) -> Dict[str, int]:
+    """Parse "model=limit,model=limit" into a dict."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        model, _, limit = item.partition("=")
+        limits[model.strip()] = int(limit)
+    return limits
+
+
+def request_key(model: str, messages: List[Dict], params: Dict) -> str:
+    """Cache key: the model plus a hash of the prompt and request parameters."""
+    payload = json.dumps({"messages": messages, "params": params}, sort_keys=True, ensure_ascii=False)
+    return f"{model}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+class LLMGateway:
+    """
+    Single entry point for chat completions.
+
+    - Identical requests in flight at the same time share one upstream call.
+    - Completions are kept in a bounded LRU with a TTL, keyed by model and prompt hash.
+    - Streamed completions (`stream`) are neither cached nor coalesced.
+    - Upstream calls are limited per model (`LLM_MODEL_CONCURRENCY`, else `LLM_MAX_CONCURRENCY`).
+    - Token usage is counted per model, in `usage` and in the Prometheus metrics.
+    """
+
+    def __init__(self, client=None, cache_size: int = LLM_CACHE_SIZE, cache_ttl: float = LLM_CACHE_TTL_SECONDS,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, model_concurrency: Optional[Dict[str, int]] = None):
+        self._client = client
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.max_concurrency = max_concurrency
+        self.model_concurrency = parse_model_limits(LLM_MODEL_CONCURRENCY) if model_concurrency is None else model_concurrency
+        self._cache: LRUCache[Tuple[float, Completion]] = LRUCache(cache_size)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.usage: Dict[str, TokenUsage] = {}
+
+    @property
+    def client(self):
+        """The OpenAI client; the shared one unless given explicitly."""
+        return self._client or get_clients().openai
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        if model not in self._semaphores:
+            self._semaphores[model] = asyncio.Semaphore(self.model_concurrency.get(model, self.max_concurrency))
+        return self._semaphores[model]
+
+    def _cached(self, key: str) -> Optional[Completion]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, completion = entry
+        if expires_at < time.monotonic():
+            self._cache.pop(key)
+            return None
+        return completion
+
+    def _store(self, key: str, completion: Completion) -> None:
+        if self.cache_size <= 0 or self.cache_ttl <= 0:
+            return
+        self._cache.put(key, (time.monotonic() + self.cache_ttl, completion))
+
+    def _record(self, completion: Completion) -> None:
+        usage = self.usage.setdefault(completion.model, TokenUsage())
+        usage.requests += 1
+        usage.by_source[completion.source] = usage.by_source.get(completion.source, 0) + 1
+        llm_requests_total.inc(model=completion.model, source=completion.source)
+        if completion.source in ("upstream", "stream"):
+            usage.prompt_tokens += completion.prompt_tokens
+            usage.completion_tokens += completion.completion_tokens
+            llm_tokens_total.inc(completion.prompt_tokens, model=completion.model, kind="prompt")
+            llm_tokens_total.inc(completion.completion_tokens, model=completion.model, kind="completion")
+        else:
+            usage.saved_tokens += completion.total_tokens
+            llm_tokens_total.inc(completion.total_tokens, model=completion.model, kind="saved")
+
+    async def _request(self, key: str, model: str, messages: List[Dict], params: Dict, cache: bool) -> Completion:
+        async with self._semaphore(model):
+            with span("openai_request"):
+                response = await self.client.chat.completions.create(model=model, messages=messages, **params)
+        usage = getattr(response, "usage", None)
+        completion = Completion(
+            content=response.choices[0].message.content,
+            model=model,
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0
+        )
+        # Counted here rather than by the caller, which may have been cancelled
+        self._record(completion)
+        if cache:
+            self._store(key, completion)
+        return completion
+
+    async def complete(self, model: str, messages: List[Dict], cache: bool = True, **params) -> Completion:
+        """
+        Chat completion for `messages`; extra keyword arguments are passed to the API.
+
+        With `cache=False` the result is neither read from nor written to the
+        cache, but identical concurrent requests are still coalesced.
+        """
+        key = request_key(model, messages, params)
+        cached = self._cached(key) if cache else None
+        if cached is not None:
+            completion = replace(cached, source="cache")
+            self._record(completion)
+            return completion
+
+        task = self._inflight.get(key)
+        source = "coalesced"
+        if task is None:
+            source = "upstream"
+            task = asyncio.create_task(self._request(key, model, messages, params, cache))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        try:
+            # Shielded, so a cancelled caller does not cancel the call the others wait for
+            completion = await asyncio.shield(task)
+        except Exception:
+            llm_requests_total.inc(model=model, source="error")
+            raise
+        if source == "coalesced":
+            completion = replace(completion, source=source)
+            self._record(completion)
+        return completion
+
+    async def stream(self, model: str, messages: List[Dict], **params) -> AsyncIterator[str]:
+        """
+        Streamed chat completion; yields the content deltas as they arrive.
+
+        The model's concurrency slot is held until the stream ends, and the
+        token usage reported in the last chunk is recorded. Close the generator
+        (e.g. with `contextlib.aclosing`) when stopping early, so the upstream
+        stream and the slot are released at once.
+        """
+        parts = []
+        usage = None
+        async with self._semaphore(model):
+            with span("openai_stream"):
+                response = await self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    **params
+                )
+                try:
+                    async for chunk in response:
+                        usage = getattr(chunk, "usage", None) or usage
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            parts.append(delta)
+                            yield delta
+                finally:
+                    await response.close()
+        self._record(Completion(
+            content="".join(parts),
+            model=model,
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            source="stream"
+        ))
+
+
+llm_gateway = LLMGateway()
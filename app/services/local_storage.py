@@ -0,0 +1,97 @@
+from typing import AsyncIterator, Dict, List, Optional
+from datetime import datetime
+from fastapi import HTTPException
+import os
+import shutil
+import asyncio
+from app.services.clients import ClientRegistry, get_clients
+from app.services.storage_service import write_chunks
+from app.config import DOWNLOAD_CHUNK_SIZE, LOCAL_STORAGE_ROOT, LOCAL_STORAGE_URL
+
+
+class LocalStorageService:
+    """Stand-in for `StorageService` that keeps files under a local directory.
+
+    Implements the same methods, so it can replace Supabase storage in
+    development and benchmarks. Paths are relative to `root`.
+    """
+
+    def __init__(self, root: str = LOCAL_STORAGE_ROOT, base_url: Optional[str] = LOCAL_STORAGE_URL,
+                 clients: Optional[ClientRegistry] = None):
+        self.root = os.path.abspath(root)
+        self.base_url = (base_url or f"file://{self.root}").rstrip("/")
+        self.executor = (clients or get_clients()).io_executor
+        os.makedirs(self.root, exist_ok=True)
+
+    def local_path(self, file_path: str) -> str:
+        """Absolute path of a stored file; rejects paths escaping the storage root."""
+        path = os.path.abspath(os.path.join(self.root, file_path))
+        if os.path.commonpath([path, self.root]) != self.root:
+            raise HTTPException(status_code=400, detail=f"Invalid file path: {file_path}")
+        return path
+
+    def file_url(self, file_path: str) -> str:
+        return f"{self.base_url}/{file_path}"
+
+    async def generate_presigned_url(self, file_name: str, file_type: str, user_id: str) -> Dict:
+        """Same response as `StorageService.generate_presigned_url`; the upload URL is the local file URL."""
+        file_path = f"{user_id}/{datetime.now().timestamp()}_{file_name}"
+        return {
+            'upload_url': self.file_url(file_path),
+            'file_url': self.file_url(file_path),
+            'file_path': file_path
+        }
+
+    async def stream_media(self, file_path: str, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Read a stored file in chunks (in the I/O thread pool)."""
+        chunk_size = chunk_size or DOWNLOAD_CHUNK_SIZE
+        loop = asyncio.get_event_loop()
+        try:
+            with open(self.local_path(file_path), 'rb') as f:
+                while True:
+                    chunk = await loop.run_in_executor(self.executor, f.read, chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail=f"File not found: {file_path}")
+
+    async def download_video(self, file_path: str, local_path: str, digest=None) -> str:
+        """Copy a stored file to `local_path`, updating `digest` with its bytes."""
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        await write_chunks(self.stream_media(file_path), local_path, self.executor, digest)
+        return local_path
+
+    async def upload_file(self, file_path: str, destination_path: str, content_type: str) -> Dict:
+        """Copy a local file into storage."""
+        try:
+            destination = self.local_path(destination_path)
+
+            def copy_sync():
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                shutil.copyfile(file_path, destination)
+
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(self.executor, copy_sync)
+            return {
+                'file_url': self.file_url(destination_path),
+                'file_path': destination_path
+            }
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error uploading file: {str(e)}")
+
+    async def delete_files(self, file_paths: List[str]) -> None:
+        """Delete stored files; files already gone are ignored."""
+        paths = [self.local_path(file_path) for file_path in file_paths]
+
+        def delete_sync():
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self.executor, delete_sync)
@@ -0,0 +1,121 @@
+import re
+from typing import Dict, List, Optional
+
+_TIMESTAMP = re.compile(r"^\[(\d+(?:\.\d+)?)s\]")
+
+MAP_PROMPT = (
+    "You are an expert summarizer. You are given one consecutive part of a longer meeting transcription. "
+    "Return a JSON object with the following fields:\n\n"
+    "- chapters: A list of the topics discussed in this part. Each chapter should include:\n"
+    "  - chapter_title: A meaningful title that captures the main idea of the section.\n"
+    "  - timestamp: The timestamp in [XX.XXs] format where the chapter begins (must match a timestamp of this part exactly).\n"
+    "  - content: A rich, detailed explanation of the discussion in this chapter, focusing on key insights, debates, and conclusions.\n"
+    "- summary: A detailed summary of this part.\n"
+    "- decisions: A list of decisions or agreements reached in this part.\n"
+    "- action_items: A list of specific, actionable steps or tasks raised in this part.\n\n"
+    "Important:\n"
+    "- Preserve exact timestamps from the transcription.\n"
+    "- Use professional, objective language."
+)
+
+REDUCE_PROMPT = (
+    "You are an expert summarizer and insight generator. You are given the summaries, chapters, decisions and "
+    "action items extracted from consecutive parts of one meeting, in order. Combine them into a JSON object "
+    "with the following fields:\n\n"
+    "- video_title: A clear, compelling title that reflects the core theme or purpose of the discussion.\n"
+    "- description: A concise yet informative summary of the overall content and its context.\n"
+    "- final_decision: The primary decision or consensus, if any, reached by the end of the discussion.\n"
+    "- action_items: A clear, de-duplicated list of specific, actionable steps or tasks.\n"
+    "- summary: A comprehensive and cohesive summary that reflects the full context, key themes, and critical takeaways of the content.\n\n"
+    "Use professional, objective language. Prioritize depth, relevance, and clarity."
+)
+
+
+def split_transcript(transcription: str, max_chars: int) -> List[str]:
+    """Split a formatted transcription into windows of at most `max_chars`.
+
+    Windows are cut between `[XX.XXs]` segment lines, so every window starts at
+    a segment timestamp; a single oversized segment becomes its own window.
+    """
+    windows: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in transcription.splitlines(keepends=True):
+        if current and size + len(line) > max_chars:
+            windows.append("".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line)
+    if current:
+        windows.append("".join(current))
+    return windows
+
+
+def segment_starts(window: str) -> List[float]:
+    """Timestamps of the segments in a transcription window."""
+    starts = []
+    for line in window.splitlines():
+        match = _TIMESTAMP.match(line)
+        if match:
+            starts.append(float(match.group(1)))
+    return starts
+
+
+def _parse_timestamp(timestamp: str) -> Optional[float]:
+    try:
+        return float(str(timestamp).strip("[]s"))
+    except ValueError:
+        return None
+
+
+def snap_chapters(chapters: List[Dict], starts: List[float]) -> List[Dict]:
+    """Snap chapter timestamps to the nearest segment start of their window.
+
+    Keeps chapter timestamps exact even when the model rounds or invents one.
+    """
+    if not starts:
+        return chapters
+    for chapter in chapters:
+        value = _parse_timestamp(chapter.get("timestamp", ""))
+        if value is None:
+            value = starts[0]
+        nearest = min(starts, key=lambda start: abs(start - value))
+        chapter["timestamp"] = f"[{nearest:.2f}s]"
+    return chapters
+
+
+def reduce_input(map_results: List[Dict]) -> str:
+    """Render the per-window results as the user message of the reduce step."""
+    parts = []
+    for index, result in enumerate(map_results, start=1):
+        chapters = "\n".join(
+            f"  {chapter.get('timestamp', '')} {chapter.get('chapter_title', '')}"
+            for chapter in result.get("chapters", [])
+        )
+        decisions = "\n".join(f"  - {d}" for d in result.get("decisions", []))
+        actions = "\n".join(f"  - {a}" for a in result.get("action_items", []))
+        parts.append(
+            f"Part {index}\n"
+            f"Summary: {result.get('summary', '')}\n"
+            f"Chapters:\n{chapters}\n"
+            f"Decisions:\n{decisions}\n"
+            f"Action items:\n{actions}\n"
+        )
+    return "\n".join(parts)
+
+
+def merge_results(map_results: List[Dict], reduce_result: Dict) -> Dict:
+    """Combine map and reduce outputs into the single-call analysis schema."""
+    chapters = [chapter for result in map_results for chapter in result.get("chapters", [])]
+    chapters.sort(key=lambda chapter: _parse_timestamp(chapter.get("timestamp", "")) or 0.0)
+    action_items = reduce_result.get("action_items")
+    if action_items is None:
+        action_items = [item for result in map_results for item in result.get("action_items", [])]
+    return {
+        "video_title": reduce_result.get("video_title", ""),
+        "description": reduce_result.get("description", ""),
+        "chapters": chapters,
+        "final_decision": reduce_result.get("final_decision", ""),
+        "action_items": action_items,
+        "summary": reduce_result.get("summary", "")
+    }
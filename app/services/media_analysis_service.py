@@ -1,55 +1,117 @@
 import os
 import json
-import cv2
+import hashlib
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, Optional, Sequence, Tuple
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 from app.models.models import Media, Analysis, AnalysisStatus, User
 from app.services.storage_service import StorageService
-from app.services.video_to_audio import convert_video_to_audio_async
+from app.services.video_to_audio import convert_video_to_audio_async, stream_video_to_audio_async
+from app.services.audio_normalization import audio_extension, normalize_audio, speech_extension
 from app.services.transcription_service import TranscriptionService
+from app.services.frame_extractor import MAX_SEQUENTIAL_GAP, build_sprite_sheets, extract_frames, video_duration
+from app.services.keyframe_index import (
+    KeyframeIndex,
+    keyframe_index_cache,
+    probe_keyframes,
+    select_frames,
+)
+from app.services.pipeline import StageGraph
+from app.services.result_cache import ResultCache, hash_chunks
+from app.services.segment_index import SegmentIndex, segment_index_cache
+from app.services.structured_transcript import StructuredTranscript
+from app.services.status_cache import AnalysisStage, status_cache
+from app.services.metrics import span
+from app.services.map_reduce_analysis import (
+    MAP_PROMPT,
+    REDUCE_PROMPT,
+    split_transcript,
+    segment_starts,
+    snap_chapters,
+    reduce_input,
+    merge_results,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
-from openai import AsyncOpenAI
-from app.config import OPENAI_API_KEY
+from app.config import (
+    STREAMING_INGEST,
+    RESULT_CACHE_ENABLED,
+    ANALYSIS_WINDOW_CHARS,
+    ANALYSIS_MAX_CONCURRENCY,
+    KEYFRAME_STRIP_SECONDS,
+    KEYFRAME_STRIP_MAX_FRAMES,
+    SPRITE_SHEETS,
+    SPRITE_TILE_WIDTH,
+    SPRITE_COLUMNS,
+    SPRITE_ROWS,
+    AUDIO_NORMALIZE,
+    AUDIO_TRIM_SILENCE,
+)
 import tempfile
 import uuid
+import bisect
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from app.services.send_notification import send_whatsapp_message
+import numpy as np
+from app.services.clients import ClientRegistry, get_clients
+from app.services.llm_gateway import LLMGateway, llm_gateway
+from app.services.notifications import enqueue_notification
+
+# Video thumbnail at the 10 second mark
+COVER_TIMESTAMP = 10.0
 
 class MediaAnalysisService:
-    def __init__(self, db: AsyncSession, storage_service: StorageService):
+    def __init__(self, db: AsyncSession, storage_service: StorageService, clients: Optional[ClientRegistry] = None):
+        clients = clients or get_clients()
         self.db = db
         self.storage_service = storage_service
-        self.transcription_service = TranscriptionService()
-        self.openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
-        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.transcription_service = TranscriptionService(groq_client=clients.groq, executor=clients.io_executor)
+        # The shared gateway, so identical prompts from concurrent jobs share one request
+        self.llm = llm_gateway if clients is get_clients() else LLMGateway(client=clients.openai)
+        self.executor = clients.media_executor
+        self.compute = clients.media_compute
+        self.result_cache = ResultCache(db)
+        # URLs by storage path of the frames and sprite sheets uploaded for the current media
+        # (None while uploading)
+        self._uploads: Dict[str, Optional[str]] = {}
         
-    async def _send_whatsapp_notification(self, user_id: str, media_title: str, media_id: str) -> None:
-        """Send WhatsApp notification if enabled for the user."""
+    async def _enqueue_completion_notification(self, media: Media, analysis: Analysis) -> None:
+        """Add the WhatsApp "analysis complete" message to the outbox if enabled for the user.
+
+        Not committed here: it is saved together with the finished analysis.
+        """
         try:
             # Get user details
-            query = select(User).where(User.id == user_id)
-            result = await self.db.execute(query)
-            user = result.scalar_one_or_none()
+            query = select(User.notification_active, User.phone_number).where(User.id == media.user_id)
+            user = (await self.db.execute(query)).first()
 
             if user and user.notification_active and user.phone_number:
-                message = f"🎥 Your meeting '{media_title}' analysis is complete!\n\n"
-                message += f"View insights here: http://localhost:3000/insights/{media_id}\n\n"
+                message = f"🎥 Your meeting '{media.title}' analysis is complete!\n\n"
+                message += f"View insights here: http://localhost:3000/insights/{media.id}\n\n"
                 message += "Powered by MeetingIQ Pro 🚀"
-                
-                send_whatsapp_message(message, user.phone_number)
-                print(f"WhatsApp notification sent to user {user_id}")
+
+                # In a savepoint, so a failure here cannot roll back the analysis
+                async with self.db.begin_nested():
+                    await enqueue_notification(
+                        self.db, user.phone_number, message,
+                        dedup_key=f"analysis-done:{analysis.id}", user_id=media.user_id
+                    )
+                print(f"WhatsApp notification queued for user {media.user_id}")
             else:
-                print(f"WhatsApp notification not enabled for user {user_id}")
+                print(f"WhatsApp notification not enabled for user {media.user_id}")
         except Exception as e:
-            print(f"Failed to send WhatsApp notification: {str(e)}")
+            print(f"Failed to queue WhatsApp notification: {str(e)}")
             # Don't raise the exception to avoid failing the whole process
 
-    async def process_media(self, media_id: str) -> Dict:
-        """Process a media file (video or audio) and generate analysis."""
+    async def process_media(self, media_id: str, fail_analysis: bool = True) -> Dict:
+        """Process a media file (video or audio) and generate analysis.
+
+        When `fail_analysis` is False the analysis is left in PROCESSING on error,
+        so that a retried job can pick it up again.
+        """
         analysis = None
+        # Analysis result stored in the result cache, which refers to its thumbnails
+        cached_result = None
+        self._uploads = {}
         try:
             print(f"Starting analysis for media_id: {media_id}")
             
@@ -67,13 +129,18 @@ class MediaAnalysisService:
             analysis_query = select(Analysis).where(
                 Analysis.media_id == media_id,
                 Analysis.status == AnalysisStatus.PROCESSING
-            )
+            ).order_by(Analysis.created_at.desc()).limit(1)
             analysis_result = await self.db.execute(analysis_query)
             analysis = analysis_result.scalar_one_or_none()
             
             if not analysis:
                 print("No processing analysis found, this shouldn't happen")
                 return {"error": "No analysis record found"}
+
+            await status_cache.publish(
+                media_id, AnalysisStage.DOWNLOADING,
+                analysis_id=analysis.id, created_at=analysis.created_at
+            )
                 
             with tempfile.TemporaryDirectory() as temp_dir:
                 print(f"Using temp directory: {temp_dir}")
@@ -82,49 +149,89 @@ class MediaAnalysisService:
                 media_extension = 'mp4' if media.type == 'video' else 'mp3'
                 media_path = os.path.join(temp_dir, f"media_file.{media_extension}")
                 
-                print(f"Downloading media to: {media_path}")
-                await self.storage_service.download_video(media.file_path, media_path)
-                
-                # Convert video to audio if needed (run in thread pool to avoid blocking)
-                audio_path = os.path.join(temp_dir, "audio.mp3")
-                if media.type == 'video':
-                    print("Converting video to audio...")
-                    await convert_video_to_audio_async(media_path, audio_path, self.executor)
+                # Hash the media while it downloads to look up earlier results
+                digest = hashlib.sha256()
+                audio_path = os.path.join(temp_dir, f"audio.{audio_extension()}")
+                audio_ready = False
+                if media.type == 'video' and STREAMING_INGEST:
+                    # Extract audio while the video downloads
+                    print(f"Streaming media to: {media_path}")
+                    with span("download_extract_audio") as download_span:
+                        download_span.bytes = await stream_video_to_audio_async(
+                            hash_chunks(self.storage_service.stream_media(media.file_path), digest),
+                            media_path,
+                            audio_path,
+                            self.executor
+                        )
+                    audio_ready = True
                 else:
-                    audio_path = media_path
-                
-                print("Starting transcription...")
-                # Transcribe using Groq's Whisper model
-                transcription = await self.transcription_service.transcribe_audio(audio_path)
-                
-                print("Generating analysis...")
-                # Generate analysis using OpenAI (now async)
-                analysis_result = await self._generate_analysis(transcription)
-                
-                # If video, extract frames for each chapter (run in thread pool)
-                if media.type == 'video':
-                    print("Extracting chapter thumbnails...")
-                    analysis_result = await self._add_chapter_thumbnails_async(media_path, analysis_result)
+                    print(f"Downloading media to: {media_path}")
+                    with span("download") as download_span:
+                        await self.storage_service.download_video(media.file_path, media_path, digest=digest)
+                        download_span.bytes = os.path.getsize(media_path)
+
+                media.content_hash = digest.hexdigest()
+                keyframe_index = None
+                cached = None
+                if RESULT_CACHE_ENABLED:
+                    with span("cache_lookup"):
+                        cached = await self.result_cache.get(media.content_hash)
+
+                if cached:
+                    print(f"Reusing cached analysis for content hash {media.content_hash}")
+                    transcription = cached["transcription"]
+                    analysis_result = cached["analysis"]
+                    transcript = (
+                        StructuredTranscript.from_bytes(cached["transcript_data"])
+                        if cached.get("transcript_data") else None
+                    )
+                    if media.type == 'video':
+                        keyframe_index = await self._copy_keyframe_index(media)
                 else:
-                    # For audio files, set thumbnail_url to None
-                    for chapter in analysis_result.get('chapters', []):
-                        chapter['thumbnail_url'] = None
-                
+                    transcript, transcription, analysis_result, keyframe_index = await self._run_analysis_stages(
+                        media_id, media.type, media_path, audio_path, audio_ready, temp_dir
+                    )
+
+                    if RESULT_CACHE_ENABLED:
+                        with span("cache_store"):
+                            await self.result_cache.put(
+                                media.content_hash, transcription, analysis_result, transcript.to_bytes()
+                            )
+                        cached_result = analysis_result
+
+                # Index the transcript segments for chat retrieval
+                # (a cheap BM25 build, so on the media threads rather than the compute pool)
+                loop = asyncio.get_event_loop()
+                with span("index"):
+                    if transcript is not None:
+                        segment_index = await loop.run_in_executor(
+                            self.executor, SegmentIndex.from_transcript, transcript
+                        )
+                    else:
+                        segment_index = await loop.run_in_executor(
+                            self.executor, SegmentIndex.from_transcription, transcription
+                        )
+
                 # Update analysis record
+                analysis.segment_index = segment_index.to_bytes()
+                analysis.transcript_data = transcript.to_bytes() if transcript is not None else None
                 analysis.status = AnalysisStatus.DONE
                 analysis.meta = analysis_result
                 analysis.transcription = transcription
                 media.title = analysis_result.get('video_title', '')
                 media.description = analysis_result.get('description', '')
                 media.media_thumbnail = analysis_result.get('thumbnail_url', '')
-                await self.db.commit()
-                
-                # Send WhatsApp notification
-                await self._send_whatsapp_notification(
-                    user_id=media.user_id,
-                    media_title=media.title,
-                    media_id=media_id
-                )
+                if keyframe_index is not None:
+                    media.keyframe_index = keyframe_index.to_bytes()
+                with span("notify"):
+                    await self._enqueue_completion_notification(media, analysis)
+                with span("save"):
+                    await self.db.commit()
+                self._uploads = {}
+                segment_index_cache.put(media_id, segment_index)
+                if keyframe_index is not None:
+                    keyframe_index_cache.put(media_id, keyframe_index)
+                await status_cache.publish(media_id, AnalysisStage.DONE)
                 
                 print(f"Analysis completed successfully for media_id: {media_id}")
                 
@@ -132,39 +239,167 @@ class MediaAnalysisService:
                 
         except Exception as e:
             print(f"Analysis failed for media_id {media_id}: {str(e)}")
+            await self._delete_unreferenced_uploads(cached_result)
             # Update analysis record with error
-            if analysis:
+            if analysis and fail_analysis:
                 analysis.status = AnalysisStatus.FAILED
                 analysis.meta = {'error': str(e)}
                 await self.db.commit()
+                await status_cache.publish(media_id, AnalysisStage.FAILED, error=str(e))
+            elif analysis:
+                await status_cache.publish(media_id, AnalysisStage.RETRYING, error=str(e))
             raise
     
+    async def _delete_unreferenced_uploads(self, cached_result: Optional[Dict]) -> None:
+        """
+        Delete the frames and sprite sheets uploaded for a failed analysis,
+        except the thumbnails of a result already stored in the result cache.
+        Covers and sprite sheets are uploaded while the transcript is still
+        being analyzed, so a failure there would otherwise leave them behind.
+        """
+        keep = set()
+        if cached_result:
+            keep.add(cached_result.get('thumbnail_url'))
+            keep.update(chapter.get('thumbnail_url') for chapter in cached_result.get('chapters', []))
+        paths = [path for path, url in self._uploads.items() if url is None or url not in keep]
+        self._uploads = {}
+        if not paths:
+            return
+        try:
+            await self.storage_service.delete_files(paths)
+            print(f"Deleted {len(paths)} uploads of the failed analysis")
+        except Exception as e:
+            print(f"Error deleting uploads of the failed analysis: {str(e)}")
+
+    async def _run_analysis_stages(self, media_id: str, media_type: str, media_path: str,
+                                   audio_path: str, audio_ready: bool, temp_dir: str):
+        """
+        Transcribe, analyze and thumbnail a downloaded media file.
+
+        The steps run as a DAG: the cover thumbnail and the keyframe index
+        are built while audio is extracted, transcribed and analyzed; only
+        the chapter thumbnails wait for the analysis.
+
+        Returns:
+            Tuple of the structured transcript, its formatted text, the analysis
+            and the keyframe index (None for audio)
+        """
+        is_video = media_type == 'video'
+        if not is_video:
+            audio_path = media_path
+        graph = StageGraph()
+
+        async def extract_audio():
+            # Convert video to audio if needed (run in thread pool to avoid blocking)
+            print("Converting video to audio...")
+            await status_cache.publish(media_id, AnalysisStage.EXTRACTING_AUDIO)
+            with span("extract_audio") as extract_span:
+                await convert_video_to_audio_async(media_path, audio_path, self.executor)
+                extract_span.bytes = os.path.getsize(media_path)
+
+        async def normalize(**_):
+            # Re-encode uploaded audio (video audio is extracted that way) and trim silences
+            normalized_path = os.path.join(temp_dir, f"normalized.{speech_extension()}")
+            try:
+                with span("normalize_audio") as normalize_span:
+                    normalize_span.bytes = os.path.getsize(audio_path)
+                    timeline = await normalize_audio(audio_path, normalized_path, trim_silence=AUDIO_TRIM_SILENCE)
+            except Exception as e:
+                print(f"Audio normalization failed, transcribing the original audio: {str(e)}")
+                return audio_path, None
+            print(f"Normalized audio: {os.path.getsize(audio_path)} -> {os.path.getsize(normalized_path)} bytes"
+                  + (f", {timeline.trimmed_seconds:.0f}s after trimming silences" if timeline else ""))
+            return normalized_path, timeline
+
+        async def transcribe(normalize=None, **_):
+            path, timeline = normalize or (audio_path, None)
+            print("Starting transcription...")
+            await status_cache.publish(media_id, AnalysisStage.TRANSCRIBING)
+            # Transcribe using Groq's Whisper model
+            with span("transcribe") as transcribe_span:
+                transcribe_span.bytes = os.path.getsize(path)
+                return await self.transcription_service.transcribe_structured(path, timeline=timeline)
+
+        async def analyze(transcribe):
+            print("Generating analysis...")
+            await status_cache.publish(media_id, AnalysisStage.ANALYZING)
+            transcription = transcribe.format()
+            with span("analyze") as analyze_span:
+                analyze_span.bytes = len(transcription.encode())
+                return await self._generate_analysis(transcription)
+
+        async def cover():
+            return await self._extract_cover(media_path, os.path.join(temp_dir, "cover"))
+
+        async def keyframes():
+            return await self._build_keyframe_index(media_path, os.path.join(temp_dir, "strip"))
+
+        async def chapter_thumbnails(analyze, transcribe, cover, keyframes):
+            print("Extracting chapter thumbnails...")
+            await status_cache.publish(media_id, AnalysisStage.THUMBNAILS)
+            with span("thumbnails"):
+                frames, index = keyframes
+                analysis_result = await self._add_chapter_thumbnails_async(
+                    media_path, analyze, transcribe, keyframes=frames, with_cover=False,
+                    keyframe_times=index.keyframe_times if index is not None else None
+                )
+            analysis_result['thumbnail_url'] = cover
+            return analysis_result
+
+        if is_video and not audio_ready:
+            graph.add("extract_audio", extract_audio)
+        if (AUDIO_NORMALIZE and not is_video) or AUDIO_TRIM_SILENCE:
+            graph.add("normalize", normalize, after=["extract_audio"] if "extract_audio" in graph else [])
+        audio_stage = next((name for name in ("normalize", "extract_audio") if name in graph), None)
+        graph.add("transcribe", transcribe, after=[audio_stage] if audio_stage else [])
+        graph.add("analyze", analyze, after=["transcribe"])
+        if is_video:
+            graph.add("cover", cover)
+            graph.add("keyframes", keyframes)
+            graph.add("thumbnails", chapter_thumbnails, after=["analyze", "transcribe", "cover", "keyframes"])
+
+        results = await graph.run()
+        transcript = results["transcribe"]
+        keyframe_index = None
+        if is_video:
+            analysis_result = results["thumbnails"]
+            keyframe_index = results["keyframes"][1]
+        else:
+            # For audio files, set thumbnail_url to None
+            analysis_result = results["analyze"]
+            for chapter in analysis_result.get('chapters', []):
+                chapter['thumbnail_url'] = None
+        return transcript, transcript.format(), analysis_result, keyframe_index
+
     async def _generate_analysis(self, transcription: str) -> Dict:
         """Generate structured analysis using OpenAI."""
+        if len(transcription) > ANALYSIS_WINDOW_CHARS:
+            return await self._generate_analysis_map_reduce(transcription)
+
         print("Generating analysis with OpenAI...")
         
         try:
-            response = await self.openai_client.chat.completions.create(
+            completion = await self.llm.complete(
                 model="gpt-4o-mini",
                 messages=[
                     {
-  "role": "system",
-  "content": "You are an expert summarizer and insight generator. Analyze the provided transcription carefully and return a high-quality, well-structured JSON object with the following fields:\n\n"
-            "- video_title: A clear, compelling title that reflects the core theme or purpose of the discussion.\n"
-            "- description: A concise yet informative summary of the overall content and its context.\n"
-            "- chapters: A list of major segments or topics discussed. Each chapter should include:\n"
-            "  - chapter_title: A meaningful title that captures the main idea of the section.\n"
-            "  - timestamp: The timestamp in [XX.XXs] format where the chapter begins (must match the transcription exactly).\n"
-            "  - content: A rich, detailed explanation of the discussion in this chapter, focusing on key insights, debates, and conclusions.\n"
-            "- final_decision: The primary decision or consensus, if any, reached by the end of the discussion.\n"
-            "- action_items: A clear list of specific, actionable steps or tasks derived from the conversation.\n"
-            "- summary: A comprehensive and cohesive summary that reflects the full context, key themes, and critical takeaways of the content.\n\n"
-            "Important:\n"
-            "- Preserve exact timestamps from the transcription.\n"
-            "- Ensure each section is clear, insightful, and avoids superficial summaries.\n"
-            "- Use professional, objective language. Prioritize depth, relevance, and clarity in all responses."
-}
-,
+      "role": "system",
+      "content": "You are an expert summarizer and insight generator. Analyze the provided transcription carefully and return a high-quality, well-structured JSON object with the following fields:\n\n"
+                "- video_title: A clear, compelling title that reflects the core theme or purpose of the discussion.\n"
+                "- description: A concise yet informative summary of the overall content and its context.\n"
+                "- chapters: A list of major segments or topics discussed. Each chapter should include:\n"
+                "  - chapter_title: A meaningful title that captures the main idea of the section.\n"
+                "  - timestamp: The timestamp in [XX.XXs] format where the chapter begins (must match the transcription exactly).\n"
+                "  - content: A rich, detailed explanation of the discussion in this chapter, focusing on key insights, debates, and conclusions.\n"
+                "- final_decision: The primary decision or consensus, if any, reached by the end of the discussion.\n"
+                "- action_items: A clear list of specific, actionable steps or tasks derived from the conversation.\n"
+                "- summary: A comprehensive and cohesive summary that reflects the full context, key themes, and critical takeaways of the content.\n\n"
+                "Important:\n"
+                "- Preserve exact timestamps from the transcription.\n"
+                "- Ensure each section is clear, insightful, and avoids superficial summaries.\n"
+                "- Use professional, objective language. Prioritize depth, relevance, and clarity in all responses."
+    }
+    ,
                     {
                         "role": "user",
                         "content": transcription
@@ -173,108 +408,226 @@ class MediaAnalysisService:
                 response_format={"type": "json_object"}
             )
 
-            analysis = json.loads(response.choices[0].message.content)
+            analysis = json.loads(completion.content)
             print("OpenAI analysis completed successfully")
             return analysis
         except Exception as e:
             print(f"Error in OpenAI analysis: {str(e)}")
             raise
         
-    async def _add_chapter_thumbnails_async(self, video_path: str, analysis: Dict) -> Dict:
-        """Extract and upload thumbnails for each chapter using async processing."""
-        def extract_frame(video_path: str, timestamp: float, output_path: str) -> bool:
-            """Extract a single frame at timestamp."""
-            video = cv2.VideoCapture(video_path)
-            try:
-                video.set(cv2.CAP_PROP_POS_MSEC, timestamp * 1000)
-                success, frame = video.read()
-                if success:
-                    cv2.imwrite(output_path, frame)
-                    return True
-                return False
-            finally:
-                video.release()
-        
-        loop = asyncio.get_event_loop()
+    async def _json_completion(self, system_prompt: str, content: str) -> Dict:
+        completion = await self.llm.complete(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": content}
+            ],
+            response_format={"type": "json_object"}
+        )
+        return json.loads(completion.content)
+
+    async def _generate_analysis_map_reduce(self, transcription: str) -> Dict:
+        """
+        Analyze a long transcription window by window, concurrently, and merge
+        the results into the same schema as `_generate_analysis`.
+        """
+        windows = split_transcript(transcription, ANALYSIS_WINDOW_CHARS)
+        print(f"Generating map-reduce analysis over {len(windows)} windows...")
+        semaphore = asyncio.Semaphore(ANALYSIS_MAX_CONCURRENCY)
+
+        async def analyze_window(window: str) -> Dict:
+            async with semaphore:
+                result = await self._json_completion(MAP_PROMPT, window)
+            result["chapters"] = snap_chapters(result.get("chapters", []), segment_starts(window))
+            return result
 
-        # Generate video thumbnail at 10 seconds
         try:
-            video_thumb_path = f"temp_video_thumb.jpg"
-            success = await loop.run_in_executor(
-                self.executor,
-                extract_frame,
-                video_path,
-                10.0, # 10 second mark
-                video_thumb_path
-            )
+            map_results = await asyncio.gather(*(analyze_window(window) for window in windows))
+            reduce_result = await self._json_completion(REDUCE_PROMPT, reduce_input(map_results))
+            analysis = merge_results(map_results, reduce_result)
+            print("OpenAI map-reduce analysis completed successfully")
+            return analysis
+        except Exception as e:
+            print(f"Error in OpenAI map-reduce analysis: {str(e)}")
+            raise
 
-            if success:
-                # Upload video thumbnail
-                thumb_url = await self._upload_frame(video_thumb_path)
-                analysis['thumbnail_url'] = thumb_url
+    async def _extract_cover(self, video_path: str, frames_dir: str) -> Optional[str]:
+        """Extract and upload the video thumbnail; returns its URL."""
+        os.makedirs(frames_dir, exist_ok=True)
+        try:
+            with span("cover_extraction"):
+                frames = await self.compute.run(extract_frames, video_path, [COVER_TIMESTAMP], frames_dir)
+        except Exception as e:
+            print(f"Error extracting cover thumbnail: {str(e)}")
+            return None
+        frame_path = frames.get(COVER_TIMESTAMP)
+        return await self._upload_frame(frame_path) if frame_path else None
 
-                # Clean up temp file
-                try:
-                    os.remove(video_thumb_path)
-                except OSError:
-                    pass
-            else:
-                analysis['thumbnail_url'] = None
+    async def _build_keyframe_index(self, video_path: str,
+                                    frames_dir: str) -> Tuple[Dict[float, str], Optional[KeyframeIndex]]:
+        """
+        Build the keyframe index of a video.
 
+        Keyframe timestamps and byte offsets come from the packet headers;
+        preview frames are decoded about every `KEYFRAME_STRIP_SECONDS` at the
+        nearest keyframe and tiled into sprite sheets.
+
+        Returns:
+            Tuple of the decoded preview frames by timestamp (chapter thumbnails
+            are picked from them) and the index, or ({}, None) if it could not be built
+        """
+        if KEYFRAME_STRIP_SECONDS <= 0:
+            return {}, None
+        os.makedirs(frames_dir, exist_ok=True)
+        try:
+            with span("keyframe_probe"):
+                keyframe_times, keyframe_offsets = await probe_keyframes(video_path)
         except Exception as e:
-            print(f"Error extracting video thumbnail: {str(e)}")
-            analysis['thumbnail_url'] = None
-        
-        # Generate chapter thumbnails
-        for i, chapter in enumerate(analysis.get('chapters', [])):
-            try:
-                # Parse timestamp (assuming format "[XX.XXs]")
-                timestamp_str = chapter['timestamp'].strip('[]s')
-                timestamp = float(timestamp_str)
-                
-                # Create unique frame path
-                frame_path = f"temp_frame_{i}_{timestamp}.jpg"
-                
-                # Extract frame in thread pool
-                success = await loop.run_in_executor(
-                    self.executor, 
-                    extract_frame, 
-                    video_path, 
-                    timestamp, 
-                    frame_path
+            # The index still works without keyframes, previews just use the plain grid
+            print(f"Error probing keyframes: {str(e)}")
+            keyframe_times, keyframe_offsets = np.empty(0), np.empty(0, dtype=np.int64)
+
+        try:
+            with span("keyframe_strip"):
+                duration = await self.compute.run(video_duration, video_path)
+                timestamps = select_frames(keyframe_times, duration, KEYFRAME_STRIP_SECONDS, KEYFRAME_STRIP_MAX_FRAMES)
+                decoded = await self.compute.run(
+                    extract_frames, video_path, timestamps, frames_dir, MAX_SEQUENTIAL_GAP, keyframe_times
                 )
-                
-                if success:
-                    # Upload frame to storage
-                    frame_url = await self._upload_frame(frame_path)
-                    chapter['thumbnail_url'] = frame_url
-                    
-                    # Clean up temp file
-                    try:
-                        os.remove(frame_path)
-                    except OSError:
-                        pass
-                else:
-                    chapter['thumbnail_url'] = None
-                    
+        except Exception as e:
+            print(f"Error decoding keyframe strip: {str(e)}")
+            return {}, None
+        frames = {timestamp: path for timestamp, path in sorted(decoded.items()) if path}
+
+        sheet_urls, tile_height = [], 0
+        if SPRITE_SHEETS and frames:
+            try:
+                with span("sprite_sheets"):
+                    sheet_paths, tile_height = await self.compute.run(
+                        build_sprite_sheets,
+                        list(frames.values()),
+                        frames_dir,
+                        SPRITE_TILE_WIDTH,
+                        SPRITE_COLUMNS,
+                        SPRITE_ROWS
+                    )
+                sheet_urls = await asyncio.gather(*(self._upload_frame(p, folder="sprites") for p in sheet_paths))
+                if not all(sheet_urls):
+                    sheet_urls = []
             except Exception as e:
-                print(f"Error extracting thumbnail for chapter {i}: {str(e)}")
-                chapter['thumbnail_url'] = None
-                
+                print(f"Error building sprite sheets: {str(e)}")
+                sheet_urls = []
+
+        index = KeyframeIndex(
+            keyframe_times,
+            keyframe_offsets,
+            list(frames),
+            sheet_urls,
+            SPRITE_TILE_WIDTH if sheet_urls else 0,
+            tile_height if sheet_urls else 0,
+            SPRITE_COLUMNS if sheet_urls else 0,
+            SPRITE_ROWS if sheet_urls else 0
+        )
+        return frames, index
+
+    async def _copy_keyframe_index(self, media: Media) -> Optional[KeyframeIndex]:
+        """Keyframe index of another media with the same content, for results reused from the cache."""
+        stored = (await self.db.execute(
+            select(Media.keyframe_index).where(
+                Media.content_hash == media.content_hash,
+                Media.id != media.id,
+                Media.keyframe_index.is_not(None)
+            ).limit(1)
+        )).scalar_one_or_none()
+        return KeyframeIndex.from_bytes(stored) if stored else None
+
+    async def _add_chapter_thumbnails_async(self, video_path: str, analysis: Dict,
+                                            transcript: Optional[StructuredTranscript] = None,
+                                            keyframes: Optional[Dict[float, str]] = None,
+                                            with_cover: bool = True,
+                                            keyframe_times: Optional[Sequence[float]] = None) -> Dict:
+        """Extract and upload thumbnails for each chapter using async processing.
+
+        With a structured transcript, chapter timestamps are snapped to the
+        nearest segment start. Chapters are then snapped to the nearest indexed
+        frame in `keyframes` (within half the largest gap between them); the
+        rest are decoded in one pass, seeking only past the `keyframe_times`
+        of the video when they are known.
+        """
+        chapters = analysis.get('chapters', [])
+
+        # Parse chapter timestamps (assuming format "[XX.XXs]")
+        chapter_timestamps = []
+        for i, chapter in enumerate(chapters):
+            try:
+                timestamp = float(chapter['timestamp'].strip('[]s'))
+                if transcript is not None:
+                    timestamp = transcript.nearest_segment_start(timestamp)
+                chapter_timestamps.append(timestamp)
+            except Exception as e:
+                print(f"Error parsing timestamp for chapter {i}: {str(e)}")
+                chapter_timestamps.append(None)
+
+        timestamps = [t for t in chapter_timestamps if t is not None]
+        if with_cover:
+            timestamps = [COVER_TIMESTAMP] + timestamps
+
+        # Frames already decoded for the keyframe index
+        frames: Dict[float, Optional[str]] = {}
+        strip = sorted(keyframes or {})
+        tolerance = max(b - a for a, b in zip(strip, strip[1:])) / 2 if len(strip) > 1 else 0.0
+        for timestamp in timestamps:
+            index = bisect.bisect_left(strip, timestamp)
+            nearest = min(strip[max(index - 1, 0):index + 1], key=lambda t: abs(t - timestamp), default=None)
+            if nearest is not None and abs(nearest - timestamp) <= tolerance:
+                frames[timestamp] = keyframes[nearest]
+        missing = [t for t in timestamps if t not in frames]
+
+        with tempfile.TemporaryDirectory() as frames_dir:
+            # Decode the remaining frames in a single pass over the video (in the compute pool)
+            if missing:
+                try:
+                    with span("frame_extraction"):
+                        frames.update(await self.compute.run(
+                            extract_frames,
+                            video_path,
+                            missing,
+                            frames_dir,
+                            MAX_SEQUENTIAL_GAP,
+                            keyframe_times
+                        ))
+                except Exception as e:
+                    print(f"Error extracting thumbnails: {str(e)}")
+
+            # Upload each distinct frame once, concurrently
+            frame_paths = sorted({path for path in frames.values() if path})
+            uploaded = dict(zip(frame_paths, await asyncio.gather(*(self._upload_frame(p) for p in frame_paths))))
+            urls = {timestamp: uploaded.get(path) for timestamp, path in frames.items()}
+
+        if with_cover:
+            analysis['thumbnail_url'] = urls.get(COVER_TIMESTAMP)
+        for chapter, timestamp in zip(chapters, chapter_timestamps):
+            chapter['thumbnail_url'] = urls.get(timestamp) if timestamp is not None else None
+
         return analysis
         
-    async def _upload_frame(self, frame_path: str) -> str:
-        """Upload a frame to storage and return its URL."""
+    async def _upload_frame(self, frame_path: str, folder: str = "frames") -> str:
+        """Upload a frame (or sprite sheet) to storage and return its URL."""
         try:
             # Generate a unique filename for the frame
-            filename = f"frames/{uuid.uuid4()}.jpg"
+            filename = f"{folder}/{uuid.uuid4()}.jpg"
+            # Recorded up front, as a cancelled upload may still complete
+            self._uploads[filename] = None
             
             # Upload to storage using StorageService
-            upload_result = await self.storage_service.upload_file(
-                file_path=frame_path,
-                destination_path=filename,
-                content_type='image/jpeg'
-            )
+            with span("thumbnail_upload") as upload_span:
+                upload_span.bytes = os.path.getsize(frame_path)
+                upload_result = await self.storage_service.upload_file(
+                    file_path=frame_path,
+                    destination_path=filename,
+                    content_type='image/jpeg'
+                )
+            self._uploads[filename] = upload_result['file_url']
             
             return upload_result['file_url']
             
@@ -0,0 +1,218 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from typing import Callable, Iterable, List, Optional, Tuple
+import numpy as np
+from app.services.frame_extractor import iter_frames
+from app.config import (
+    MEDIA_COMPUTE_WORKERS,
+    MEDIA_COMPUTE_MAX_QUEUE,
+    MEDIA_COMPUTE_ADMISSION_TIMEOUT_SECONDS,
+)
+
+
+@dataclass
+class ComputeStats:
+    # Tasks admitted and not finished yet (running or waiting for a process)
+    in_flight: int = 0
+    finished: int = 0
+    rejected: int = 0
+    # Times the process pool was replaced after a worker process died
+    restarts: int = 0
+
+
+# Process-wide counters, exported by the metrics endpoint
+stats = ComputeStats()
+
+
+class MediaComputeBusy(RuntimeError):
+    """The media compute pool's queue stayed full for the whole admission timeout."""
+
+
+class SharedFrames:
+    """
+    Frames decoded in a pool process, handed over in a shared memory block
+    instead of being pickled through the result pipe.
+
+    `frames` is a (count, height, width, 3) uint8 view of the block, valid until
+    `close()`, which also frees the block. Use as a context manager.
+    """
+
+    def __init__(self, name: Optional[str], shape: Tuple[int, ...], timestamps: List[float]):
+        self.timestamps = timestamps
+        # Attaching registers the block with the resource tracker, so it is freed
+        # even if this process dies before `close()`
+        self._shm = shared_memory.SharedMemory(name=name) if shape[0] else None
+        self.frames = (
+            np.ndarray(shape, dtype=np.uint8, buffer=self._shm.buf) if self._shm is not None
+            else np.empty(shape, dtype=np.uint8)
+        )
+
+    def close(self) -> None:
+        if self._shm is None:
+            return
+        self.frames = None
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self) -> "SharedFrames":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def decode_frames_shared(video_path: str, timestamps: Iterable[float],
+                         width: int = 0) -> Tuple[Optional[str], Tuple[int, ...], List[float]]:
+    """
+    Decode frames into a new shared memory block (runs in a pool process).
+
+    Frames are resized to `width` (keeping the aspect ratio of the first frame)
+    when given, so every frame has the same shape. Timestamps without a
+    readable frame are left out.
+
+    Returns:
+        Name of the block (None if no frame was read), array shape and the frame timestamps
+    """
+    import cv2
+
+    frames, decoded = [], []
+    size = None
+    for timestamp, frame in iter_frames(video_path, timestamps):
+        if frame is None:
+            continue
+        if size is None:
+            height, frame_width = frame.shape[:2]
+            size = (width, max(int(round(height * width / frame_width)), 1)) if width else (frame_width, height)
+        if (frame.shape[1], frame.shape[0]) != size:
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        frames.append(frame)
+        decoded.append(timestamp)
+    if not frames:
+        return None, (0, 0, 0, 3), []
+
+    shape = (len(frames), size[1], size[0], 3)
+    block = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+    try:
+        array = np.ndarray(shape, dtype=np.uint8, buffer=block.buf)
+        for i, frame in enumerate(frames):
+            array[i] = frame
+        del array
+        # The caller takes over the block and unlinks it once done with the frames
+        resource_tracker.unregister(block._name, "shared_memory")
+    except BaseException:
+        block.close()
+        block.unlink()
+        raise
+    block.close()
+    return block.name, shape, decoded
+
+
+def _init_process() -> None:
+    # One OpenCV thread per process; the pool itself provides the parallelism
+    import cv2
+    cv2.setNumThreads(1)
+
+
+class MediaComputePool:
+    """
+    Process pool for CPU-bound media work (OpenCV decoding and encoding, NumPy).
+
+    One pool per process is shared by every concurrent analysis (see
+    `ClientRegistry.media_compute`), so CPU use is bounded by `workers`
+    processes rather than by the number of jobs, and the work is not
+    serialized by the GIL. Worker processes are started on first use.
+
+    Admission control: at most `workers + max_queue` tasks are in flight.
+    Further callers wait up to `admission_timeout` seconds for a slot and then
+    get `MediaComputeBusy` (immediately if the timeout is 0). A worker process
+    that dies (e.g. OpenCV crashing on a corrupt file) fails only the tasks in
+    flight; the pool is replaced for the next ones.
+
+    With `workers=0` the tasks run on `fallback_executor` (threads) instead,
+    with the same admission control.
+    """
+
+    def __init__(self, workers: int = MEDIA_COMPUTE_WORKERS, max_queue: int = MEDIA_COMPUTE_MAX_QUEUE,
+                 admission_timeout: float = MEDIA_COMPUTE_ADMISSION_TIMEOUT_SECONDS,
+                 fallback_executor: Optional[Executor] = None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.admission_timeout = admission_timeout
+        self.fallback_executor = fallback_executor
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def capacity(self) -> int:
+        return max(self.workers, 1) + max(self.max_queue, 0)
+
+    def _get_executor(self) -> Executor:
+        if self.workers <= 0:
+            return self.fallback_executor
+        if self._executor is None:
+            # spawn: forking a process that runs an event loop and thread pools is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process
+            )
+        return self._executor
+
+    async def _admit(self) -> None:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.capacity)
+        if self.admission_timeout <= 0:
+            if self._slots.locked():
+                stats.rejected += 1
+                raise MediaComputeBusy(f"Media compute queue is full ({self.capacity} tasks in flight)")
+            # Does not block, as a slot is free
+            await self._slots.acquire()
+            return
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.admission_timeout)
+        except asyncio.TimeoutError:
+            stats.rejected += 1
+            raise MediaComputeBusy(
+                f"Media compute queue stayed full for {self.admission_timeout:g}s ({self.capacity} tasks in flight)"
+            )
+
+    async def run(self, fn: Callable, *args):
+        """
+        Run `fn(*args)` in the pool. `fn` and its arguments and result must be
+        picklable (module-level functions, plain data, NumPy arrays).
+        """
+        await self._admit()
+        # `shutdown()` may drop the semaphore while the task runs
+        slots = self._slots
+        stats.in_flight += 1
+        executor = self._get_executor()
+        try:
+            return await asyncio.get_event_loop().run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            if executor is self._executor:
+                print("Media compute process died; restarting the pool")
+                self._executor = None
+                stats.restarts += 1
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            stats.in_flight -= 1
+            stats.finished += 1
+            slots.release()
+
+    async def decode_frames(self, video_path: str, timestamps: Iterable[float], width: int = 0) -> SharedFrames:
+        """Decode frames at `timestamps` in the pool; the pixels come back through shared memory."""
+        name, shape, decoded = await self.run(decode_frames_shared, video_path, list(timestamps), width)
+        return SharedFrames(name, shape, decoded)
+
+    def shutdown(self) -> None:
+        """Stop the worker processes after their current tasks."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self._slots = None
@@ -0,0 +1,238 @@
+import bisect
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; from sub-millisecond cache lookups up to long transcriptions
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+# Bytes; 64 KiB to 4 GiB
+SIZE_BUCKETS = tuple(65536 * 4 ** i for i in range(9))
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric(ABC):
+    """A metric rendered in the Prometheus text format."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Sample lines of the metric, without its HELP and TYPE lines."""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in values]
+
+
+class CallbackMetric(Metric):
+    """Single value read from a callback when metrics are rendered."""
+
+    def __init__(self, name: str, help: str, callback: Callable[[], float], type: str = "gauge"):
+        super().__init__(name, help)
+        self.callback = callback
+        self.type = type
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {_format_value(self.callback())}"]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: bucket counts (last one is +Inf), sum
+        self._values: Dict[Tuple, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            values = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.register(Histogram(
+    "pipeline_stage_seconds", "Duration of analysis pipeline stages", ["stage", "outcome"]
+))
+stage_bytes = registry.register(Histogram(
+    "pipeline_stage_bytes", "Bytes processed by analysis pipeline stages", ["stage"], buckets=SIZE_BUCKETS
+))
+job_queue_wait_seconds = registry.register(Histogram(
+    "job_queue_wait_seconds", "Time analysis jobs waited in the queue before being claimed"
+))
+jobs_total = registry.register(Counter(
+    "analysis_jobs_total", "Analysis jobs run by this process", ["outcome"]
+))
+http_request_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"]
+))
+notifications_total = registry.register(Counter(
+    "notifications_total", "Notification send attempts by outcome", ["outcome"]
+))
+llm_requests_total = registry.register(Counter(
+    "llm_requests_total", "LLM completions by model and source (upstream, cache, coalesced, error)", ["model", "source"]
+))
+llm_tokens_total = registry.register(Counter(
+    "llm_tokens_total", "LLM tokens by model and kind (prompt, completion, saved)", ["model", "kind"]
+))
+
+# Called with (stage, seconds, outcome) after every span, e.g. by benchmarks
+_span_listeners: List[Callable[[str, float, str], None]] = []
+
+
+def add_span_listener(listener: Callable[[str, float, str], None]) -> None:
+    _span_listeners.append(listener)
+
+
+def remove_span_listener(listener: Callable[[str, float, str], None]) -> None:
+    if listener in _span_listeners:
+        _span_listeners.remove(listener)
+
+
+class Span:
+    """Timing of one pipeline stage; `bytes` may be set while it runs."""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.bytes: Optional[int] = None
+        self.start = time.perf_counter()
+        self.seconds = 0.0
+
+
+@contextmanager
+def span(stage: str) -> Iterator[Span]:
+    """Time a pipeline stage and record its latency (and bytes, if set) on exit.
+
+    Works in both coroutines and executor threads.
+    """
+    current = Span(stage)
+    outcome = "ok"
+    try:
+        yield current
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        current.seconds = time.perf_counter() - current.start
+        stage_seconds.observe(current.seconds, stage=stage, outcome=outcome)
+        if current.bytes is not None:
+            stage_bytes.observe(current.bytes, stage=stage)
+        for listener in list(_span_listeners):
+            try:
+                listener(stage, current.seconds, outcome)
+            except Exception as e:
+                print(f"Span listener failed: {str(e)}")
+
+
+def _register_cache_stats() -> None:
+    from app.services.result_cache import stats
+
+    for field, help in (
+        ("hits", "Result cache hits"),
+        ("misses", "Result cache misses"),
+        ("stores", "Results stored in the result cache"),
+        ("evictions", "Results evicted from the result cache"),
+    ):
+        registry.register(CallbackMetric(
+            f"result_cache_{field}_total", help, lambda field=field: getattr(stats, field), type="counter"
+        ))
+
+
+_register_cache_stats()
+
+
+def _register_compute_stats() -> None:
+    from app.services.media_compute import stats
+
+    registry.register(CallbackMetric(
+        "media_compute_in_flight", "Media compute tasks running or queued", lambda: stats.in_flight
+    ))
+    for field, help in (
+        ("finished", "Media compute tasks finished"),
+        ("rejected", "Media compute tasks rejected by admission control"),
+        ("restarts", "Media compute pool restarts after a worker process died"),
+    ):
+        registry.register(CallbackMetric(
+            f"media_compute_{field}_total", help, lambda field=field: getattr(stats, field), type="counter"
+        ))
+
+
+_register_compute_stats()
@@ -0,0 +1,254 @@
+import asyncio
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Dict, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import select, update, func, not_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import Media, MediaType, UploadSession, UploadSessionStatus, UploadStatus
+from app.services.subprocesses import run_process
+from app.services.job_queue import start_analysis
+from app.services.local_storage import LocalStorageService
+from app.config import UPLOAD_PART_SIZE, UPLOAD_MAX_SIZE
+
+
+def part_count(size: int, part_size: int) -> int:
+    return max((size + part_size - 1) // part_size, 1)
+
+
+def part_range(size: int, part_size: int, part_number: int) -> Tuple[int, int]:
+    """Byte offset and length of a part (numbered from 1)."""
+    offset = (part_number - 1) * part_size
+    return offset, min(part_size, size - offset)
+
+
+async def probe_media(path: str) -> Dict:
+    """Container and stream details of a media file from ffprobe."""
+    stdout, _ = await run_process([
+        "ffprobe", "-v", "error",
+        "-show_entries",
+        "format=format_name,duration,bit_rate:"
+        "stream=index,codec_type,codec_name,width,height,r_frame_rate,sample_rate,channels,duration",
+        "-of", "json",
+        path
+    ])
+    probe = json.loads(stdout.decode() or "{}")
+    container = probe.get("format", {})
+    return {
+        "format": container.get("format_name"),
+        "duration": float(container["duration"]) if container.get("duration") else None,
+        "bit_rate": int(container["bit_rate"]) if container.get("bit_rate") else None,
+        "streams": probe.get("streams", [])
+    }
+
+
+class MultipartUploadService:
+    """
+    Resumable multipart uploads into `LocalStorageService`.
+
+    The file is allocated at its final size when the upload is created and each
+    part is written straight to its offset, so parts can arrive in any order
+    and in parallel, and completing the upload is a rename rather than a copy.
+    Received parts are recorded on the `upload_session` row, so an interrupted
+    client can ask which parts are missing and resume.
+    """
+
+    def __init__(self, db: AsyncSession, storage: Optional[LocalStorageService] = None):
+        self.db = db
+        self.storage = storage or LocalStorageService()
+        self.executor = self.storage.executor
+
+    def _partial_path(self, session: UploadSession) -> str:
+        return self.storage.local_path(session.file_path) + ".partial"
+
+    async def _get_session(self, upload_id: uuid.UUID, for_update: bool = False,
+                           for_part: bool = False) -> UploadSession:
+        query = select(UploadSession).where(UploadSession.id == upload_id)
+        if for_update:
+            # Serializes completing and aborting the same upload, and waits for parts being written
+            query = query.with_for_update()
+        elif for_part:
+            # FOR KEY SHARE: parts do not block each other (nor their own update of
+            # `received_parts`), but block completing or aborting until they are written
+            query = query.with_for_update(read=True, key_share=True)
+        session = (await self.db.execute(query)).scalar_one_or_none()
+        if not session:
+            raise HTTPException(status_code=404, detail="Upload not found")
+        return session
+
+    def describe(self, session: UploadSession) -> Dict:
+        count = part_count(session.size, session.part_size)
+        received = set(session.received_parts or [])
+        return {
+            "upload_id": str(session.id),
+            "media_id": str(session.media_id),
+            "status": session.status,
+            "size": session.size,
+            "part_size": session.part_size,
+            "part_count": count,
+            "received_parts": sorted(received),
+            "missing_parts": [n for n in range(1, count + 1) if n not in received]
+        }
+
+    async def create(self, user_id: uuid.UUID, file_name: str, file_type: str, size: int) -> Dict:
+        """Create the media row and upload session, and allocate the file."""
+        if file_type not in (MediaType.VIDEO.value, MediaType.AUDIO.value):
+            raise HTTPException(status_code=400, detail="file_type must be 'video' or 'audio'")
+        if size <= 0 or size > UPLOAD_MAX_SIZE:
+            raise HTTPException(status_code=400, detail=f"size must be between 1 and {UPLOAD_MAX_SIZE} bytes")
+
+        file_path = f"{user_id}/{datetime.now().timestamp()}_{os.path.basename(file_name)}"
+        media = Media(
+            id=uuid.uuid4(),
+            user_id=user_id,
+            type=file_type,
+            file_path=file_path,
+            media_url=self.storage.file_url(file_path),
+            upload_status=UploadStatus.PENDING
+        )
+        session = UploadSession(
+            id=uuid.uuid4(),
+            media_id=media.id,
+            user_id=user_id,
+            file_path=file_path,
+            size=size,
+            part_size=UPLOAD_PART_SIZE,
+            received_parts=[],
+            status=UploadSessionStatus.UPLOADING
+        )
+        partial_path = self._partial_path(session)
+
+        def allocate():
+            os.makedirs(os.path.dirname(partial_path), exist_ok=True)
+            with open(partial_path, 'wb') as f:
+                f.truncate(size)
+
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self.executor, allocate)
+        self.db.add(media)
+        self.db.add(session)
+        await self.db.commit()
+        return self.describe(session)
+
+    async def status(self, upload_id: uuid.UUID) -> Dict:
+        return self.describe(await self._get_session(upload_id))
+
+    async def upload_part(self, upload_id: uuid.UUID, part_number: int, chunks: AsyncIterator[bytes]) -> Dict:
+        """
+        Write one part at its offset while it streams in; the part is recorded once complete.
+
+        The upload row stays locked until then, so a concurrent `complete` or
+        `abort` waits for the part, and a part arriving after either gets a 409.
+        """
+        session = await self._get_session(upload_id, for_part=True)
+        if session.status != UploadSessionStatus.UPLOADING:
+            raise HTTPException(status_code=409, detail=f"Upload is {session.status}")
+        if not 1 <= part_number <= part_count(session.size, session.part_size):
+            raise HTTPException(status_code=400, detail="Invalid part number")
+        offset, length = part_range(session.size, session.part_size, part_number)
+
+        loop = asyncio.get_event_loop()
+        try:
+            fd = await loop.run_in_executor(self.executor, os.open, self._partial_path(session), os.O_WRONLY)
+        except FileNotFoundError:
+            # Completed or aborted outside this service's locking, e.g. by hand
+            raise HTTPException(status_code=409, detail="Upload is no longer open")
+        written = 0
+        try:
+            async for chunk in chunks:
+                if written + len(chunk) > length:
+                    raise HTTPException(status_code=400, detail=f"Part {part_number} must be {length} bytes")
+                await loop.run_in_executor(self.executor, os.pwrite, fd, chunk, offset + written)
+                written += len(chunk)
+        finally:
+            await loop.run_in_executor(self.executor, os.close, fd)
+        if written != length:
+            raise HTTPException(status_code=400, detail=f"Part {part_number} must be {length} bytes, got {written}")
+
+        # Appended atomically, so parallel parts do not overwrite each other's entry
+        await self.db.execute(
+            update(UploadSession)
+            .where(
+                UploadSession.id == upload_id,
+                not_(UploadSession.received_parts.contains([part_number]))
+            )
+            .values(received_parts=func.array_append(UploadSession.received_parts, part_number))
+        )
+        await self.db.commit()
+        return {"upload_id": str(upload_id), "part_number": part_number, "size": written}
+
+    async def complete(self, upload_id: uuid.UUID) -> Dict:
+        """
+        Probe the assembled file, move it into place, and queue its analysis.
+
+        A file that fails validation is left in place and the upload stays
+        open, so the client can re-send parts and complete it again.
+        """
+        session = await self._get_session(upload_id, for_update=True)
+        if session.status != UploadSessionStatus.UPLOADING:
+            raise HTTPException(status_code=409, detail=f"Upload is {session.status}")
+        missing = self.describe(session)["missing_parts"]
+        if missing:
+            raise HTTPException(status_code=409, detail=f"Missing parts: {missing}")
+
+        media = (await self.db.execute(select(Media).where(Media.id == session.media_id))).scalar_one()
+        partial_path = self._partial_path(session)
+        try:
+            info = await probe_media(partial_path)
+        except Exception as e:
+            print(f"Probing upload {upload_id} failed: {str(e)}")
+            info = None
+        error = self._validate(media.type, info)
+        if error:
+            # Releases the row lock; nothing was changed
+            await self.db.rollback()
+            raise HTTPException(status_code=422, detail=error)
+
+        # Same directory, so this is a rename and the data is not copied
+        final_path = self.storage.local_path(session.file_path)
+        os.replace(partial_path, final_path)
+        session.status = UploadSessionStatus.COMPLETED
+        media.media_info = info
+        media.duration = round(info["duration"]) if info["duration"] is not None else None
+        media.upload_status = UploadStatus.COMPLETED
+        try:
+            # Commits the media update together with the analysis and its job
+            analysis, _ = await start_analysis(self.db, media.id)
+        except Exception:
+            # Nothing was committed, so the upload is still open; put the file back
+            os.replace(final_path, partial_path)
+            raise
+        return {
+            **self.describe(session),
+            "duration": media.duration,
+            "media_info": info,
+            "analysis_id": str(analysis.id)
+        }
+
+    @staticmethod
+    def _validate(media_type: str, info: Optional[Dict]) -> Optional[str]:
+        if info is None:
+            return "Uploaded file is not a readable media file"
+        codec_types = {stream.get("codec_type") for stream in info["streams"]}
+        if "audio" not in codec_types:
+            return "Uploaded file has no audio stream"
+        if media_type == MediaType.VIDEO.value and "video" not in codec_types:
+            return "Uploaded video has no video stream"
+        return None
+
+    async def abort(self, upload_id: uuid.UUID) -> Dict:
+        session = await self._get_session(upload_id, for_update=True)
+        if session.status == UploadSessionStatus.COMPLETED:
+            raise HTTPException(status_code=409, detail="Upload is completed")
+        try:
+            os.remove(self._partial_path(session))
+        except FileNotFoundError:
+            pass
+        session.status = UploadSessionStatus.ABORTED
+        await self.db.execute(
+            update(Media).where(Media.id == session.media_id).values(upload_status=UploadStatus.FAILED)
+        )
+        await self.db.commit()
+        return self.describe(session)
@@ -0,0 +1,240 @@
+import asyncio
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import Notification, NotificationStatus
+from app.services.clients import get_clients
+from app.services.metrics import notifications_total, span
+from app.services.send_notification import send_whatsapp_message
+from app.config import (
+    NOTIFICATION_TRANSPORT,
+    NOTIFICATION_RATE_PER_SECOND,
+    NOTIFICATION_BATCH_SIZE,
+    NOTIFICATION_MAX_ATTEMPTS,
+    NOTIFICATION_RETRY_BASE_SECONDS,
+    NOTIFICATION_RETRY_MAX_SECONDS,
+    NOTIFICATION_LEASE_SECONDS,
+    NOTIFICATION_POLL_SECONDS,
+)
+
+
+async def enqueue_notification(db: AsyncSession, recipient: str, body: str, dedup_key: str,
+                               user_id: Optional[uuid.UUID] = None, channel: str = "whatsapp") -> None:
+    """
+    Add a notification to the outbox without committing `db`.
+
+    It is sent once the caller commits, so the notification lands in the same
+    transaction as the change it reports. Enqueuing an existing `dedup_key`
+    again does nothing.
+    """
+    await db.execute(
+        insert(Notification)
+        .values(
+            id=uuid.uuid4(),
+            user_id=user_id,
+            channel=channel,
+            recipient=recipient,
+            body=body,
+            dedup_key=dedup_key,
+            status=NotificationStatus.PENDING,
+            max_attempts=NOTIFICATION_MAX_ATTEMPTS
+        )
+        .on_conflict_do_nothing(index_elements=[Notification.dedup_key])
+    )
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff delay (seconds) before retrying a notification that failed `attempts` times."""
+    return min(NOTIFICATION_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)), NOTIFICATION_RETRY_MAX_SECONDS)
+
+
+class NotificationTransport(ABC):
+    """Delivers notifications; `NotificationDispatcher` handles rate limiting and retries."""
+
+    @abstractmethod
+    async def send(self, channel: str, recipient: str, body: str) -> Optional[str]:
+        """Send one message and return the provider's message ID. Raises on failure."""
+
+
+class TwilioTransport(NotificationTransport):
+    """WhatsApp messages through Twilio; the blocking SDK call runs in the I/O thread pool."""
+
+    def __init__(self, executor=None):
+        self.executor = executor or get_clients().io_executor
+
+    async def send(self, channel: str, recipient: str, body: str) -> Optional[str]:
+        if channel != "whatsapp":
+            raise ValueError(f"Unsupported notification channel: {channel}")
+        loop = asyncio.get_event_loop()
+        message = await loop.run_in_executor(self.executor, send_whatsapp_message, body, recipient)
+        return getattr(message, "sid", None)
+
+
+class FakeTransport(NotificationTransport):
+    """Records messages instead of sending them; the first `fail_times` sends raise."""
+
+    def __init__(self, fail_times: int = 0, latency: float = 0.0):
+        self.fail_times = fail_times
+        self.latency = latency
+        self.sent: List[Dict] = []
+        self.calls = 0
+
+    async def send(self, channel: str, recipient: str, body: str) -> Optional[str]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.calls <= self.fail_times:
+            raise RuntimeError("Simulated transport failure")
+        self.sent.append({"channel": channel, "recipient": recipient, "body": body})
+        return f"fake-{len(self.sent)}"
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` acquisitions per second (unlimited if `rate` <= 0)."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class NotificationDispatcher:
+    """
+    Sends notifications from the `notification_outbox` table.
+
+    Due notifications are claimed in batches with `FOR UPDATE SKIP LOCKED`, so
+    several dispatchers can run side by side. Claiming pushes
+    `next_attempt_at` forward by the lease; a notification claimed by a
+    dispatcher that died is picked up again once the lease has passed.
+    Failed sends are retried with exponential backoff up to `max_attempts`.
+    The rate limit applies per dispatcher.
+    """
+
+    def __init__(self, transport: Optional[NotificationTransport] = None, session_factory=None,
+                 rate_per_second: float = NOTIFICATION_RATE_PER_SECOND, batch_size: int = NOTIFICATION_BATCH_SIZE,
+                 lease_seconds: int = NOTIFICATION_LEASE_SECONDS, poll_seconds: float = NOTIFICATION_POLL_SECONDS):
+        if session_factory is None:
+            from app.database import AsyncSessionLocal
+            session_factory = AsyncSessionLocal
+        self.transport = transport or get_transport()
+        self.session_factory = session_factory
+        self.rate_limiter = RateLimiter(rate_per_second)
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self._stopping = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                sent = await self.dispatch_once()
+            except Exception as e:
+                print(f"Notification dispatch failed: {str(e)}")
+                sent = 0
+            if not sent:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _claim(self) -> List:
+        due = (
+            select(Notification.id)
+            .where(
+                Notification.status == NotificationStatus.PENDING,
+                Notification.next_attempt_at <= func.now()
+            )
+            .order_by(Notification.next_attempt_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        query = (
+            update(Notification)
+            .where(Notification.id.in_(due))
+            .values(
+                attempts=Notification.attempts + 1,
+                next_attempt_at=func.now() + timedelta(seconds=self.lease_seconds)
+            )
+            .returning(
+                Notification.id,
+                Notification.channel,
+                Notification.recipient,
+                Notification.body,
+                Notification.attempts,
+                Notification.max_attempts
+            )
+        )
+        async with self.session_factory() as db:
+            rows = (await db.execute(query)).all()
+            await db.commit()
+        return rows
+
+    async def dispatch_once(self) -> int:
+        """Claim one batch of due notifications and send it. Returns the number claimed."""
+        rows = await self._claim()
+        for row in rows:
+            if self._stopping.is_set():
+                # The rest are retried when the lease runs out
+                break
+            await self.rate_limiter.acquire()
+            values = {}
+            try:
+                with span("notification_send"):
+                    provider_id = await self.transport.send(row.channel, row.recipient, row.body)
+                values.update(status=NotificationStatus.SENT, provider_id=provider_id, sent_at=func.now(), last_error=None)
+                notifications_total.inc(outcome="sent")
+            except Exception as e:
+                print(f"Failed to send notification {row.id} (attempt {row.attempts}/{row.max_attempts}): {str(e)}")
+                values["last_error"] = str(e)
+                if row.attempts >= row.max_attempts:
+                    values["status"] = NotificationStatus.FAILED
+                    notifications_total.inc(outcome="failed")
+                else:
+                    values["next_attempt_at"] = func.now() + timedelta(seconds=retry_delay(row.attempts))
+                    notifications_total.inc(outcome="retried")
+            # Recorded one by one, so a crash re-sends at most the message in flight
+            async with self.session_factory() as db:
+                await db.execute(update(Notification).where(Notification.id == row.id).values(**values))
+                await db.commit()
+        return len(rows)
+
+
+def get_transport() -> NotificationTransport:
+    """Transport for the configured `NOTIFICATION_TRANSPORT`."""
+    if NOTIFICATION_TRANSPORT == "twilio":
+        return TwilioTransport()
+    if NOTIFICATION_TRANSPORT == "fake":
+        return FakeTransport()
+    raise ValueError(f"Unknown NOTIFICATION_TRANSPORT: {NOTIFICATION_TRANSPORT}")
@@ -0,0 +1,51 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Tuple
+
+
+class StageGraph:
+    """
+    Small DAG of async pipeline stages.
+
+    Each stage starts as soon as the stages it depends on have finished and
+    receives their results as keyword arguments, so independent stages run
+    concurrently. If any stage fails, the stages still running are cancelled
+    and the error is raised from `run`.
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, Tuple[Callable[..., Awaitable[Any]], List[str]]] = {}
+
+    def add(self, name: str, stage: Callable[..., Awaitable[Any]], after: Iterable[str] = ()) -> "StageGraph":
+        """Add a stage; the stages in `after` must have been added before."""
+        after = list(after)
+        missing = [dependency for dependency in after if dependency not in self._stages]
+        if missing:
+            raise ValueError(f"Stage {name} depends on unknown stages: {', '.join(missing)}")
+        if name in self._stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        self._stages[name] = (stage, after)
+        return self
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._stages
+
+    async def run(self) -> Dict[str, Any]:
+        """Run every stage and return the results by stage name."""
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(stage, after: List[str]):
+            inputs = {dependency: await tasks[dependency] for dependency in after}
+            return await stage(**inputs)
+
+        # Stages are added after their dependencies, so insertion order is a topological order
+        for name, (stage, after) in self._stages.items():
+            tasks[name] = asyncio.create_task(run_stage(stage, after), name=f"stage:{name}")
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        return {name: task.result() for name, task in tasks.items()}
@@ -0,0 +1,111 @@
+import json
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import AnalysisCache
+from app.config import RESULT_CACHE_MAX_BYTES
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+
+# Process-wide counters, exported by the metrics endpoint
+stats = CacheStats()
+
+
+async def hash_chunks(chunks: AsyncIterator[bytes], digest) -> AsyncIterator[bytes]:
+    """Pass chunks through unchanged while feeding them to a hashlib object."""
+    async for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+
+class ResultCache:
+    """
+    Transcriptions and analysis results keyed by the SHA-256 of the media file,
+    so re-uploads of the same recording skip transcription and LLM analysis.
+
+    Entries are evicted least-recently-used first once their total size
+    exceeds `max_bytes`.
+    """
+
+    def __init__(self, db: AsyncSession, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.db = db
+        self.max_bytes = max_bytes
+
+    async def get(self, content_hash: str) -> Optional[Dict]:
+        """Return the cached transcription, structured transcript and analysis for a content hash, if any."""
+        query = (
+            update(AnalysisCache)
+            .where(AnalysisCache.content_hash == content_hash)
+            .values(hits=AnalysisCache.hits + 1, last_accessed_at=func.now())
+            .returning(AnalysisCache.transcription, AnalysisCache.transcript_data, AnalysisCache.analysis)
+        )
+        row = (await self.db.execute(query)).first()
+        if row is None:
+            stats.misses += 1
+            return None
+        stats.hits += 1
+        return {
+            "transcription": row.transcription,
+            "transcript_data": row.transcript_data,
+            "analysis": row.analysis
+        }
+
+    async def put(self, content_hash: str, transcription: str, analysis: Dict,
+                  transcript_data: Optional[bytes] = None) -> None:
+        """Store a result and evict old entries beyond the size cap. Commits the session."""
+        size_bytes = (
+            len((transcription or "").encode())
+            + len(json.dumps(analysis).encode())
+            + len(transcript_data or b"")
+        )
+        query = insert(AnalysisCache).values(
+            content_hash=content_hash,
+            transcription=transcription,
+            transcript_data=transcript_data,
+            analysis=analysis,
+            size_bytes=size_bytes
+        )
+        query = query.on_conflict_do_update(
+            index_elements=[AnalysisCache.content_hash],
+            set_={
+                "transcription": query.excluded.transcription,
+                "transcript_data": query.excluded.transcript_data,
+                "analysis": query.excluded.analysis,
+                "size_bytes": query.excluded.size_bytes,
+                "last_accessed_at": func.now()
+            }
+        )
+        await self.db.execute(query)
+        stats.stores += 1
+        await self.evict()
+        await self.db.commit()
+
+    async def evict(self) -> int:
+        """Delete least recently used entries until the cache fits in `max_bytes`."""
+        running_size = (
+            select(
+                AnalysisCache.content_hash,
+                func.sum(AnalysisCache.size_bytes).over(
+                    order_by=(AnalysisCache.last_accessed_at.desc(), AnalysisCache.content_hash)
+                ).label("running_size")
+            )
+            .subquery()
+        )
+        over_cap = select(running_size.c.content_hash).where(running_size.c.running_size > self.max_bytes)
+        result = await self.db.execute(
+            delete(AnalysisCache)
+            .where(AnalysisCache.content_hash.in_(over_cap))
+            .returning(AnalysisCache.content_hash)
+        )
+        evicted = len(result.scalars().all())
+        stats.evictions += evicted
+        return evicted
@@ -0,0 +1,165 @@
+import io
+import re
+import uuid
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import case, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import Analysis, AnalysisStatus
+from app.config import SEGMENT_INDEX_CACHE_SIZE
+from app.services.lru import LRUCache
+from app.services.structured_transcript import StructuredTranscript
+
+_SEGMENT = re.compile(r"^\[(\d+(?:\.\d+)?)s\]\s*(.*)$")
+_TOKEN = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def parse_segments(transcription: str) -> Tuple[List[float], List[str]]:
+    """Split a formatted transcription into segment start times and texts."""
+    starts, texts = [], []
+    for line in transcription.splitlines():
+        match = _SEGMENT.match(line)
+        if match:
+            starts.append(float(match.group(1)))
+            texts.append(match.group(2))
+    return starts, texts
+
+
+class SegmentIndex:
+    """
+    BM25 index over transcript segments.
+
+    Postings are stored as flat NumPy arrays (term id, segment id, precomputed
+    BM25 weight), so a query is scored with one `np.isin` mask and one
+    `np.bincount` over all segments.
+    """
+
+    def __init__(self, starts: List[float], texts: List[str], k1: float = 1.5, b: float = 0.75):
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.texts = texts
+        self.vocabulary: Dict[str, int] = {}
+
+        term_ids, doc_ids, counts = [], [], []
+        lengths = np.zeros(len(texts), dtype=np.float64)
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[doc_id] = len(tokens)
+            frequencies: Dict[int, int] = {}
+            for token in tokens:
+                term_id = self.vocabulary.setdefault(token, len(self.vocabulary))
+                frequencies[term_id] = frequencies.get(term_id, 0) + 1
+            term_ids.extend(frequencies.keys())
+            doc_ids.extend([doc_id] * len(frequencies))
+            counts.extend(frequencies.values())
+
+        self.term_ids = np.asarray(term_ids, dtype=np.int32)
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        tf = np.asarray(counts, dtype=np.float64)
+
+        n_docs = len(texts)
+        document_frequency = np.bincount(self.term_ids, minlength=len(self.vocabulary))
+        idf = np.log1p((n_docs - document_frequency + 0.5) / (document_frequency + 0.5))
+        average_length = lengths.mean() if n_docs else 0.0
+        norm = k1 * (1 - b + b * lengths[self.doc_ids] / (average_length or 1.0))
+        self.weights = (idf[self.term_ids] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+
+    @classmethod
+    def from_transcription(cls, transcription: str) -> "SegmentIndex":
+        return cls(*parse_segments(transcription))
+
+    @classmethod
+    def from_transcript(cls, transcript: StructuredTranscript) -> "SegmentIndex":
+        texts = [transcript.segment_text(i) for i in range(transcript.segment_count)]
+        return cls(transcript.segment_starts.tolist(), texts)
+
+    def to_bytes(self) -> bytes:
+        """Serialize the index (NumPy arrays only, no pickle) for storage."""
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            starts=self.starts,
+            texts=np.asarray(self.texts, dtype=str),
+            terms=np.asarray(terms, dtype=str),
+            term_ids=self.term_ids,
+            doc_ids=self.doc_ids,
+            weights=self.weights
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "SegmentIndex":
+        arrays = np.load(io.BytesIO(data), allow_pickle=False)
+        index = cls.__new__(cls)
+        index.starts = arrays["starts"]
+        index.texts = arrays["texts"].tolist()
+        index.vocabulary = {term: i for i, term in enumerate(arrays["terms"].tolist())}
+        index.term_ids = arrays["term_ids"]
+        index.doc_ids = arrays["doc_ids"]
+        index.weights = arrays["weights"]
+        return index
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def search(self, query: str, k: int = 4) -> List[Dict]:
+        """Return the `k` best matching segments in timeline order."""
+        query_ids = [self.vocabulary[t] for t in set(tokenize(query)) if t in self.vocabulary]
+        if not query_ids or not len(self):
+            return []
+        mask = np.isin(self.term_ids, query_ids)
+        scores = np.bincount(self.doc_ids[mask], weights=self.weights[mask], minlength=len(self))
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [
+            {"start": float(self.starts[i]), "text": self.texts[i], "score": float(scores[i])}
+            for i in sorted(top)
+        ]
+
+
+class SegmentIndexCache:
+    """In-process LRU of segment indexes keyed by media ID."""
+
+    def __init__(self, max_entries: int = SEGMENT_INDEX_CACHE_SIZE):
+        self._entries: LRUCache[SegmentIndex] = LRUCache(max_entries)
+
+    def put(self, media_id, index: SegmentIndex) -> None:
+        self._entries.put(str(media_id), index)
+
+    async def get(self, db: AsyncSession, media_id: uuid.UUID) -> Optional[SegmentIndex]:
+        """Return the stored index for a media file, or build one from its transcription."""
+        index = self._entries.get(str(media_id))
+        if index is not None:
+            return index
+
+        # The transcription is only fetched for analyses stored without an index
+        query = (
+            select(
+                Analysis.segment_index,
+                case((Analysis.segment_index.is_(None), Analysis.transcription), else_=None)
+            )
+            .where(Analysis.media_id == media_id, Analysis.status == AnalysisStatus.DONE)
+            .order_by(Analysis.created_at.desc())
+            .limit(1)
+        )
+        row = (await db.execute(query)).first()
+        if row is None:
+            return None
+        stored_index, transcription = row
+        if stored_index:
+            index = SegmentIndex.from_bytes(stored_index)
+        elif transcription:
+            index = SegmentIndex.from_transcription(transcription)
+        else:
+            return None
+        self.put(media_id, index)
+        return index
+
+
+segment_index_cache = SegmentIndexCache()
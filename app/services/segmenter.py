@@ -0,0 +1,75 @@
+from dataclasses import dataclass
+from typing import Sequence
+import numpy as np
+from app.config import (
+    SEGMENT_MAX_WORDS,
+    SEGMENT_MAX_SECONDS,
+    SEGMENT_PAUSE_SECONDS,
+    SEGMENT_SPLIT_ON_PUNCTUATION,
+    SEGMENT_MIN_WORDS,
+)
+
+_SENTENCE_END = (".", "?", "!")
+
+
+@dataclass
+class SegmenterConfig:
+    """Segment boundary rules; a value of 0 disables the corresponding limit.
+
+    `max_words` and `max_duration` are hard limits. Pauses of at least
+    `pause_gap` seconds and sentence-ending punctuation are soft boundaries,
+    only taken once a segment has `min_words` words.
+    """
+    max_words: int = SEGMENT_MAX_WORDS
+    max_duration: float = SEGMENT_MAX_SECONDS
+    pause_gap: float = SEGMENT_PAUSE_SECONDS
+    split_on_punctuation: bool = SEGMENT_SPLIT_ON_PUNCTUATION
+    min_words: int = SEGMENT_MIN_WORDS
+
+
+def segment_words(starts: np.ndarray,
+                  ends: np.ndarray,
+                  words: Sequence[str],
+                  config: SegmenterConfig = None) -> np.ndarray:
+    """Compute segment boundaries over word timestamp arrays.
+
+    Soft boundary candidates are found with vectorized comparisons over the
+    whole word arrays; the greedy pass then jumps from boundary to boundary
+    with binary searches, so the cost is linear in the number of words.
+
+    Returns:
+        np.ndarray: Word offsets where segments start, followed by the word count
+    """
+    config = config or SegmenterConfig()
+    n = len(starts)
+    if n == 0:
+        return np.zeros(1, dtype=np.int64)
+
+    # soft[i] is True when a new segment may start at word i
+    soft = np.zeros(n, dtype=bool)
+    if config.pause_gap > 0:
+        soft[1:] |= (starts[1:] - ends[:-1]) >= config.pause_gap
+    if config.split_on_punctuation:
+        stripped = np.char.rstrip(np.asarray(words, dtype=str))
+        for mark in _SENTENCE_END:
+            soft[1:] |= np.char.endswith(stripped, mark)[:-1]
+    soft_boundaries = np.flatnonzero(soft)
+    # Latest end time seen so far, so duration limits work with unsorted end times
+    running_ends = np.maximum.accumulate(ends)
+
+    min_words = max(config.min_words, 1)
+    offsets = [0]
+    i = 0
+    while i < n:
+        limit = n
+        if config.max_words > 0:
+            limit = min(limit, i + config.max_words)
+        if config.max_duration > 0:
+            within = int(np.searchsorted(running_ends, starts[i] + config.max_duration, side="right"))
+            limit = min(limit, max(within, i + 1))
+        candidate = int(np.searchsorted(soft_boundaries, i + min_words - 1, side="right"))
+        if candidate < len(soft_boundaries):
+            limit = min(limit, int(soft_boundaries[candidate]))
+        offsets.append(limit)
+        i = limit
+    return np.asarray(offsets, dtype=np.int64)
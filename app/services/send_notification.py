@@ -1,10 +1,12 @@
-from twilio.rest import Client
-from app.config import TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_PHONE_NUMBER
-
-client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+from app.config import TWILIO_PHONE_NUMBER
+from app.services.clients import get_clients
 
 def send_whatsapp_message(message, phone_number):
-    message = client.messages.create(
+    """Send a WhatsApp message with the blocking Twilio client.
+
+    Use `enqueue_notification` from async code; the outbox dispatcher calls this in a thread.
+    """
+    return get_clients().twilio.messages.create(
         from_=TWILIO_PHONE_NUMBER,
         body=message,
         to=f"whatsapp:{phone_number}"
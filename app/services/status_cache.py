@@ -0,0 +1,319 @@
+import asyncio
+import enum
+import json
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Optional, Set, Tuple
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import Analysis, AnalysisStatus
+from app.services.lru import LRUCache
+from app.config import (
+    STATUS_CACHE_BACKEND,
+    STATUS_CACHE_SIZE,
+    STATUS_CACHE_TTL_SECONDS,
+)
+
+STATUS_CHANNEL = "analysis_status"
+
+
+class AnalysisStage(str, enum.Enum):
+    QUEUED = 'queued'
+    DOWNLOADING = 'downloading'
+    EXTRACTING_AUDIO = 'extracting_audio'
+    TRANSCRIBING = 'transcribing'
+    ANALYZING = 'analyzing'
+    THUMBNAILS = 'thumbnails'
+    RETRYING = 'retrying'
+    DONE = 'done'
+    FAILED = 'failed'
+
+
+_STAGE_STATUS = {
+    AnalysisStage.DONE: AnalysisStatus.DONE,
+    AnalysisStage.FAILED: AnalysisStatus.FAILED,
+}
+_TERMINAL = {AnalysisStatus.DONE.value, AnalysisStatus.FAILED.value}
+
+
+def is_terminal(entry: Dict) -> bool:
+    return entry.get("status") in _TERMINAL
+
+
+class StatusCache:
+    """
+    In-process cache of the latest analysis status and pipeline stage per media,
+    with push updates for subscribers.
+
+    Entries of finished analyses are kept until evicted; entries of running ones
+    are only trusted for `ttl` seconds after their last update, so a missed
+    update falls back to the database instead of going stale.
+    """
+
+    def __init__(self, max_entries: int = STATUS_CACHE_SIZE, ttl: float = STATUS_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._entries: LRUCache[Tuple[Dict, float]] = LRUCache(max_entries)
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    async def start(self) -> None:
+        """Start receiving updates published by other processes, if the backend supports it."""
+
+    async def stop(self) -> None:
+        pass
+
+    def get(self, media_id, allow_stale: bool = False) -> Optional[Dict]:
+        """Cached status of a media's latest analysis, or None if missing (or stale)."""
+        cached = self._entries.get(str(media_id))
+        if cached is None:
+            return None
+        entry, stored_at = cached
+        if not allow_stale and not is_terminal(entry) and time.monotonic() - stored_at > self.ttl:
+            return None
+        return dict(entry)
+
+    async def publish(self, media_id, stage: AnalysisStage, **fields) -> Dict:
+        """Record a stage transition and push it to subscribers.
+
+        `fields` (analysis_id, created_at, error) are merged into the previous
+        entry; QUEUED starts a new one. The analysis status follows from the
+        stage. Never raises, so status updates cannot fail the pipeline.
+        """
+        try:
+            stage = AnalysisStage(stage)
+            previous = self._entries.peek(str(media_id))
+            entry = {"media_id": str(media_id)}
+            if previous and stage != AnalysisStage.QUEUED:
+                entry.update(previous[0])
+                entry.pop("error", None)
+            entry.update({k: _jsonable(v) for k, v in fields.items()})
+            entry["stage"] = stage.value
+            entry["status"] = _STAGE_STATUS.get(stage, AnalysisStatus.PROCESSING).value
+            entry["has_results"] = stage == AnalysisStage.DONE
+            entry["updated_at"] = datetime.now(timezone.utc).isoformat()
+            self._apply(entry)
+            await self._broadcast(entry)
+            return entry
+        except Exception as e:
+            print(f"Failed to publish analysis status for media {media_id}: {str(e)}")
+            return {}
+
+    def put(self, entry: Dict) -> None:
+        """Store an entry read from the database without notifying subscribers."""
+        self._store(entry)
+
+    def _store(self, entry: Dict) -> None:
+        self._entries.put(entry["media_id"], (entry, time.monotonic()))
+
+    def _apply(self, entry: Dict) -> None:
+        self._store(entry)
+        for queue in self._subscribers.get(entry["media_id"], ()):
+            if queue.full():
+                # Subscribers only need the latest state; drop the oldest update
+                queue.get_nowait()
+            queue.put_nowait(dict(entry))
+
+    async def _broadcast(self, entry: Dict) -> None:
+        """Forward an update to other processes."""
+
+    @asynccontextmanager
+    async def subscribe(self, media_id) -> AsyncIterator[asyncio.Queue]:
+        """Queue receiving every status update of a media while the context is open."""
+        key = str(media_id)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=16)
+        self._subscribers.setdefault(key, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(key)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[key]
+
+
+class PostgresStatusCache(StatusCache):
+    """
+    Status cache shared between processes through Postgres LISTEN/NOTIFY.
+
+    Updates are applied locally and sent on the `analysis_status` channel; every
+    started process listens on it, so API processes see the stages reached by
+    separate worker processes.
+
+    The listening connection is reopened with exponential backoff when it drops
+    or stops answering health checks. Updates sent in the meantime are lost, so
+    while it is down `get` misses and callers read the database, and on
+    reconnecting the cache is cleared and subscribers get the database state.
+    """
+
+    def __init__(self, engine=None, dsn: Optional[str] = None, reconnect_max_delay: float = 30,
+                 health_check_interval: float = 30, **kwargs):
+        super().__init__(**kwargs)
+        if engine is None:
+            from app.database import engine
+        if dsn is None:
+            from app.config import DATABASE_URL
+            dsn = DATABASE_URL
+        self.engine = engine
+        self.dsn = dsn
+        self.origin = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.reconnect_max_delay = reconnect_max_delay
+        self.health_check_interval = health_check_interval
+        self._listening = False
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen_loop())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    def get(self, media_id, allow_stale: bool = False) -> Optional[Dict]:
+        if not self._listening and not allow_stale:
+            # Updates from other processes may be missing
+            return None
+        return super().get(media_id, allow_stale)
+
+    async def _listen_loop(self) -> None:
+        import asyncpg
+
+        delay = 1.0
+        while True:
+            try:
+                connection = await asyncpg.connect(self.dsn)
+            except Exception as e:
+                print(f"Could not listen for analysis status updates, retrying in {delay:g}s: {str(e)}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.reconnect_max_delay)
+                continue
+            lost = asyncio.Event()
+            try:
+                connection.add_termination_listener(lambda _: lost.set())
+                await connection.add_listener(STATUS_CHANNEL, self._on_notify)
+                await self._resync()
+                self._listening = True
+                delay = 1.0
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), self.health_check_interval)
+                    except asyncio.TimeoutError:
+                        # A dropped network path does not always close the connection
+                        await connection.execute("SELECT 1", timeout=self.health_check_interval)
+                print("Lost the analysis status listener connection, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Analysis status listener failed, reconnecting: {str(e)}")
+            finally:
+                self._listening = False
+                connection.terminate()
+
+    async def _resync(self) -> None:
+        """Drop entries that may have missed updates, and send subscribers the database state."""
+        previous = {key: self._entries.peek(key)[0] for key in self._subscribers if key in self._entries}
+        self._entries.clear()
+        if not self._subscribers:
+            return
+        async with AsyncSession(self.engine) as db:
+            for key in list(self._subscribers):
+                entry = await _database_status(db, uuid.UUID(key), previous.get(key))
+                if entry is None:
+                    continue
+                old = previous.get(key) or {}
+                if any(entry.get(field) != old.get(field) for field in ("analysis_id", "status", "stage")):
+                    self._apply(entry)
+                else:
+                    self._store(entry)
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        if message.pop("origin", None) != self.origin:
+            self._apply(message)
+
+    async def _broadcast(self, entry: Dict) -> None:
+        payload = dict(entry, origin=self.origin)
+        if "error" in payload:
+            # NOTIFY payloads are limited to 8000 bytes
+            payload["error"] = str(payload["error"])[:1000]
+        async with self.engine.connect() as connection:
+            await connection.execute(select(func.pg_notify(STATUS_CHANNEL, json.dumps(payload))))
+            await connection.commit()
+
+
+def _jsonable(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+async def _database_status(db: AsyncSession, media_id, previous: Optional[Dict]) -> Optional[Dict]:
+    """Status of a media's latest analysis read from the database; `previous` supplies the stage of a running one."""
+    query = (
+        select(
+            Analysis.id,
+            Analysis.status,
+            Analysis.created_at,
+            Analysis.updated_at,
+            Analysis.meta.isnot(None).label("has_meta")
+        )
+        .where(Analysis.media_id == media_id)
+        .order_by(Analysis.created_at.desc())
+        .limit(1)
+    )
+    row = (await db.execute(query)).first()
+    if row is None:
+        return None
+
+    status = _jsonable(row.status)
+    stage = status if status in _TERMINAL else None
+    if stage is None and previous and previous.get("analysis_id") == str(row.id):
+        # Still running: keep the last stage seen for this analysis
+        stage = previous.get("stage")
+    return {
+        "media_id": str(media_id),
+        "analysis_id": str(row.id),
+        "status": status,
+        # The database does not record the stage of a running analysis
+        "stage": stage,
+        "created_at": _jsonable(row.created_at),
+        "updated_at": _jsonable(row.updated_at),
+        "has_results": bool(row.has_meta) and status == AnalysisStatus.DONE.value
+    }
+
+
+async def get_analysis_status(db: AsyncSession, media_id: uuid.UUID) -> Optional[Dict]:
+    """Status of a media's latest analysis from the status cache, falling back to the database."""
+    entry = status_cache.get(media_id)
+    if entry is not None:
+        return entry
+    entry = await _database_status(db, media_id, status_cache.get(media_id, allow_stale=True))
+    if entry is not None:
+        status_cache.put(entry)
+    return entry
+
+
+def _create_status_cache() -> StatusCache:
+    if STATUS_CACHE_BACKEND == "postgres":
+        return PostgresStatusCache()
+    if STATUS_CACHE_BACKEND == "memory":
+        return StatusCache()
+    raise ValueError(f"Unknown STATUS_CACHE_BACKEND: {STATUS_CACHE_BACKEND}")
+
+
+status_cache = _create_status_cache()
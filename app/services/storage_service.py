@@ -1,16 +1,44 @@
-from typing import Dict
+from typing import AsyncIterator, Dict, List, Optional
 from datetime import datetime
 from fastapi import HTTPException
-import aiohttp
 import os
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from app.services.database import get_db
+from app.services.clients import ClientRegistry, get_clients
+from app.config import DOWNLOAD_CHUNK_SIZE, STORAGE_BACKEND
+
+
+async def write_chunks(chunks: AsyncIterator[bytes], local_path: str, executor, digest=None) -> None:
+    """Write `chunks` to `local_path`, updating the hashlib object `digest` with them.
+
+    Writes run on `executor`, each while the next chunk is read, so the event
+    loop never blocks on disk I/O.
+    """
+    def write(f, chunk):
+        f.write(chunk)
+        if digest is not None:
+            digest.update(chunk)
+
+    loop = asyncio.get_event_loop()
+    pending = None
+    with open(local_path, 'wb') as f:
+        try:
+            async for chunk in chunks:
+                if pending is not None:
+                    # One write at a time, so chunks land in order
+                    await pending
+                pending = loop.run_in_executor(executor, write, f, chunk)
+            if pending is not None:
+                await pending
+        finally:
+            # Never close the file under a running write
+            if pending is not None and not pending.done():
+                await asyncio.wait([pending])
 
 class StorageService:
-    def __init__(self):
-        self.supabase = get_db()
-        self.executor = ThreadPoolExecutor(max_workers=2)
+    def __init__(self, clients: Optional[ClientRegistry] = None):
+        self.clients = clients or get_clients()
+        self.supabase = self.clients.supabase
+        self.executor = self.clients.io_executor
 
     async def generate_presigned_url(self, file_name: str, file_type: str, user_id: str) -> Dict:
         """Generate a pre-signed URL for file upload
@@ -43,47 +71,63 @@ class StorageService:
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error generating pre-signed URL: {str(e)}")
 
-    async def download_video(self, file_path: str, local_path: str) -> str:
+    def _signed_download_url(self, file_path: str) -> str:
+        """Create a signed URL (valid for 1 hour) for downloading a stored file."""
+        bucket_name = 'recordings'
+        print("File path 1", file_path)
+        signed_url = self.supabase.storage.from_(bucket_name).create_signed_url(
+            file_path,
+            3600  # URL valid for 1 hour
+        )
+        print("Signed URL 1", signed_url)
+        return signed_url['signedURL']
+
+    async def stream_media(self, file_path: str, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Stream a file from Supabase storage without touching the disk.
+
+        Args:
+            file_path (str): Path of the file in the storage bucket
+            chunk_size (int): Size of the chunks to yield, defaults to DOWNLOAD_CHUNK_SIZE
+
+        Yields:
+            bytes: Consecutive chunks of the file
+        """
+        chunk_size = chunk_size or DOWNLOAD_CHUNK_SIZE
+        try:
+            signed_url = self._signed_download_url(file_path)
+            async with self.clients.http.get(signed_url) as response:
+                if response.status != 200:
+                    raise HTTPException(
+                        status_code=response.status,
+                        detail=f"Failed to download file: HTTP {response.status}"
+                    )
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    yield chunk
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error downloading video: {str(e)}")
+
+    async def download_video(self, file_path: str, local_path: str, digest=None) -> str:
         """Download a video file from Supabase storage.
         
         Args:
             file_path (str): Path of the file in the storage bucket
             local_path (str): Local path where the file should be saved
+            digest: Optional hashlib object updated with the downloaded bytes
             
         Returns:
             str: Path to the downloaded file
         """
         try:
-            bucket_name = 'recordings'
-            
             # Ensure the directory exists
             os.makedirs(os.path.dirname(local_path), exist_ok=True)
-            
-            # Get signed URL for downloading
-            print("File path 1", file_path)
-            signed_url = self.supabase.storage.from_(bucket_name).create_signed_url(
-                file_path,
-                3600  # URL valid for 1 hour
-            )
-            print("Signed URL 1", signed_url)
-            
-            # Download the file using the signed URL
-            async with aiohttp.ClientSession() as session:
-                async with session.get(signed_url['signedURL']) as response:
-                    if response.status == 200:
-                        with open(local_path, 'wb') as f:
-                            while True:
-                                chunk = await response.content.read(8192)  # Read in chunks
-                                if not chunk:
-                                    break
-                                f.write(chunk)
-                        return local_path
-                    else:
-                        raise HTTPException(
-                            status_code=response.status,
-                            detail=f"Failed to download file: HTTP {response.status}"
-                        )
-                        
+
+            await write_chunks(self.stream_media(file_path), local_path, self.executor, digest)
+            return local_path
+
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error downloading video: {str(e)}")
 
@@ -124,4 +168,24 @@ class StorageService:
             }
                         
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error uploading file: {str(e)}") 
\ No newline at end of file
+            raise HTTPException(status_code=500, detail=f"Error uploading file: {str(e)}") 
+
+    async def delete_files(self, file_paths: List[str]) -> None:
+        """Delete files from Supabase storage (in the I/O thread pool)."""
+        if not file_paths:
+            return
+        bucket_name = 'recordings'
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(
+            self.executor, lambda: self.supabase.storage.from_(bucket_name).remove(list(file_paths))
+        )
+
+
+def get_storage_service():
+    """Storage for the configured `STORAGE_BACKEND` (`StorageService` or `LocalStorageService`)."""
+    if STORAGE_BACKEND == "local":
+        from app.services.local_storage import LocalStorageService
+        return LocalStorageService()
+    if STORAGE_BACKEND == "supabase":
+        return StorageService()
+    raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
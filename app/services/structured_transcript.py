@@ -0,0 +1,150 @@
+import struct
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from app.services.segmenter import SegmenterConfig, segment_words
+
+_MAGIC = b"MTR1"
+_HEADER = struct.Struct("<4sIII")  # magic, words, segments, text bytes
+
+
+class StructuredTranscript:
+    """
+    Columnar word-level transcript.
+
+    Words are stored as parallel arrays (start, end, byte offset into one
+    UTF-8 blob) and segments as offsets into the word arrays, so time ranges
+    are found with binary search instead of parsing the formatted text.
+    """
+
+    def __init__(self,
+                 word_starts: np.ndarray,
+                 word_ends: np.ndarray,
+                 word_offsets: np.ndarray,
+                 text: bytes,
+                 segment_offsets: np.ndarray):
+        self.word_starts = word_starts
+        self.word_ends = word_ends
+        # len(words) + 1 byte offsets into `text`
+        self.word_offsets = word_offsets
+        self.text = text
+        # len(segments) + 1 word offsets; segment i spans words [offsets[i], offsets[i + 1])
+        self.segment_offsets = segment_offsets
+
+    @classmethod
+    def from_words(cls, words: List[Dict], segment_offsets: Optional[Sequence[int]] = None,
+                   config: Optional[SegmenterConfig] = None) -> "StructuredTranscript":
+        """Build from `{"word", "start", "end"}` dicts.
+
+        Segments are computed with `segment_words` unless `segment_offsets`
+        (segment start offsets plus the word count) are given.
+        """
+        texts = [word["word"] for word in words]
+        encoded = [text.encode("utf-8") for text in texts]
+        word_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=word_offsets[1:])
+        word_starts = np.fromiter((word["start"] for word in words), dtype=np.float64, count=len(words))
+        word_ends = np.fromiter((word["end"] for word in words), dtype=np.float64, count=len(words))
+        if segment_offsets is None:
+            segment_offsets = segment_words(word_starts, word_ends, texts, config)
+        return cls(
+            word_starts=word_starts,
+            word_ends=word_ends,
+            word_offsets=word_offsets,
+            text=b"".join(encoded),
+            segment_offsets=np.asarray(segment_offsets, dtype=np.int64)
+        )
+
+    @property
+    def word_count(self) -> int:
+        return len(self.word_starts)
+
+    @property
+    def segment_count(self) -> int:
+        return max(len(self.segment_offsets) - 1, 0)
+
+    @property
+    def segment_starts(self) -> np.ndarray:
+        return self.word_starts[self.segment_offsets[:-1]]
+
+    @property
+    def segment_ends(self) -> np.ndarray:
+        return self.word_ends[self.segment_offsets[1:] - 1]
+
+    def word(self, index: int) -> str:
+        return self.text[self.word_offsets[index]:self.word_offsets[index + 1]].decode("utf-8")
+
+    def words(self, start: int = 0, stop: int = None) -> List[str]:
+        stop = self.word_count if stop is None else stop
+        return [self.word(i) for i in range(start, stop)]
+
+    def segment_text(self, index: int) -> str:
+        return " ".join(self.words(self.segment_offsets[index], self.segment_offsets[index + 1]))
+
+    def word_range(self, start: float, end: float) -> range:
+        """Indices of the words that start within [start, end)."""
+        first = int(np.searchsorted(self.word_starts, start, side="left"))
+        last = int(np.searchsorted(self.word_starts, end, side="left"))
+        return range(first, last)
+
+    def segment_range(self, start: float, end: float) -> range:
+        """Indices of the segments overlapping [start, end)."""
+        first = int(np.searchsorted(self.segment_ends, start, side="right"))
+        last = int(np.searchsorted(self.segment_starts, end, side="left"))
+        return range(first, max(first, last))
+
+    def segment_at(self, timestamp: float) -> int:
+        """Index of the segment containing (or last starting before) `timestamp`."""
+        return max(int(np.searchsorted(self.segment_starts, timestamp, side="right")) - 1, 0)
+
+    def nearest_segment_start(self, timestamp: float) -> float:
+        """Start of the segment closest to `timestamp`."""
+        starts = self.segment_starts
+        if not len(starts):
+            return timestamp
+        index = int(np.searchsorted(starts, timestamp))
+        candidates = starts[max(index - 1, 0):index + 1]
+        return float(candidates[np.argmin(np.abs(candidates - timestamp))])
+
+    def segments(self, start: float = 0.0, end: float = float("inf")) -> List[Dict]:
+        """Segments overlapping [start, end) as `{"start", "end", "text"}` dicts."""
+        starts, ends = self.segment_starts, self.segment_ends
+        return [
+            {"start": float(starts[i]), "end": float(ends[i]), "text": self.segment_text(i)}
+            for i in self.segment_range(start, end)
+        ]
+
+    def format(self) -> str:
+        """Formatted `[XX.XXs] text` transcription, one line per segment."""
+        starts = self.segment_starts
+        return "".join(f"[{starts[i]:.2f}s] {self.segment_text(i)}\n" for i in range(self.segment_count))
+
+    def to_bytes(self) -> bytes:
+        """Compact little-endian binary encoding for storage."""
+        return b"".join([
+            _HEADER.pack(_MAGIC, self.word_count, self.segment_count, len(self.text)),
+            self.word_starts.astype("<f8").tobytes(),
+            self.word_ends.astype("<f8").tobytes(),
+            self.word_offsets.astype("<u4").tobytes(),
+            self.segment_offsets.astype("<u4").tobytes(),
+            self.text
+        ])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "StructuredTranscript":
+        magic, words, segments, text_bytes = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("Not a structured transcript")
+        position = _HEADER.size
+
+        def take(dtype: str, count: int) -> np.ndarray:
+            nonlocal position
+            array = np.frombuffer(data, dtype=dtype, count=count, offset=position)
+            position += array.nbytes
+            return array
+
+        word_starts = take("<f8", words).astype(np.float64)
+        word_ends = take("<f8", words).astype(np.float64)
+        word_offsets = take("<u4", words + 1).astype(np.int64)
+        segment_offsets = take("<u4", segments + 1).astype(np.int64)
+        text = data[position:position + text_bytes]
+        return cls(word_starts, word_ends, word_offsets, text, segment_offsets)
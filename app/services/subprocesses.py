@@ -0,0 +1,22 @@
+import asyncio
+from typing import List, Tuple
+
+
+async def run_process(command: List[str]) -> Tuple[bytes, bytes]:
+    """Run a command (ffmpeg, ffprobe) without blocking the event loop.
+
+    Returns:
+        Tuple[bytes, bytes]: Its stdout and stderr
+
+    Raises:
+        RuntimeError: If it exits with a non-zero status, with the end of its stderr
+    """
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"{command[0]} failed: {stderr.decode(errors='ignore')[-500:]}")
+    return stdout, stderr
@@ -1,85 +1,166 @@
 import os
 import time
-from groq import Groq
 import json
 import asyncio
-from app.config import GROQ_API_KEY
-from concurrent.futures import ThreadPoolExecutor
+import tempfile
+from typing import Dict, Optional
+from app.config import (
+    TRANSCRIPTION_CHUNKING,
+    TRANSCRIPTION_CHUNK_MIN_SECONDS,
+    TRANSCRIPTION_CHUNK_SECONDS,
+    TRANSCRIPTION_CHUNK_OVERLAP_SECONDS,
+    TRANSCRIPTION_MAX_CONCURRENCY,
+    AUDIO_NORMALIZE,
+)
+from app.services.audio_chunking import (
+    probe_duration,
+    detect_silences,
+    plan_chunks,
+    extract_chunk,
+    stitch_chunk_words,
+)
+from app.services.audio_normalization import TimelineMap, speech_encoding_args, speech_extension
+from app.services.clients import get_clients
+from app.services.structured_transcript import StructuredTranscript
+from app.services.segmenter import SegmenterConfig
+from app.services.metrics import span
 
 class TranscriptionService:
-    def __init__(self):
-        self.groq_client = Groq(api_key=GROQ_API_KEY)
-        self.executor = ThreadPoolExecutor(max_workers=4)
-        
-    async def transcribe_audio(self, audio_path: str) -> str:
+    def __init__(self, groq_client=None, max_concurrency: int = TRANSCRIPTION_MAX_CONCURRENCY, executor=None,
+                 segmenter_config: Optional[SegmenterConfig] = None):
+        clients = get_clients()
+        self.groq_client = groq_client or clients.groq
+        self.max_concurrency = max_concurrency
+        self.executor = executor or clients.io_executor
+        self.segmenter_config = segmenter_config or SegmenterConfig()
+
+    def _transcribe_file(self, audio_path: str) -> Dict:
+        """Blocking Groq Whisper call for a single audio file."""
+        with open(audio_path, 'rb') as audio_file, span("groq_request") as request_span:
+            request_span.bytes = os.path.getsize(audio_path)
+            response = self.groq_client.audio.transcriptions.create(
+                file=audio_file,
+                model="whisper-large-v3-turbo",
+                response_format="verbose_json",
+                timestamp_granularities=["word","segment"],
+                language="en",
+                temperature=0.0
+            )
+            # Convert response to dict to avoid serialization issues
+            return {
+                "text": response.text,
+                "words": [
+                    {
+                        "word": word["word"],
+                        "start": word["start"],
+                        "end": word["end"]
+                    } for word in response.words
+                ]
+            }
+
+    async def _should_chunk(self, audio_path: str, chunked: Optional[bool]) -> Optional[float]:
+        """Return the audio duration if the file should be transcribed in chunks, else None."""
+        if chunked is None:
+            if TRANSCRIPTION_CHUNKING == "never":
+                return None
+            chunked = TRANSCRIPTION_CHUNKING == "always"
+        elif not chunked:
+            return None
+        try:
+            duration = await probe_duration(audio_path)
+        except Exception as e:
+            print(f"Could not probe audio duration, transcribing in one request: {str(e)}")
+            return None
+        if chunked or duration >= TRANSCRIPTION_CHUNK_MIN_SECONDS:
+            return duration
+        return None
+
+    async def _transcribe_chunked(self, audio_path: str, duration: float) -> Dict:
         """
-        Transcribe audio using Groq's Whisper model.
-        Returns the transcription with timestamps.
+        Split the audio at silences into overlapping chunks, transcribe them
+        concurrently and stitch the word timestamps back together.
         """
         try:
-            start_time = time.time()
-            
+            silences = await detect_silences(audio_path)
+        except Exception as e:
+            print(f"Silence detection failed, cutting at fixed intervals: {str(e)}")
+            silences = []
+        chunks = plan_chunks(duration, silences, TRANSCRIPTION_CHUNK_SECONDS, TRANSCRIPTION_CHUNK_OVERLAP_SECONDS)
+        print(f"Transcribing {duration:.0f}s of audio in {len(chunks)} chunks")
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        loop = asyncio.get_event_loop()
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            async def transcribe_chunk(index: int, chunk: Dict) -> Dict:
+                async with semaphore:
+                    if AUDIO_NORMALIZE:
+                        chunk_path = os.path.join(temp_dir, f"chunk_{index}.{speech_extension()}")
+                        encoding = speech_encoding_args()
+                    else:
+                        chunk_path, encoding = os.path.join(temp_dir, f"chunk_{index}.mp3"), None
+                    with span("extract_chunk"):
+                        await extract_chunk(audio_path, chunk["start"], chunk["end"], chunk_path, encoding)
+                    result = await loop.run_in_executor(self.executor, self._transcribe_file, chunk_path)
+                    try:
+                        os.remove(chunk_path)
+                    except OSError:
+                        pass
+                    return {**chunk, "words": result["words"]}
+
+            results = await asyncio.gather(*(transcribe_chunk(i, c) for i, c in enumerate(chunks)))
+
+        words = stitch_chunk_words(results)
+        return {
+            "text": " ".join(word["word"] for word in words),
+            "words": words
+        }
+
+    async def transcribe_words(self, audio_path: str, chunked: Optional[bool] = None,
+                               timeline: Optional[TimelineMap] = None) -> Dict:
+        """
+        Transcribe audio and return the raw text and word timestamps.
+
+        `chunked` forces (True) or disables (False) chunked transcription; by
+        default long recordings are chunked according to `TRANSCRIPTION_CHUNKING`.
+        For silence-trimmed audio, `timeline` maps the word timestamps back to
+        the original recording.
+        """
+        duration = await self._should_chunk(audio_path, chunked)
+        if duration is not None:
+            response = await self._transcribe_chunked(audio_path, duration)
+        else:
             # Since Groq's API is synchronous, run it in a thread pool
-            def transcribe():
-                with open(audio_path, 'rb') as audio_file:
-                    response = self.groq_client.audio.transcriptions.create(
-                        file=audio_file,
-                        model="whisper-large-v3-turbo",
-                        response_format="verbose_json",
-                        timestamp_granularities=["word","segment"],
-                        language="en",
-                        temperature=0.0
-                    )
-                    # Convert response to dict to avoid serialization issues
-                    return {
-                        "text": response.text,
-                        "words": [
-                            {
-                                "word": word["word"],
-                                "start": word["start"],
-                                "end": word["end"]
-                            } for word in response.words
-                        ]
-                    }
-            
-            # Run the synchronous code in a thread pool
             loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(self.executor, transcribe)
-            
+            response = await loop.run_in_executor(self.executor, self._transcribe_file, audio_path)
+
+        if timeline is not None:
+            response["words"] = timeline.map_words(response["words"])
+        return response
+
+    async def transcribe_structured(self, audio_path: str, chunked: Optional[bool] = None,
+                                    timeline: Optional[TimelineMap] = None) -> StructuredTranscript:
+        """
+        Transcribe audio using Groq's Whisper model.
+        Returns the word-level transcript grouped into segments.
+        """
+        try:
+            start_time = time.time()
+            response = await self.transcribe_words(audio_path, chunked=chunked, timeline=timeline)
             print(f"Transcription took {time.time() - start_time:.2f} seconds")
-            # print("GROQ ANSWER",response)
-            # Process the response to include timestamps
-            segments = []
-            current_segment = {"text": "", "words": [], "start": None, "end": None}
-            
-            for word in response["words"]:
-                # If this is the first word of a segment or current segment is too long
-                if current_segment["text"] == "" or len(current_segment["text"].split()) > 30:
-                    if current_segment["text"] != "":
-                        segments.append(current_segment)
-                    current_segment = {
-                        "text": word["word"],
-                        "words": [word],
-                        "start": word["start"],
-                        "end": word["end"]
-                    }
-                else:
-                    current_segment["text"] += " " + word["word"]
-                    current_segment["words"].append(word)
-                    current_segment["end"] = word["end"]
-            
-            # Add the last segment
-            if current_segment["text"] != "":
-                segments.append(current_segment)
-            
-            # Format the transcription with timestamps
-            formatted_transcription = ""
-            for segment in segments:
-                timestamp = f"[{segment['start']:.2f}s]"
-                formatted_transcription += f"{timestamp} {segment['text']}\n"
-            print("GROQ ANSWER",formatted_transcription)
-            return formatted_transcription
-            
+
+            return StructuredTranscript.from_words(response["words"], config=self.segmenter_config)
+
         except Exception as e:
             print(f"Error in transcription: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+
+    async def transcribe_audio(self, audio_path: str, chunked: Optional[bool] = None) -> str:
+        """
+        Transcribe audio using Groq's Whisper model.
+        Returns the transcription with timestamps.
+        """
+        transcript = await self.transcribe_structured(audio_path, chunked=chunked)
+        formatted_transcription = transcript.format()
+        print("GROQ ANSWER",formatted_transcription)
+        return formatted_transcription
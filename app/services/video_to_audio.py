@@ -1,6 +1,8 @@
 import subprocess
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from app.config import FFMPEG_STDIN_BUFFER_SIZE
+from app.services.clients import get_clients
+from app.services.audio_normalization import audio_encoding_args
 
 def convert_video_to_audio(video_path, audio_path):
     """Convert video to audio using FFmpeg."""
@@ -12,13 +14,13 @@ def convert_video_to_audio(video_path, audio_path):
         print(f"Error converting video to audio: {e}")
 
 async def convert_video_to_audio_async(video_path, audio_path, executor=None):
-    """Convert video to audio using FFmpeg asynchronously."""
+    """Convert video to audio using FFmpeg asynchronously (encoded for transcription, see `audio_encoding_args`)."""
     if executor is None:
-        executor = ThreadPoolExecutor(max_workers=1)
+        executor = get_clients().media_executor
     
     def convert():
         try:
-            command = ["ffmpeg", "-i", video_path, "-q:a", "0", "-map", "a", audio_path, "-y"]
+            command = ["ffmpeg", "-i", video_path, *audio_encoding_args(), "-map", "a", audio_path, "-y"]
             result = subprocess.run(command, check=True, capture_output=True, text=True)
             print(f"Audio saved to {audio_path}")
             return True
@@ -29,3 +31,67 @@ async def convert_video_to_audio_async(video_path, audio_path, executor=None):
     
     loop = asyncio.get_event_loop()
     await loop.run_in_executor(executor, convert)
+
+
+async def stream_video_to_audio_async(chunks, video_path, audio_path, executor=None):
+    """
+    Extract audio while the video is still downloading.
+
+    Chunks from the async iterator `chunks` are piped into ffmpeg's stdin and
+    written to `video_path` at the same time, so extraction overlaps with the
+    download and the video is available afterwards for frame extraction.
+    Containers that cannot be demuxed from a pipe (e.g. MP4 with the moov atom
+    at the end) fall back to converting the downloaded file. File writes run on
+    `executor`, so the event loop never blocks on disk I/O.
+
+    Returns the number of bytes received.
+    """
+    if executor is None:
+        executor = get_clients().media_executor
+    loop = asyncio.get_event_loop()
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0", *audio_encoding_args(), "-map", "a", audio_path, "-y",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    process.stdin.transport.set_write_buffer_limits(high=FFMPEG_STDIN_BUFFER_SIZE)
+    stderr_task = asyncio.create_task(process.stderr.read())
+
+    received = 0
+    pipe_open = True
+    try:
+        with open(video_path, 'wb') as video_file:
+            async for chunk in chunks:
+                received += len(chunk)
+                # Written to disk while the same chunk is piped into ffmpeg
+                write = loop.run_in_executor(executor, video_file.write, chunk)
+                try:
+                    if pipe_open:
+                        try:
+                            process.stdin.write(chunk)
+                            # Waits while ffmpeg is behind, bounding memory use
+                            await process.stdin.drain()
+                        except (BrokenPipeError, ConnectionResetError):
+                            pipe_open = False
+                finally:
+                    # One write at a time, so chunks land in order
+                    await write
+        if pipe_open:
+            process.stdin.close()
+    except BaseException:
+        process.kill()
+        await process.wait()
+        stderr_task.cancel()
+        raise
+
+    returncode = await process.wait()
+    stderr = (await stderr_task).decode(errors="ignore")
+    if returncode == 0:
+        print(f"Audio saved to {audio_path} while streaming {received} bytes")
+        return received
+
+    print(f"Streaming audio extraction failed ({stderr.strip()[-200:]}), converting downloaded file")
+    await convert_video_to_audio_async(video_path, audio_path, executor)
+    return received
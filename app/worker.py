@@ -0,0 +1,227 @@
+"""
+Background analysis worker.
+
+Run with `python -m app.worker` to consume analysis jobs from the queue
+configured by `JOB_QUEUE_BACKEND`, independently of the API processes. It also
+sends the notifications queued in the outbox (see `app.services.notifications`).
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import uuid
+from typing import Optional, Set
+from sqlalchemy import update
+from app.config import (
+    WORKER_CONCURRENCY,
+    JOB_HEARTBEAT_SECONDS,
+    JOB_POLL_SECONDS,
+    JOB_RECLAIM_SECONDS,
+    WORKER_METRICS_PORT,
+)
+from app.models.models import Analysis, AnalysisStatus
+from app.services.clients import close_clients
+from app.services.job_queue import Job, JobQueue, get_job_queue
+from app.services.notifications import NotificationDispatcher
+from app.services.status_cache import AnalysisStage, status_cache
+from app.services.metrics import span, job_queue_wait_seconds, jobs_total, registry
+
+
+async def run_analysis_job(media_id: str, fail_analysis: bool = True) -> None:
+    """
+    Run the analysis pipeline for a media file with a fresh database session.
+    """
+    from app.database import AsyncSessionLocal
+    from app.services.media_analysis_service import MediaAnalysisService
+    from app.services.storage_service import get_storage_service
+
+    async with AsyncSessionLocal() as db:
+        try:
+            storage_service = get_storage_service()
+            analysis_service = MediaAnalysisService(db, storage_service)
+            with span("process_media"):
+                await analysis_service.process_media(media_id, fail_analysis=fail_analysis)
+        except Exception as e:
+            print(f"Background analysis failed for media {media_id}: {str(e)}")
+            if fail_analysis:
+                # Make sure the analysis does not stay in PROCESSING after the last attempt
+                try:
+                    await db.rollback()
+                    await db.execute(
+                        update(Analysis)
+                        .where(
+                            Analysis.media_id == media_id,
+                            Analysis.status == AnalysisStatus.PROCESSING
+                        )
+                        .values(status=AnalysisStatus.FAILED, meta={'error': str(e)})
+                    )
+                    await db.commit()
+                    await status_cache.publish(media_id, AnalysisStage.FAILED, error=str(e))
+                except Exception as commit_error:
+                    print(f"Failed to update analysis status: {str(commit_error)}")
+            raise
+
+
+class Worker:
+    """Consumes jobs from a `JobQueue` with a fixed number of concurrent slots."""
+
+    def __init__(self, queue: JobQueue, concurrency: int = WORKER_CONCURRENCY, worker_id: Optional[str] = None):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stopping = asyncio.Event()
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        """Start the job slots and the lease reclaimer in the background."""
+        print(f"Worker {self.worker_id} starting with concurrency {self.concurrency}")
+        for slot in range(self.concurrency):
+            self._tasks.add(asyncio.create_task(self._slot_loop(slot)))
+        self._tasks.add(asyncio.create_task(self._reclaim_loop()))
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop claiming new jobs and wait for in-flight ones to finish."""
+        self._stopping.set()
+        if not self._tasks:
+            return
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks.clear()
+        print(f"Worker {self.worker_id} stopped")
+
+    def request_stop(self) -> None:
+        self._stopping.set()
+
+    async def run_forever(self) -> None:
+        await self.start()
+        await self._stopping.wait()
+        await self.stop()
+
+    async def _sleep(self, seconds: float) -> None:
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _slot_loop(self, slot: int) -> None:
+        while not self._stopping.is_set():
+            try:
+                job = await self.queue.claim(self.worker_id)
+            except Exception as e:
+                print(f"Worker slot {slot} failed to claim a job: {str(e)}")
+                job = None
+            if job is None:
+                await self._sleep(JOB_POLL_SECONDS)
+                continue
+            await self._run_job(job)
+
+    async def _run_job(self, job: Job) -> None:
+        print(f"Running job {job.id} for media {job.media_id} (attempt {job.attempts}/{job.max_attempts})")
+        job_queue_wait_seconds.observe(job.queue_wait)
+        task = asyncio.create_task(run_analysis_job(job.media_id, fail_analysis=job.is_final_attempt))
+        heartbeat = asyncio.create_task(self._heartbeat(job, task))
+        try:
+            await task
+            if await self.queue.complete(job.id, self.worker_id):
+                jobs_total.inc(outcome="done")
+                print(f"Job {job.id} completed")
+            else:
+                # Reclaimed after the lease expired; the job belongs to another worker now
+                jobs_total.inc(outcome="lease_lost")
+                print(f"Job {job.id} finished after its lease was lost")
+        except asyncio.CancelledError:
+            # Either the lease was lost to another worker or we are shutting down;
+            # the reclaimer requeues the job once its lease expires.
+            print(f"Job {job.id} cancelled")
+            jobs_total.inc(outcome="cancelled")
+            if not task.done():
+                task.cancel()
+                raise
+        except Exception as e:
+            print(f"Job {job.id} failed: {str(e)}")
+            jobs_total.inc(outcome="failed")
+            try:
+                retrying = await self.queue.fail(job, self.worker_id, str(e))
+                if retrying:
+                    print(f"Job {job.id} scheduled for retry")
+            except Exception as fail_error:
+                print(f"Failed to record job failure: {str(fail_error)}")
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job: Job, task: asyncio.Task) -> None:
+        while not task.done():
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                if not await self.queue.heartbeat(job.id, self.worker_id):
+                    print(f"Lost lease on job {job.id}, cancelling")
+                    task.cancel()
+                    return
+            except Exception as e:
+                print(f"Heartbeat failed for job {job.id}: {str(e)}")
+
+    async def _reclaim_loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                reclaimed = await self.queue.reclaim_expired()
+                if reclaimed:
+                    print(f"Reclaimed {reclaimed} job(s) with expired leases")
+            except Exception as e:
+                print(f"Failed to reclaim expired jobs: {str(e)}")
+            await self._sleep(JOB_RECLAIM_SECONDS)
+
+
+async def _serve_metrics(port: int):
+    """Expose the worker's metrics at http://0.0.0.0:<port>/metrics."""
+    from aiohttp import web
+
+    async def metrics(request):
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", port).start()
+    print(f"Worker metrics on port {port}")
+    return runner
+
+
+async def _main(concurrency: int, metrics_port: int, notifications: bool) -> None:
+    from app.schema import ensure_schema
+
+    await ensure_schema()
+    worker = Worker(get_job_queue(), concurrency=concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.request_stop)
+    metrics_runner = await _serve_metrics(metrics_port) if metrics_port else None
+    dispatcher = NotificationDispatcher() if notifications else None
+    if dispatcher:
+        await dispatcher.start()
+    try:
+        await worker.run_forever()
+    finally:
+        if dispatcher:
+            await dispatcher.stop()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        await close_clients()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the media analysis worker")
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY)
+    parser.add_argument("--metrics-port", type=int, default=WORKER_METRICS_PORT,
+                        help="port serving /metrics (0 disables)")
+    parser.add_argument("--no-notifications", action="store_true",
+                        help="do not send notifications from the outbox in this process")
+    args = parser.parse_args()
+    asyncio.run(_main(args.concurrency, args.metrics_port, not args.no_notifications))
+
+
+if __name__ == "__main__":
+    main()
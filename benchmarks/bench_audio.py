@@ -0,0 +1,96 @@
+"""
+Size of the audio sent to Whisper and transcription latency, before and after normalization.
+
+    python -m benchmarks.bench_audio --minutes 30
+
+Generates a recording with ffmpeg (44.1 kHz stereo, speech-like bursts with
+pauses) and prepares it three ways: the previous extraction (`-q:a 0` MP3),
+16 kHz mono speech encoding, and speech encoding with long silences trimmed.
+Each file is transcribed through `TranscriptionService` backed by
+`FakeGroqClient`, whose latency grows with the audio duration and the
+uploaded bytes (`--upload-seconds-per-mb`).
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import tempfile
+import time
+
+from app.services.audio_normalization import normalize_audio, speech_extension
+from app.services.clients import close_clients
+from app.services.transcription_service import TranscriptionService
+from benchmarks.fakes import FakeGroqClient, media_duration
+
+
+def generate_audio(path: str, minutes: float) -> None:
+    duration = minutes * 60
+    # 6 s of tone followed by 3 s of silence, repeated
+    # (commas are escaped, as they would otherwise separate filters)
+    expression = "if(lt(mod(t\\,9)\\,6)\\,0.5*sin(2*PI*440*t)\\,0)"
+    subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-f", "lavfi",
+         "-i", f"aevalsrc={expression}|{expression}:s=44100:d={duration}",
+         "-c:a", "pcm_s16le", path, "-y"],
+        check=True
+    )
+
+
+def legacy_extract(source: str, path: str) -> None:
+    """Audio extraction as it was before normalization."""
+    subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", source, "-q:a", "0", "-map", "a", path, "-y"],
+        check=True
+    )
+
+
+async def run(args) -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = os.path.join(temp_dir, "meeting.wav")
+        print(f"Generating {args.minutes:g} minutes of audio...")
+        generate_audio(source, args.minutes)
+
+        legacy = os.path.join(temp_dir, "legacy.mp3")
+        legacy_extract(source, legacy)
+        variants = [("-q:a 0 mp3", legacy, None)]
+        for label, trim in (("16 kHz mono", False), ("+ trim silence", True)):
+            path = os.path.join(temp_dir, f"{'trimmed' if trim else 'normalized'}.{speech_extension()}")
+            start = time.perf_counter()
+            timeline = await normalize_audio(legacy, path, trim_silence=trim)
+            print(f"{label}: prepared in {time.perf_counter() - start:.2f}s")
+            variants.append((label, path, timeline))
+
+        print(f"\n{'audio':>16} {'bytes':>12} {'seconds':>8} {'transcribe s':>13} {'words':>6} {'last word':>10}")
+        baseline = None
+        for label, path, timeline in variants:
+            client = FakeGroqClient(base_latency=args.base_latency, seconds_per_audio_second=args.per_second,
+                                    seconds_per_megabyte=args.upload_seconds_per_mb)
+            service = TranscriptionService(groq_client=client, max_concurrency=args.concurrency)
+            start = time.perf_counter()
+            response = await service.transcribe_words(path, chunked=args.chunked, timeline=timeline)
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(path)
+            baseline = baseline or (size, elapsed)
+            last_word = response["words"][-1]["end"] if response["words"] else 0.0
+            print(f"{label:>16} {size:12d} {media_duration(path):8.0f} {elapsed:13.2f} "
+                  f"{len(response['words']):6d} {last_word:10.1f}")
+            if baseline[0] != size:
+                print(f"{'':>16} {1 - size / baseline[0]:11.1%} smaller, transcription {baseline[1] / elapsed:.2f}x faster")
+    await close_clients()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=30)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--base-latency", type=float, default=0.3)
+    parser.add_argument("--per-second", type=float, default=0.005,
+                        help="fake backend latency per second of uploaded audio")
+    parser.add_argument("--upload-seconds-per-mb", type=float, default=0.4,
+                        help="fake upload time per MB (0.4 s is about 20 Mbit/s)")
+    parser.add_argument("--chunked", action="store_true", help="transcribe in parallel chunks")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
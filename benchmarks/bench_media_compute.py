@@ -0,0 +1,95 @@
+"""
+Concurrent frame work on the media threads vs the media compute process pool.
+
+    python -m benchmarks.bench_media_compute --videos 8 --minutes 5
+
+Writes a synthetic video with OpenCV and runs, for `--videos` concurrent
+"analyses", what the pipeline does per video with OpenCV: the keyframe strip
+(one frame every 5 s), its sprite sheets and a handful of chapter frames.
+Each is run on a thread pool and on `MediaComputePool`, both with `--workers`
+workers. Finally, the strip frames of one video are returned to the caller
+pickled and through shared memory.
+"""
+import argparse
+import asyncio
+import os
+import pickle
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.frame_extractor import build_sprite_sheets, extract_frames, iter_frames, strip_timestamps, video_duration
+from app.services.media_compute import MediaComputePool
+from benchmarks.bench_thumbnails import generate_video
+
+
+def decode_frames_pickled(video_path: str, timestamps):
+    """Like `MediaComputePool.decode_frames`, but returns the frames through the result pipe."""
+    return [frame for _, frame in iter_frames(video_path, timestamps) if frame is not None]
+
+
+async def analyze_frames(pool: MediaComputePool, video_path: str, output_dir: str) -> None:
+    os.makedirs(output_dir, exist_ok=True)
+    duration = await pool.run(video_duration, video_path)
+    strip = await pool.run(extract_frames, video_path, strip_timestamps(duration, 5, 720), output_dir)
+    paths = [path for _, path in sorted(strip.items()) if path]
+    await pool.run(build_sprite_sheets, paths, output_dir, 160, 10, 10)
+    chapters_dir = os.path.join(output_dir, "chapters")
+    os.makedirs(chapters_dir, exist_ok=True)
+    chapters = [duration * (i + 0.3) / 8 for i in range(8)]
+    await pool.run(extract_frames, video_path, chapters, chapters_dir)
+
+
+async def run(args) -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = os.path.join(temp_dir, "meeting.mp4")
+        print(f"Generating {args.minutes:g} minute video...")
+        generate_video(video_path, args.minutes)
+
+        threads = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="media")
+        pools = [
+            ("threads", MediaComputePool(workers=0, fallback_executor=threads)),
+            ("processes", MediaComputePool(workers=args.workers)),
+        ]
+        print(f"\n{args.videos} concurrent videos, {args.workers} workers")
+        baseline = None
+        for label, pool in pools:
+            # Start the worker processes outside the measurement
+            await asyncio.gather(*(pool.run(video_duration, video_path) for _ in range(args.workers)))
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                analyze_frames(pool, video_path, os.path.join(temp_dir, f"{label}_{i}"))
+                for i in range(args.videos)
+            ))
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{label:>10}: {elapsed:6.2f}s ({baseline / elapsed:.2f}x)")
+
+        process_pool = pools[1][1]
+        duration = video_duration(video_path)
+        timestamps = strip_timestamps(duration, 5, 720)
+        start = time.perf_counter()
+        frames = await process_pool.run(decode_frames_pickled, video_path, timestamps)
+        pickled = time.perf_counter() - start
+        size = len(pickle.dumps(frames, protocol=pickle.HIGHEST_PROTOCOL))
+        start = time.perf_counter()
+        with await process_pool.decode_frames(video_path, timestamps) as shared:
+            count = len(shared.timestamps)
+        shared_elapsed = time.perf_counter() - start
+        print(f"\n{count} frames ({size / 2 ** 20:.0f} MiB): pickled {pickled:.2f}s, shared memory {shared_elapsed:.2f}s")
+
+        for _, pool in pools:
+            pool.shutdown()
+        threads.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=8)
+    parser.add_argument("--minutes", type=float, default=5)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
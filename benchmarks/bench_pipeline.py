@@ -0,0 +1,182 @@
+"""
+End-to-end throughput of the analysis pipeline.
+
+    python -m benchmarks.bench_pipeline --jobs 8 --concurrency 4 --minutes 5
+
+Generates a recording with ffmpeg, stores one distinctly tagged copy per job
+in `LocalStorageService`, and runs `MediaAnalysisService.process_media` for
+all of them concurrently. Storage, Whisper, the LLM and Twilio are local
+fakes; ffmpeg, OpenCV and the database are real, so `DATABASE_URL` must point
+at a Postgres database the benchmark may upgrade (`app.schema.ensure_schema`)
+and create rows in (its rows are deleted afterwards).
+
+Reports jobs per minute, p50/p99 latency per pipeline stage and peak RSS.
+"""
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+
+import numpy as np
+from sqlalchemy import delete, select
+
+from app.database import AsyncSessionLocal, engine
+from app.models.models import Analysis, AnalysisCache, AnalysisStatus, Media, User
+from app.schema import ensure_schema
+from app.services.clients import ClientRegistry, close_clients, set_clients
+from app.services.llm_gateway import llm_gateway
+from app.services.local_storage import LocalStorageService
+from app.services.media_analysis_service import MediaAnalysisService
+from app.services.metrics import add_span_listener, remove_span_listener, span
+from app.services.notifications import FakeTransport, NotificationDispatcher
+from benchmarks.fakes import FakeAsyncOpenAI, FakeGroqClient, FakeTwilioClient
+
+
+def generate_media(path: str, minutes: float, kind: str) -> None:
+    duration = minutes * 60
+    # Speech-like audio: 4 s of tone followed by 1 s of silence
+    audio = f"aevalsrc=if(lt(mod(t\\,5)\\,4)\\,0.5*sin(2*PI*440*t)\\,0):s=44100:d={duration}"
+    if kind == "video":
+        command = ["-f", "lavfi", "-i", f"testsrc2=size=640x360:rate=25:duration={duration}",
+                   "-f", "lavfi", "-i", audio,
+                   "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest"]
+    else:
+        command = ["-f", "lavfi", "-i", audio, "-c:a", "libmp3lame", "-b:a", "128k"]
+    subprocess.run(["ffmpeg", "-hide_banner", "-loglevel", "error", *command, path, "-y"], check=True)
+
+
+def tag_copy(source: str, destination: str, tag: str) -> None:
+    """Remux with a metadata tag so every job has a distinct content hash."""
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", source,
+         "-map", "0", "-c", "copy", "-metadata", f"comment={tag}", destination, "-y"],
+        check=True
+    )
+
+
+def peak_rss_mib() -> tuple:
+    """Peak resident set size of this process and of its largest child (ffmpeg), in MiB."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return own, children
+
+
+async def create_rows(user_id: uuid.UUID, paths: list, kind: str) -> list:
+    async with AsyncSessionLocal() as db:
+        db.add(User(id=user_id, email=f"bench-{user_id}@example.com", phone_number="+10000000000"))
+        media_ids = []
+        for path in paths:
+            media = Media(id=uuid.uuid4(), user_id=user_id, type=kind, file_path=path, media_url=path)
+            db.add(media)
+            db.add(Analysis(id=uuid.uuid4(), media_id=media.id, status=AnalysisStatus.PROCESSING))
+            media_ids.append(media.id)
+        await db.commit()
+    return media_ids
+
+
+async def delete_rows(user_id: uuid.UUID, media_ids: list) -> None:
+    async with AsyncSessionLocal() as db:
+        hashes = [h for h in (await db.execute(
+            select(Media.content_hash).where(Media.id.in_(media_ids))
+        )).scalars().all() if h]
+        await db.execute(delete(Analysis).where(Analysis.media_id.in_(media_ids)))
+        await db.execute(delete(Media).where(Media.id.in_(media_ids)))
+        await db.execute(delete(User).where(User.id == user_id))
+        if hashes:
+            await db.execute(delete(AnalysisCache).where(AnalysisCache.content_hash.in_(hashes)))
+        await db.commit()
+
+
+async def run(args) -> None:
+    engine.sync_engine.echo = False
+    # The schema the app runs on, including columns and indexes added to older databases
+    await ensure_schema()
+
+    groq = FakeGroqClient(base_latency=args.whisper_latency, seconds_per_audio_second=args.whisper_per_second)
+    openai = FakeAsyncOpenAI(latency=args.llm_latency)
+    twilio = FakeTwilioClient()
+    set_clients(ClientRegistry(openai=openai, groq=groq, twilio=twilio))
+
+    durations = defaultdict(list)
+    errors = defaultdict(int)
+
+    def record(stage: str, seconds: float, outcome: str) -> None:
+        durations[stage].append(seconds)
+        if outcome != "ok":
+            errors[stage] += 1
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        extension = "mp4" if args.kind == "video" else "mp3"
+        source = os.path.join(temp_dir, f"source.{extension}")
+        print(f"Generating {args.minutes:g} minute {args.kind}...")
+        generate_media(source, args.minutes, args.kind)
+
+        storage = LocalStorageService(root=os.path.join(temp_dir, "storage"))
+        user_id = uuid.uuid4()
+        paths = [f"{user_id}/job_{i}.{extension}" for i in range(args.jobs)]
+        for i, path in enumerate(paths):
+            tag_copy(source, storage.local_path(path), f"{user_id}-{i}")
+        media_ids = await create_rows(user_id, paths, args.kind)
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def analyze(media_id) -> bool:
+            async with semaphore:
+                async with AsyncSessionLocal() as db:
+                    try:
+                        with span("process_media"):
+                            await MediaAnalysisService(db, storage).process_media(str(media_id))
+                        return True
+                    except Exception as e:
+                        print(f"Job for media {media_id} failed: {str(e)}")
+                        return False
+
+        transport = FakeTransport()
+        add_span_listener(record)
+        try:
+            start = time.perf_counter()
+            results = await asyncio.gather(*(analyze(media_id) for media_id in media_ids))
+            elapsed = time.perf_counter() - start
+            # Send the completion messages queued in the outbox
+            await NotificationDispatcher(transport, rate_per_second=0, batch_size=args.jobs).dispatch_once()
+        finally:
+            remove_span_listener(record)
+            await delete_rows(user_id, media_ids)
+
+    succeeded = sum(results)
+    own_rss, child_rss = peak_rss_mib()
+    print(f"\n{succeeded}/{args.jobs} jobs in {elapsed:.1f}s with concurrency {args.concurrency}: "
+          f"{succeeded / elapsed * 60:.1f} jobs/min")
+    print(f"Fake calls: {groq.requests} Whisper, {openai.requests} LLM, {len(transport.sent)} WhatsApp")
+    for model, usage in llm_gateway.usage.items():
+        print(f"LLM {model}: {usage.by_source}, {usage.prompt_tokens + usage.completion_tokens} tokens billed, "
+              f"{usage.saved_tokens} saved")
+    print(f"Peak RSS: {own_rss:.0f} MiB (largest child process {child_rss:.0f} MiB)\n")
+    print(f"{'stage':>24} {'count':>6} {'p50 ms':>10} {'p99 ms':>10} {'errors':>7}")
+    for stage, values in sorted(durations.items(), key=lambda item: -sum(item[1])):
+        p50, p99 = np.percentile(values, [50, 99]) * 1000
+        print(f"{stage:>24} {len(values):6d} {p50:10.1f} {p99:10.1f} {errors[stage]:7d}")
+    await close_clients()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--minutes", type=float, default=5, help="length of the generated recording")
+    parser.add_argument("--kind", choices=["video", "audio"], default="video")
+    parser.add_argument("--whisper-latency", type=float, default=0.3)
+    parser.add_argument("--whisper-per-second", type=float, default=0.01,
+                        help="fake Whisper latency per second of uploaded audio")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Micro-benchmark of transcript segmentation on a synthetic three-hour word list.
+
+    python -m benchmarks.bench_segmenter --hours 3
+
+Compares the previous per-word loop (which re-split the growing segment text
+for every word) with `segment_words` over the word timestamp arrays.
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from app.services.segmenter import SegmenterConfig, segment_words
+
+VOCABULARY = ["we", "should", "ship", "the", "budget", "review.", "next", "quarter", "okay?", "agreed!"]
+
+
+def synthetic_words(hours: float, seed: int = 7):
+    random.seed(seed)
+    words, t = [], 0.0
+    while t < hours * 3600:
+        duration = random.uniform(0.15, 0.45)
+        words.append({"word": random.choice(VOCABULARY), "start": t, "end": t + duration})
+        t += duration + random.choice([0.02, 0.05, 0.1, 0.8])
+    return words
+
+
+def legacy_segments(words, max_words: int):
+    segments = []
+    current_segment = {"text": "", "words": [], "start": None, "end": None}
+    for word in words:
+        if current_segment["text"] == "" or len(current_segment["text"].split()) > max_words - 1:
+            if current_segment["text"] != "":
+                segments.append(current_segment)
+            current_segment = {"text": word["word"], "words": [word], "start": word["start"], "end": word["end"]}
+        else:
+            current_segment["text"] += " " + word["word"]
+            current_segment["words"].append(word)
+            current_segment["end"] = word["end"]
+    if current_segment["text"] != "":
+        segments.append(current_segment)
+    return segments
+
+
+def timed(function, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=3)
+    parser.add_argument("--max-words", type=int, default=120,
+                        help="segment size; the legacy loop slows down quadratically with it")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    words = synthetic_words(args.hours)
+    texts = [w["word"] for w in words]
+    starts = np.fromiter((w["start"] for w in words), dtype=np.float64, count=len(words))
+    ends = np.fromiter((w["end"] for w in words), dtype=np.float64, count=len(words))
+    print(f"{len(words)} words over {args.hours:g} hours")
+
+    legacy_time, legacy = timed(lambda: legacy_segments(words, args.max_words), args.repeat)
+    config = SegmenterConfig(max_words=args.max_words, max_duration=0, pause_gap=0, split_on_punctuation=False)
+    vector_time, offsets = timed(lambda: segment_words(starts, ends, texts, config), args.repeat)
+    print(f"      legacy loop: {legacy_time * 1000:8.1f} ms  {len(legacy)} segments")
+    print(f"   segment_words: {vector_time * 1000:8.1f} ms  {len(offsets) - 1} segments")
+
+    rich = SegmenterConfig(max_words=args.max_words, max_duration=30, pause_gap=0.7, split_on_punctuation=True)
+    rich_time, rich_offsets = timed(lambda: segment_words(starts, ends, texts, rich), args.repeat)
+    print(f"  + pause/punct/30s: {rich_time * 1000:6.1f} ms  {len(rich_offsets) - 1} segments")
+
+
+if __name__ == "__main__":
+    main()
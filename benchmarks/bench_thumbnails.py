@@ -0,0 +1,90 @@
+"""
+Compare per-chapter frame extraction with the single-pass batch extractor.
+
+    python -m benchmarks.bench_thumbnails --minutes 30 --chapters 12 --max-gap 3
+
+Writes a synthetic video with OpenCV, then extracts the 10 s cover frame plus
+one frame per chapter, and the preview strip timestamps: one seek per frame,
+in one pass with the `--max-gap` rule, and in one pass with the keyframe
+times of the video.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from app.services.frame_extractor import MAX_SEQUENTIAL_GAP, extract_frame, extract_frames, strip_timestamps
+
+
+def generate_video(path: str, minutes: float, fps: int = 25, size=(640, 360)) -> None:
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    frame = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+    for index in range(int(minutes * 60 * fps)):
+        frame[:] = (index % 255, (index // 7) % 255, (index // 49) % 255)
+        cv2.putText(frame, str(index), (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255, 255, 255), 3)
+        writer.write(frame)
+    writer.release()
+
+
+def read_keyframe_times(path: str) -> list:
+    """Keyframe timestamps from the packet flags (what `probe_keyframes` reads with ffprobe)."""
+    video = cv2.VideoCapture(path)
+    fps = video.get(cv2.CAP_PROP_FPS)
+    video.set(cv2.CAP_PROP_FORMAT, -1)
+    times, index = [], 0
+    while video.grab():
+        if video.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+            times.append(index / fps)
+        index += 1
+    video.release()
+    return times
+
+
+def run(label: str, video_path: str, timestamps: list, output_dir: str, max_gap: float, keyframe_times: list) -> None:
+    start = time.perf_counter()
+    for i, timestamp in enumerate(timestamps):
+        extract_frame(video_path, timestamp, os.path.join(output_dir, f"single_{i}.jpg"))
+    per_frame = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frames = extract_frames(video_path, timestamps, output_dir, max_gap)
+    batch = time.perf_counter() - start
+
+    start = time.perf_counter()
+    extract_frames(video_path, timestamps, output_dir, max_gap, keyframe_times)
+    keyframed = time.perf_counter() - start
+
+    print(f"{label} ({len(timestamps)} frames)")
+    print(f"    per-frame: {per_frame:7.3f}s")
+    print(f"   batch {max_gap:4.1f}s: {batch:7.3f}s  ({sum(1 for f in frames.values() if f)} frames)")
+    print(f"    keyframes: {keyframed:7.3f}s")
+    print(f"      speedup: {per_frame / batch:.2f}x / {per_frame / keyframed:.2f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=30)
+    parser.add_argument("--chapters", type=int, default=12)
+    parser.add_argument("--max-gap", type=float, default=MAX_SEQUENTIAL_GAP,
+                        help="Largest gap decoded forward without keyframe times")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = os.path.join(temp_dir, "meeting.mp4")
+        print(f"Generating {args.minutes:.0f} minute video...")
+        generate_video(video_path, args.minutes)
+
+        duration = args.minutes * 60
+        keyframe_times = read_keyframe_times(video_path)
+        print(f"{len(keyframe_times)} keyframes")
+
+        chapters = [10.0] + [duration * i / (args.chapters + 1) for i in range(1, args.chapters + 1)]
+        run("chapters", video_path, chapters, temp_dir, args.max_gap, keyframe_times)
+        strip = strip_timestamps(duration, 5, 720)
+        run("strip", video_path, strip, temp_dir, args.max_gap, keyframe_times)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Compare single-shot and chunked transcription wall-clock time.
+
+    python -m benchmarks.bench_transcription --minutes 60
+
+Generates a synthetic recording (tone bursts separated by short silences)
+with ffmpeg and transcribes it through `TranscriptionService` backed by
+`FakeGroqClient`, whose latency grows with the amount of uploaded audio.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import tempfile
+import time
+
+from app.services.clients import close_clients
+from app.services.transcription_service import TranscriptionService
+from benchmarks.fakes import FakeGroqClient
+
+
+def generate_audio(path: str, minutes: float) -> None:
+    duration = minutes * 60
+    # 4 s of tone followed by 1 s of silence, repeated
+    # (commas are escaped, as they would otherwise separate filters)
+    expression = "if(lt(mod(t\\,5)\\,4)\\,0.5*sin(2*PI*440*t)\\,0)"
+    subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-f", "lavfi",
+         "-i", f"aevalsrc={expression}:s=16000:d={duration}",
+         "-ac", "1", "-c:a", "libmp3lame", "-b:a", "64k", path, "-y"],
+        check=True
+    )
+
+
+async def run(args) -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        audio_path = os.path.join(temp_dir, "meeting.mp3")
+        print(f"Generating {args.minutes:.0f} minutes of audio...")
+        generate_audio(audio_path, args.minutes)
+
+        results = {}
+        for label, chunked in (("single-shot", False), ("chunked", True)):
+            client = FakeGroqClient(base_latency=args.base_latency, seconds_per_audio_second=args.per_second)
+            service = TranscriptionService(groq_client=client, max_concurrency=args.concurrency)
+            start = time.perf_counter()
+            response = await service.transcribe_words(audio_path, chunked=chunked)
+            elapsed = time.perf_counter() - start
+            results[label] = (elapsed, len(response["words"]), client.requests)
+
+        for label, (elapsed, words, requests) in results.items():
+            print(f"{label:>12}: {elapsed:7.2f}s  {words} words  {requests} request(s)")
+        print(f"     speedup: {results['single-shot'][0] / results['chunked'][0]:.2f}x")
+    await close_clients()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=60)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--base-latency", type=float, default=0.3)
+    parser.add_argument("--per-second", type=float, default=0.01,
+                        help="fake backend latency per second of uploaded audio")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
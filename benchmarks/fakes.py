@@ -0,0 +1,158 @@
+"""
+Deterministic stand-ins for external services used by the benchmarks.
+"""
+import asyncio
+import json
+import os
+import re
+import subprocess
+import time
+from types import SimpleNamespace
+from typing import Dict, List
+
+
+def media_duration(path: str) -> float:
+    """Duration of a media file in seconds (blocking ffprobe call)."""
+    output = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+         "-of", "default=noprint_wrappers=1:nokey=1", path],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return float(output.strip())
+
+
+class FakeGroqClient:
+    """Mimics `groq.Groq` for Whisper transcriptions.
+
+    Each request sleeps `base_latency + seconds_per_audio_second * duration`
+    (plus `seconds_per_megabyte` for every uploaded MB, to model the upload)
+    and returns one synthetic word every `word_interval` seconds of audio, so
+    results are deterministic and proportional to the uploaded audio.
+    """
+
+    def __init__(self, base_latency: float = 0.3, seconds_per_audio_second: float = 0.01,
+                 word_interval: float = 0.4, seconds_per_megabyte: float = 0.0):
+        self.base_latency = base_latency
+        self.seconds_per_audio_second = seconds_per_audio_second
+        self.word_interval = word_interval
+        self.seconds_per_megabyte = seconds_per_megabyte
+        self.requests = 0
+        self.uploaded_bytes = 0
+        self.audio = SimpleNamespace(transcriptions=SimpleNamespace(create=self._create))
+
+    def _create(self, file, **kwargs):
+        self.requests += 1
+        duration = media_duration(file.name)
+        size = os.path.getsize(file.name)
+        self.uploaded_bytes += size
+        time.sleep(self.base_latency + self.seconds_per_audio_second * duration
+                   + self.seconds_per_megabyte * size / 1e6)
+        words: List[Dict] = []
+        t = 0.0
+        while t + self.word_interval <= duration:
+            words.append({"word": f"w{int(t * 10)}", "start": t, "end": t + self.word_interval * 0.8})
+            t += self.word_interval
+        return SimpleNamespace(text=" ".join(w["word"] for w in words), words=words)
+
+
+class FakeChatStream:
+    """Async iterator over streamed chat completion chunks.
+
+    With `usage` set, a last chunk without choices carries it, as OpenAI does
+    for `stream_options={"include_usage": True}`.
+    """
+
+    def __init__(self, content: str, token_delay: float, usage=None):
+        self._tokens = [token + " " for token in content.split()]
+        self._token_delay = token_delay
+        self._usage = usage
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed:
+            raise StopAsyncIteration
+        if not self._tokens:
+            if self._usage is None:
+                raise StopAsyncIteration
+            usage, self._usage = self._usage, None
+            return SimpleNamespace(choices=[], usage=usage)
+        await asyncio.sleep(self._token_delay)
+        token = self._tokens.pop(0)
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeAsyncOpenAI:
+    """Mimics `openai.AsyncOpenAI` chat completions.
+
+    JSON-mode requests get an analysis built from the `[XX.XXs]` timestamps of
+    the prompt; other requests get a short fixed reply, optionally streamed.
+    """
+
+    def __init__(self, latency: float = 0.5, token_delay: float = 0.01,
+                 reply: str = "Hi I'm minutes.ai assistant, here is a short answer about the meeting."):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.reply = reply
+        self.requests = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, model: str, messages: List[Dict], stream: bool = False,
+                      response_format: Dict = None, stream_options: Dict = None, **kwargs):
+        self.requests += 1
+        if stream:
+            usage = _usage(messages, self.reply) if (stream_options or {}).get("include_usage") else None
+            return FakeChatStream(self.reply, self.token_delay, usage)
+        await asyncio.sleep(self.latency)
+        prompt = messages[-1]["content"]
+        content = fake_analysis(prompt) if response_format else self.reply
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=_usage(messages, content)
+        )
+
+
+def _usage(messages: List[Dict], content: str) -> SimpleNamespace:
+    """Token usage estimated at four characters per token."""
+    prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+    completion_tokens = len(content) // 4
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens
+    )
+
+
+class FakeTwilioClient:
+    """Mimics `twilio.rest.Client` for WhatsApp messages; records them instead of sending."""
+
+    def __init__(self):
+        self.sent: List[Dict] = []
+        self.messages = SimpleNamespace(create=self._create)
+
+    def _create(self, **kwargs):
+        self.sent.append(kwargs)
+        return SimpleNamespace(sid=f"SM{len(self.sent):032d}", status="queued")
+
+
+def fake_analysis(transcription: str, chapters: int = 5) -> str:
+    """Deterministic analysis JSON with chapters at timestamps of the transcription."""
+    timestamps = re.findall(r"^(\[\d+(?:\.\d+)?s\])", transcription, flags=re.MULTILINE)
+    step = max(len(timestamps) // chapters, 1)
+    return json.dumps({
+        "video_title": "Synthetic meeting",
+        "description": "A generated recording used for benchmarking.",
+        "chapters": [
+            {"chapter_title": f"Chapter {i + 1}", "timestamp": timestamp, "content": "Discussion."}
+            for i, timestamp in enumerate(timestamps[::step][:chapters])
+        ],
+        "summary": "Summary of the synthetic meeting.",
+        "decisions": [],
+        "final_decision": "None",
+        "action_items": ["Follow up"]
+    })
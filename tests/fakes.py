@@ -0,0 +1,63 @@
+"""
+Stand-ins for external clients used by the tests.
+"""
+from types import SimpleNamespace
+from typing import Dict, List
+
+
+class FakeChatStream:
+    """Async iterator over streamed chat completion chunks.
+
+    With `usage` set, a last chunk without choices carries it, as OpenAI does
+    for `stream_options={"include_usage": True}`.
+    """
+
+    def __init__(self, content: str, usage=None):
+        self._tokens = [token + " " for token in content.split()]
+        self._usage = usage
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed:
+            raise StopAsyncIteration
+        if not self._tokens:
+            if self._usage is None:
+                raise StopAsyncIteration
+            usage, self._usage = self._usage, None
+            return SimpleNamespace(choices=[], usage=usage)
+        token = self._tokens.pop(0)
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeAsyncOpenAI:
+    """Mimics `openai.AsyncOpenAI` chat completions with a fixed `reply`, streamed or not."""
+
+    def __init__(self, reply: str):
+        self.reply = reply
+        self.requests: List[Dict] = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, model: str, messages: List[Dict], stream: bool = False,
+                      stream_options: Dict = None, **kwargs):
+        self.requests.append({"model": model, "messages": messages, "stream": stream})
+        usage = _usage(messages, self.reply)
+        if stream:
+            return FakeChatStream(self.reply, usage if (stream_options or {}).get("include_usage") else None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.reply))], usage=usage)
+
+
+def _usage(messages: List[Dict], content: str) -> SimpleNamespace:
+    """Token usage estimated at four characters per token."""
+    prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+    completion_tokens = len(content) // 4
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens
+    )
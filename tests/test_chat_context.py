@@ -0,0 +1,43 @@
+import asyncio
+import uuid
+from app.services.chat_context import ChatContextCache, ConversationContext
+
+
+def test_concurrent_misses_share_one_context(monkeypatch):
+    cache = ChatContextCache(ttl=60)
+    loads = []
+
+    async def load(db, media_id):
+        loads.append(media_id)
+        await asyncio.sleep(0.01)
+        return ConversationContext(str(media_id), insights=None)
+
+    monkeypatch.setattr(cache, "_load", load)
+    media_id = uuid.uuid4()
+
+    async def main():
+        return await asyncio.gather(*(cache.get(None, media_id) for _ in range(5)))
+
+    contexts = asyncio.run(main())
+    assert loads == [media_id]
+    assert all(context is contexts[0] for context in contexts)
+    assert not cache._loading
+
+
+def test_reload_after_expiry_keeps_the_lock(monkeypatch):
+    cache = ChatContextCache(ttl=0)
+
+    async def load(db, media_id):
+        return ConversationContext(str(media_id), insights=None)
+
+    monkeypatch.setattr(cache, "_load", load)
+    media_id = uuid.uuid4()
+
+    async def main():
+        first = await cache.get(None, media_id)
+        second = await cache.get(None, media_id)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first is not second
+    assert first.lock is second.lock
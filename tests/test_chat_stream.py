@@ -0,0 +1,78 @@
+import json
+import uuid
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.controllers import chat
+from app.database import get_db
+from app.services.chat_context import ConversationContext
+from app.services.llm_gateway import LLMGateway
+from tests.fakes import FakeAsyncOpenAI
+
+REPLY = "Hi I'm minutes.ai assistant, the team agreed to ship on Friday."
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def stream_app(monkeypatch):
+    context = ConversationContext("media", insights="Release planning meeting")
+    stored = []
+    gateway = LLMGateway(client=FakeAsyncOpenAI(REPLY), cache_size=0)
+
+    async def get_context(db, media_id):
+        return context
+
+    async def get_index(db, media_id):
+        return None
+
+    async def store_turn(db, data, turn_context, received_at, ai_response):
+        stored.append((data.message, ai_response))
+
+    monkeypatch.setattr(chat.chat_context_cache, "get", get_context)
+    monkeypatch.setattr(chat.segment_index_cache, "get", get_index)
+    monkeypatch.setattr(chat, "_store_turn", store_turn)
+    monkeypatch.setattr(chat, "AsyncSessionLocal", FakeSession)
+
+    async def no_db():
+        yield None
+
+    app = FastAPI()
+    app.include_router(chat.router)
+    app.dependency_overrides[get_db] = no_db
+    app.dependency_overrides[chat.get_llm_gateway] = lambda: gateway
+    return TestClient(app), context, stored, gateway
+
+
+def read_events(response):
+    return [json.loads(line[len("data: "):]) for line in response.iter_lines() if line.startswith("data: ")]
+
+
+def test_chat_stream_emits_tokens_then_stores_reply(stream_app):
+    client, context, stored, gateway = stream_app
+    body = {"user_id": str(uuid.uuid4()), "media_id": str(uuid.uuid4()), "message": "When do we ship?"}
+
+    with client.stream("POST", "/chat/stream", json=body) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = read_events(response)
+
+    tokens = [event["content"] for event in events if event["type"] == "token"]
+    assert tokens == [token + " " for token in REPLY.split()]
+    assert events[-1] == {"type": "done", "response": "".join(tokens)}
+    assert [event["type"] for event in events[:-1]] == ["token"] * len(tokens)
+
+    assert stored == [("When do we ship?", "".join(tokens))]
+    assert [m["role"] for m in context.messages] == ["user", "assistant"]
+    assert context.messages[-1]["content"] == "".join(tokens)
+
+    usage = gateway.usage["gpt-4o-mini"]
+    assert usage.by_source == {"stream": 1}
+    assert usage.completion_tokens == len(REPLY) // 4
+    assert usage.prompt_tokens > 0